@@ -13,11 +13,7 @@ def create_app():
     """
     app = Flask(__name__)
 
-    # Configure the database
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-    # Initialize the database
+    # Initialize the database (Config.SQLALCHEMY_DATABASE_URI, SQLite by default)
     init_db(app)
 
     # Enable CORS for development
@@ -295,6 +295,8 @@ def create_app(config_class=Config):
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(files_bp, url_prefix='/api')
+    from app.routes.uploads import uploads_bp
+    app.register_blueprint(uploads_bp, url_prefix='/api')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     
     from app.routes.collaborators import collaborators_bp
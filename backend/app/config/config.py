@@ -20,9 +20,30 @@ class Config:
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     JWT_ERROR_MESSAGE_KEY = 'error'
 
-    # Configuration Base de données
+    # Configuration Base de données (SQLite par défaut, PostgreSQL via DATABASE_URL)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool de connexions (PostgreSQL)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # Secondes d'attente d'une connexion libre
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Secondes avant de renouveler une connexion
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # SQLite: journal WAL (les lectures ne bloquent plus les écritures) et pragmas associés
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # Millisecondes
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Octets
+    # Réplicas en lecture (URI séparées par des virgules) pour les requêtes GET
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))  # Lectures au primaire après une écriture
+    REPLICA_HEALTH_INTERVAL = int(os.environ.get('REPLICA_HEALTH_INTERVAL', 10))  # Secondes
+
+    # Journaux et activités écrits par lots (un commit par lot) par un thread d'arrière-plan
+    EVENT_WRITER_ENABLED = os.environ.get('EVENT_WRITER_ENABLED', 'true').lower() == 'true'
+    EVENT_WRITER_BATCH_SIZE = int(os.environ.get('EVENT_WRITER_BATCH_SIZE', 200))
+    EVENT_WRITER_INTERVAL_MS = int(os.environ.get('EVENT_WRITER_INTERVAL_MS', 50))  # Attente maximale avant commit
+    EVENT_WRITER_MAX_PENDING = int(os.environ.get('EVENT_WRITER_MAX_PENDING', 10000))  # Au-delà: écriture directe
     
     
     # Email Configuration
@@ -43,9 +64,68 @@ class Config:
     GCP_STORAGE_BUCKET = os.environ.get('GCP_STORAGE_BUCKET') or 'secure-collab-platform-bucket'
     STORAGE_URL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'AVATARS')
     GCP_CREDENTIALS = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+    # Pilote de stockage des fichiers: 'local' (UPLOAD_FOLDER/storage) ou 'gcs'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    GCS_COMPOSITE_THRESHOLD = 32 * 1024 * 1024  # Téléversement en parties parallèles au-delà de 32 MB
+    GCS_COMPOSITE_PART_SIZE = 8 * 1024 * 1024
+    GCS_UPLOAD_WORKERS = 8
+    # Migration en arrière-plan des fichiers stockés à plat vers la disposition ab/cd/
+    STORAGE_LAYOUT_MIGRATION = os.environ.get('STORAGE_LAYOUT_MIGRATION', 'true').lower() == 'true'
+    # Cache mémoire des blocs chiffrés les plus lus, devant le pilote de stockage
+    # (désactivé par défaut en local, où le cache de pages du système joue ce rôle)
+    OBJECT_CACHE_SIZE = int(os.environ.get('OBJECT_CACHE_SIZE',
+                                           256 * 1024 * 1024 if STORAGE_BACKEND == 'gcs' else 0))
+    OBJECT_CACHE_BLOCK_SIZE = 1024 * 1024
+    OBJECT_CACHE_ADMIT_AFTER = 2  # Ouvertures avant qu'un objet n'entre dans le cache
+    # Ramasse-miettes du stockage (objets orphelins, fichiers temporaires, sessions expirées)
+    STORAGE_GC_ENABLED = os.environ.get('STORAGE_GC_ENABLED', 'true').lower() == 'true'
+    STORAGE_GC_INTERVAL = int(os.environ.get('STORAGE_GC_INTERVAL', 3600))  # secondes
+    STORAGE_GC_MIN_AGE = 3600  # Un objet non référencé plus récent peut appartenir à un téléversement en cours
+    STORAGE_GC_TEMP_MAX_AGE = 6 * 3600
+    STORAGE_GC_BATCH_SIZE = 100  # Suppressions par lot
+    STORAGE_GC_PAUSE = 0.5  # Pause en secondes entre deux lots
+    # Vérification périodique de l'intégrité des objets stockés (arbres de Merkle)
+    INTEGRITY_SCAN_ENABLED = os.environ.get('INTEGRITY_SCAN_ENABLED', 'false').lower() == 'true'
+    INTEGRITY_SCAN_INTERVAL = int(os.environ.get('INTEGRITY_SCAN_INTERVAL', 24 * 3600))  # secondes
+    INTEGRITY_SCAN_MODE = os.environ.get('INTEGRITY_SCAN_MODE', 'full')  # 'sample' ou 'full'
+    INTEGRITY_SAMPLE_SEGMENTS = 8  # Segments tirés au hasard en mode 'sample'
     # Configuration des fichiers
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB
+    # Téléversements reprenables: chaque morceau reste sous MAX_CONTENT_LENGTH
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB, multiple de la taille des segments chiffrés
+    # Compression avant chiffrement: 'auto' (zstd si installé, sinon zlib), 'zstd', 'zlib' ou 'none'
+    COMPRESSION_CODEC = os.environ.get('COMPRESSION_CODEC', 'auto')
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 5 * 1024 * 1024 * 1024))  # 5 GB
+    UPLOAD_SESSION_TTL = timedelta(hours=24)
+    # Quota de stockage par défaut de chaque utilisateur, en octets (0: illimité)
+    USER_STORAGE_QUOTA = int(os.environ.get('USER_STORAGE_QUOTA', 10 * 1024 * 1024 * 1024))  # 10 GB
+    # Calculs coûteux (chiffrement, compression, hachage des mots de passe) confiés
+    # à un pool de threads système sous eventlet, pour ne pas bloquer le hub
+    OFFLOAD_ENABLED = os.environ.get('OFFLOAD_ENABLED', 'true').lower() == 'true'
+    OFFLOAD_WORKERS = int(os.environ.get('OFFLOAD_WORKERS', 4))
+    # Cache des droits d'accès aux fichiers, propre à chaque processus
+    ACL_CACHE_TTL = int(os.environ.get('ACL_CACHE_TTL', 30))  # Secondes
+    ACL_CACHE_SIZE = 10000  # Entrées (fichier, utilisateur)
+    # Fil d'activité de chaque utilisateur
+    FEED_PAGE_SIZE = 50
+    FEED_MAX_PAGE_SIZE = 200
+    FEED_BACKFILL = 50  # Activités récentes recopiées lors d'un nouveau partage
+    # Pagination des discussions sur les fichiers
+    MESSAGE_PAGE_SIZE = 50
+    MESSAGE_MAX_PAGE_SIZE = 200
+    # Recherche plein texte: 'fts5' (index SQLite) ou 'like' (sans index, autres bases)
+    SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE', 'fts5')
+    SEARCH_PAGE_SIZE = 20
+    SEARCH_MAX_PAGE_SIZE = 100
+    # Pagination de la liste des fichiers
+    FILE_LIST_PAGE_SIZE = int(os.environ.get('FILE_LIST_PAGE_SIZE', 50))
+    FILE_LIST_MAX_PAGE_SIZE = int(os.environ.get('FILE_LIST_MAX_PAGE_SIZE', 200))
+    # Téléchargement groupé en archive ZIP
+    ZIP_MAX_FILES = int(os.environ.get('ZIP_MAX_FILES', 100))
+    # Miniatures des images, produites en arrière-plan après le téléversement
+    THUMBNAIL_SIZE = 256  # Plus grand côté en pixels
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
     
     # Configuration de sécurité
     BCRYPT_LOG_ROUNDS = 12
@@ -4,7 +4,11 @@ from datetime import datetime
 class Chat(db.Model):
     __tablename__ = 'chat'
     
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Conversation entre deux utilisateurs, dans l'ordre chronologique
+        db.Index('ix_chat_sender_receiver_created', 'sender_id', 'receiver_id', 'created_at'),
+        {'extend_existing': True},
+    )
 
     id = db.Column(db.String(36), primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
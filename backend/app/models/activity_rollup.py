@@ -0,0 +1,21 @@
+from app.models.user import db
+
+
+class ActivityRollup(db.Model):
+    """Model for the materialized number of logged actions per day, action and user."""
+    __tablename__ = 'activity_rollups'
+
+    # Jour UTC de Log.timestamp (ou de FileShare.created_at pour les partages)
+    day = db.Column(db.Date, primary_key=True)
+    action = db.Column(db.String(50), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Statistiques d'un utilisateur; semaine et totaux d'une action pour le tableau de bord
+        db.Index('ix_activity_rollups_user_action_day', 'user_id', 'action', 'day'),
+        db.Index('ix_activity_rollups_action_day', 'action', 'day'),
+    )
+
+    def __repr__(self):
+        return f'<ActivityRollup {self.day} {self.action} user={self.user_id}: {self.count}>'
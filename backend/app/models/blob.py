@@ -0,0 +1,31 @@
+from datetime import datetime
+from app.models.user import db
+
+
+class Blob(db.Model):
+    """Model for deduplicated, content-addressed encrypted file contents."""
+    __tablename__ = 'blobs'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Empreinte SHA-256 du contenu en clair: un même contenu n'est stocké qu'une fois
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    storage_path = db.Column(db.String(512), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Clé de données du conteneur, enveloppée par la clé maître
+    encryption_key = db.Column(db.String(128), nullable=False)
+    # Codec appliqué avant le chiffrement (NULL: non compressé)
+    compression = db.Column(db.String(10), nullable=True)
+    # Miniature chiffrée avec la même clé de données (images uniquement)
+    thumbnail_path = db.Column(db.String(512), nullable=True)
+    # Arbre de Merkle du conteneur stocké: racine et empreintes des feuilles (32 octets chacune)
+    merkle_root = db.Column(db.String(64), nullable=True)
+    merkle_leaves = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    verified_at = db.Column(db.DateTime, nullable=True)
+    # Nombre de fichiers qui référencent ce contenu
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    files = db.relationship('File', back_populates='blob')
+    
+    def __repr__(self):
+        return f'<Blob {self.content_hash[:12]} refs={self.ref_count}>'
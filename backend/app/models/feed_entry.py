@@ -0,0 +1,38 @@
+from datetime import datetime
+from app.models.user import db
+
+
+class FeedEntry(db.Model):
+    """Model for one activity as seen in one user's feed (written when the activity happens)."""
+    __tablename__ = 'feed_entries'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Destinataire: propriétaire du fichier ou utilisateur avec qui il est partagé
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    activity_id = db.Column(db.String(36), db.ForeignKey('activities.id', ondelete='CASCADE'), nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey('files.id', ondelete='CASCADE'), nullable=False)
+    actor_id = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    # Copiés à l'écriture: la lecture du fil ne fait aucune jointure
+    file_name = db.Column(db.String(255), nullable=False)
+    actor_name = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Lecture du fil: parcours d'intervalle sur (destinataire, date, id)
+        db.Index('ix_feed_entries_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_feed_entries_file_user', 'file_id', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f'<FeedEntry {self.type} for User {self.user_id} on File {self.file_id}>'
+
+    def to_dict(self):
+        """Same shape as Activity.to_dict()."""
+        return {
+            'id': self.activity_id,
+            'type': self.type,
+            'fileName': self.file_name,
+            'userName': self.actor_name,
+            'timestamp': self.created_at.isoformat()
+        }
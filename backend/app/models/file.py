@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from app.models.user import db
+from app.models.blob import Blob
 #rom app.models.file_share import file_shares
 import uuid
 class File(db.Model):
@@ -9,9 +10,19 @@ class File(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)  
     name = db.Column(db.String(255), nullable=False)
     storage_path = db.Column(db.String(512), nullable=False)
-    size = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
     mime_type = db.Column(db.String(100), nullable=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Clé de données du fichier, enveloppée par la clé maître (NULL pour les anciens fichiers)
+    encryption_key = db.Column(db.String(128), nullable=True)
+    # Empreinte SHA-256 du contenu en clair, calculée pendant le téléversement
+    content_hash = db.Column(db.String(64), nullable=True)
+    # Racine de l'arbre de Merkle du conteneur stocké (NULL pour les anciens fichiers)
+    merkle_root = db.Column(db.String(64), nullable=True)
+    # Codec appliqué avant le chiffrement (NULL: non compressé)
+    compression = db.Column(db.String(10), nullable=True)
+    # Contenu dédupliqué partagé (NULL pour les fichiers stockés avant la déduplication)
+    blob_id = db.Column(db.Integer, db.ForeignKey('blobs.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     shares = db.relationship('FileShare', back_populates='file', lazy='joined', cascade='all, delete-orphan')
@@ -22,6 +33,13 @@ class File(db.Model):
     )
     activities = db.relationship('Activity', back_populates='file', cascade='all, delete-orphan')
     messages = db.relationship('Message', back_populates='file', cascade='all, delete-orphan')
+    blob = db.relationship('Blob', back_populates='files', lazy='joined')
+    
+    __table_args__ = (
+        # Fichiers d'un propriétaire par date; fichiers d'un contenu dédupliqué
+        db.Index('ix_files_owner_created', 'owner_id', 'created_at'),
+        db.Index('ix_files_blob', 'blob_id'),
+    )
     
     
     # Relations
@@ -44,6 +62,7 @@ class File(db.Model):
             'name': self.name,
             'size': self.size,
             'mime_type': self.mime_type,
+            'has_thumbnail': bool(self.blob and self.blob.thumbnail_path),
             'owner': self.owner.to_dict(),
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
@@ -74,6 +93,12 @@ class Activity(db.Model):
     
     user = db.relationship('User', backref='activities')
     file = db.relationship('File', back_populates='activities')
+    
+    __table_args__ = (
+        # Historique d'un fichier par date
+        db.Index('ix_activities_file_created', 'file_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Activity {self.type} by User {self.user_id} on File {self.file_id}>'
     
@@ -101,6 +126,11 @@ class Message(db.Model):
     user = db.relationship('User', backref='messages')
     file = db.relationship('File', back_populates='messages')
     
+    __table_args__ = (
+        # Lecture d'une discussion par intervalle de dates
+        db.Index('ix_messages_file_created', 'file_id', 'created_at'),
+    )
+    
     def to_dict(self):
         """Convert message object to dictionary."""
         return {
@@ -18,6 +18,8 @@ class FileShare(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('file_id', 'user_id', name='uq_file_share_user'),
+        # Fichiers partagés avec un utilisateur (la contrainte unique couvre l'accès par fichier)
+        db.Index('ix_file_shares_user', 'user_id', 'file_id'),
     )
     
     def __repr__(self):
@@ -0,0 +1,27 @@
+from app.models.user import db
+
+# Table FTS5 associée: une ligne par document, de même rowid que search_documents.
+# Créée et supprimée avec search_documents (voir app.utils.search).
+SEARCH_INDEX_TABLE = 'search_index'
+
+
+class SearchDocument(db.Model):
+    """Model for one searchable item (file name, file discussion message or chat message)."""
+    __tablename__ = 'search_documents'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # 'file', 'message' ou 'chat', et identifiant de la ligne d'origine
+    kind = db.Column(db.String(10), nullable=False)
+    ref = db.Column(db.String(36), nullable=False)
+    # Contrôle d'accès: fichier concerné (fichiers, discussions) ou participants (chat)
+    file_id = db.Column(db.Integer, nullable=True)
+    sender_id = db.Column(db.Integer, nullable=True)
+    receiver_id = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'ref', name='uq_search_documents_kind_ref'),
+        db.Index('ix_search_documents_file', 'file_id'),
+    )
+
+    def __repr__(self):
+        return f'<SearchDocument {self.kind} {self.ref}>'
@@ -0,0 +1,30 @@
+from datetime import datetime
+from app.models.user import db
+
+
+class StorageUsage(db.Model):
+    """Model for the materialized storage usage and quota of a user."""
+    __tablename__ = 'storage_usage'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # Somme de File.size des fichiers du propriétaire, tenue à jour avec les fichiers
+    used_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    file_count = db.Column(db.Integer, nullable=False, default=0)
+    # Quota propre à l'utilisateur (NULL: valeur par défaut de la configuration, 0: illimité)
+    quota_bytes = db.Column(db.BigInteger, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StorageUsage user={self.user_id} {self.used_bytes}B/{self.file_count} files>'
+
+
+class StorageTypeUsage(db.Model):
+    """Model for the materialized file count and volume per MIME type."""
+    __tablename__ = 'storage_type_usage'
+
+    mime_type = db.Column(db.String(100), primary_key=True)
+    used_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    file_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StorageTypeUsage {self.mime_type} {self.used_bytes}B/{self.file_count} files>'
@@ -0,0 +1,55 @@
+from datetime import datetime
+from app.models.user import db
+import uuid
+
+
+class UploadSession(db.Model):
+    """Model for resumable, chunked file uploads."""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    next_chunk = db.Column(db.Integer, nullable=False, default=0)
+    # Clé de données du futur fichier, enveloppée par la clé maître
+    encryption_key = db.Column(db.String(128), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='open')  # open, complete, aborted, failed
+    file_id = db.Column(db.Integer, db.ForeignKey('files.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    owner = db.relationship('User', backref=db.backref('upload_sessions', lazy='dynamic'))
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.filename} {self.received_bytes}/{self.total_size}>'
+    
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+    
+    def expected_chunk_length(self, index):
+        """Size in bytes that chunk ``index`` must have."""
+        if index < self.total_chunks - 1:
+            return self.chunk_size
+        return self.total_size - index * self.chunk_size
+    
+    def to_dict(self):
+        """Convert upload session object to dictionary."""
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'mime_type': self.mime_type,
+            'total_size': self.total_size,
+            'chunk_size': self.chunk_size,
+            'total_chunks': self.total_chunks,
+            'received_bytes': self.received_bytes,
+            'next_chunk': self.next_chunk,
+            'status': self.status,
+            'file_id': self.file_id,
+            'expires_at': self.expires_at.isoformat()
+        }
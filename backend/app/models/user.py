@@ -6,7 +6,10 @@ import pyotp
 import secrets
 import string
 import uuid
-db = SQLAlchemy()
+from app.utils import offload
+from app.utils.replicas import RoutingSession
+# Les lectures des requêtes GET peuvent être servies par un réplica (app/utils/replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 #rom app.models.file_share import file_shares
 class User(db.Model):
     __tablename__ = 'users'
@@ -101,14 +104,14 @@ class User(db.Model):
     
     def set_password(self, password):
             """Set user password."""
-            self.password = generate_password_hash(password)
+            self.password = offload.run(generate_password_hash, password)
         
     def check_password(self, password):
         """Check password with rate limiting."""
         if self.account_locked_until and self.account_locked_until > datetime.utcnow():
             return False
             
-        if not check_password_hash(self.password, password):
+        if not offload.run(check_password_hash, self.password, password):
             self.failed_login_attempts += 1
             self.last_login_attempt = datetime.utcnow()
             
@@ -220,6 +223,11 @@ class TrustedDevice(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Vérification d'un appareil à la connexion
+        db.Index('ix_trusted_devices_user_device', 'user_id', 'device_id'),
+    )
+    
     def update_last_used(self):
         """Update the last used timestamp."""
         self.last_used_at = datetime.utcnow()
@@ -255,6 +263,10 @@ class Schedule(db.Model):
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_schedules_creator', 'creator_id'),
+    )
+    
     # Relationships
      # Update relationships
     creator = db.relationship(
@@ -323,6 +335,12 @@ class ScheduleParticipant(db.Model):
     status = db.Column(db.String(10), nullable=False)  # pending, accepted, declined
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Agendas d'un participant; participants d'un agenda
+        db.Index('ix_schedule_participants_user', 'user_id'),
+        db.Index('ix_schedule_participants_schedule_user', 'schedule_id', 'user_id'),
+    )
+    
      # Update relationships
     schedule = db.relationship('Schedule', back_populates='participants')
     user = db.relationship('User', back_populates='schedule_participations')
@@ -4,6 +4,16 @@ from app.models.user import User
 from app.models.file import File
 from app.models.file_share import FileShare
 from app.utils.logging import log_action, Log
+from app.utils.blob_store import dedup_stats
+from app.utils.storage_gc import gc_metrics
+from app.utils.integrity import integrity_metrics
+from app.utils.object_cache import cache_metrics
+from app.utils.offload import offload_metrics
+from app.utils.access import acl_metrics
+from app.utils.search import search_metrics
+from app.utils.replicas import replica_metrics
+from app.utils.event_writer import event_writer_metrics
+from app.utils.quotas import get_usage, set_quota, usage_totals
 import datetime
 
 admin_bp = Blueprint('admin', __name__)
@@ -94,7 +104,8 @@ def get_stats():
     
     # Calculer les statistiques
     total_users = User.query.count()
-    total_files = File.query.count()
+    usage = usage_totals()
+    total_files = usage['file_count']
     total_shares = FileShare.query.count()
     
     # Statistiques des actions
@@ -111,6 +122,13 @@ def get_stats():
             "total": total_files,
             "shared": total_shares
         },
+        "storage": {**dedup_stats(), "gc": gc_metrics(), "integrity": integrity_metrics(),
+                    "cache": cache_metrics()},
+        "offload": offload_metrics(),
+        "acl": acl_metrics(),
+        "search": search_metrics(),
+        "replicas": replica_metrics(),
+        "event_writer": event_writer_metrics(),
         "actions": {
             "logins": login_count,
             "uploads": upload_count,
@@ -121,3 +139,29 @@ def get_stats():
     log_action('ADMIN_VIEW_STATS', current_user_id, f"Statistiques système consultées")
     
     return jsonify(result), 200
+
+@admin_bp.route('/users/<int:user_id>/quota', methods=['PUT'])
+@jwt_required()
+def set_user_quota(user_id):
+    """Définit le quota de stockage d'un utilisateur (réservé aux administrateurs)"""
+    current_user_id = get_jwt_identity()
+    
+    is_admin = int(current_user_id) == 1  # Simulation
+    
+    if not is_admin:
+        log_action('UNAUTHORIZED_ACCESS', current_user_id, f"Tentative d'accès non autorisé aux quotas")
+        return jsonify({"message": "Accès non autorisé"}), 403
+    
+    if not User.query.get(user_id):
+        return jsonify({"message": "Utilisateur introuvable"}), 404
+    
+    # null: quota par défaut, 0: illimité
+    quota_bytes = (request.get_json() or {}).get('quota_bytes')
+    if quota_bytes is not None and (type(quota_bytes) is not int or quota_bytes < 0):
+        return jsonify({"message": "Quota invalide"}), 400
+    
+    set_quota(user_id, quota_bytes)
+    
+    log_action('ADMIN_SET_QUOTA', current_user_id, f"Quota de l'utilisateur {user_id}: {quota_bytes}")
+    
+    return jsonify(get_usage(user_id)), 200
@@ -4,6 +4,7 @@ from app.models.user import User
 from app.models.file import File
 from app.models.file_share import FileShare
 from app.utils.logging import log_action
+from app.utils import access, feed
 import json
 
 collaboration_bp = Blueprint('collaboration', __name__)
@@ -22,15 +23,14 @@ def share_file():
     file_id = data['file_id']
     email = data['email']
     
-    # Vérifier si le fichier existe
-    file = File.query.get(file_id)
-    if not file:
+    # Vérifier que le fichier existe et que l'utilisateur en est le propriétaire
+    allowed = access.can(current_user_id, file_id, 'own')
+    if allowed is None:
         return jsonify({'message': 'Fichier non trouvé'}), 404
-    
-    # Vérifier si l'utilisateur est le propriétaire du fichier
-    if file.owner_id != current_user_id:
+    if not allowed:
         log_action('UNAUTHORIZED_SHARE', current_user_id, f"Tentative de partage non autorisée du fichier {file_id}")
         return jsonify({'message': 'Vous n\'êtes pas autorisé à partager ce fichier'}), 403
+    file = File.query.get(file_id)
     
     # Trouver l'utilisateur avec qui partager
     user = User.query.filter_by(email=email).first()
@@ -47,7 +47,9 @@ def share_file():
         file_id=file_id,
         user_id=user.id
     )
+    feed.subscribe(file_id, user.id)
     new_share.save()
+    access.invalidate(file_id, user.id)
     
     # Journaliser l'action
     log_action('SHARE_FILE', current_user_id, f"Fichier {file.name} partagé avec {user.email}")
@@ -155,23 +157,25 @@ def revoke_share():
     file_id = data['file_id']
     user_id = data['user_id']
     
-    # Vérifier si le fichier existe
-    file = File.query.get(file_id)
-    if not file:
+    # Vérifier que le fichier existe et que l'utilisateur en est le propriétaire
+    allowed = access.can(current_user_id, file_id, 'own')
+    if allowed is None:
         return jsonify({'message': 'Fichier non trouvé'}), 404
-    
-    # Vérifier si l'utilisateur est le propriétaire du fichier
-    if file.owner_id != current_user_id:
+    if not allowed:
         log_action('UNAUTHORIZED_REVOKE', current_user_id, f"Tentative de révocation non autorisée du partage du fichier {file_id}")
         return jsonify({'message': 'Vous n\'êtes pas autorisé à révoquer ce partage'}), 403
     
+    file = File.query.get(file_id)
+    
     # Vérifier si le partage existe
     share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
     if not share:
         return jsonify({'message': 'Partage non trouvé'}), 404
     
-    # Supprimer le partage
+    # Supprimer le partage (et le fichier du fil de l'utilisateur)
+    feed.unsubscribe(file_id, user_id)
     share.delete()
+    access.invalidate(file_id, user_id)
     
     # Journaliser l'action
     user = User.query.get(user_id)
@@ -1,19 +1,29 @@
 """File handling routes for the application."""
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import db,User
 from    app.models.file import File , Activity, Message
 from    app. models.file_share import FileShare
+from app.models.blob import Blob
 from werkzeug.utils import secure_filename
 import os
+import shutil
 import uuid
+import hashlib
+import zipfile
 from datetime import datetime
 from google.cloud import storage
 import mimetypes
 from app.config.config import Config
 from app.utils.logging import log_action
-from app.utils.encryption import encrypt_file, decrypt_file
-from app.utils.storage import upload_file, download_file, delete_file
+from app.utils.encryption import (
+    encrypt_stream, iter_decrypt, iter_decrypt_stream, iter_decrypt_range, inspect_container,
+    generate_data_key, unwrap_data_key
+)
+from app.utils.storage import open_file, delete_file as remove_stored_file
+from app.utils import access, blob_store, compression, cursors, event_writer, feed, integrity, offload, quotas, search, thumbnails
+from app.utils.access import require_file_access
+from app.utils.zip_stream import iter_zip, unique_name
 files_bp = Blueprint('files', __name__)
 
 def allowed_file(filename):
@@ -21,30 +31,130 @@ def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'zip'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Sortable columns of the file listing, with the type of their cursor value; ties are broken by id
+LIST_SORTS = {
+    'created_at': (File.created_at, datetime),
+    'updated_at': (File.updated_at, datetime),
+    'name': (File.name, str),
+    'size': (File.size, int),
+}
+
 @files_bp.route('/files', methods=['GET'])
 @jwt_required()
 def list_files():
-    """List all files accessible to the user."""
-    user_id = get_jwt_identity()
-    
-    # Get user's own files
-    own_files = File.query.filter_by(owner_id=user_id).all()
+    """List the files accessible to the user, one page at a time."""
+    user_id = int(get_jwt_identity())
     
-    # Get files shared with the user
-    shared_files = File.query.join(FileShare).filter(FileShare.user_id == user_id).all()
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc')
+    if sort not in LIST_SORTS or order not in ('asc', 'desc'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    try:
+        limit = int(request.args.get('limit', Config.FILE_LIST_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = max(1, min(limit, Config.FILE_LIST_MAX_PAGE_SIZE))
+    
+    # Own files and files shared with the caller in one statement: the caller's
+    # share comes back as a column, owners and share users are joined eagerly.
+    # Each side of the OR is an index lookup (owner, then the caller's shares).
+    my_share = db.aliased(FileShare)
+    shared_ids = db.select(FileShare.file_id).where(FileShare.user_id == user_id)
+    query = db.session.query(File, my_share.permission).outerjoin(my_share, db.and_(
+        my_share.file_id == File.id, my_share.user_id == user_id
+    )).filter(
+        db.or_(File.owner_id == user_id, File.id.in_(shared_ids))
+    ).options(
+        db.joinedload(File.owner),
+        db.joinedload(File.shares).joinedload(FileShare.user)
+    )
+    
+    # Keyset pagination: resume after the last row of the previous page
+    column, value_type = LIST_SORTS[sort]
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_sort, cursor_order, value, last_id = cursors.decode(cursor, str, str, value_type, int)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if (cursor_sort, cursor_order) != (sort, order):
+            return jsonify({'error': 'Cursor does not match the requested sort'}), 400
+        if order == 'asc':
+            query = query.filter(db.or_(column > value, db.and_(column == value, File.id > last_id)))
+        else:
+            query = query.filter(db.or_(column < value, db.and_(column == value, File.id < last_id)))
+    if order == 'asc':
+        query = query.order_by(column.asc(), File.id.asc())
+    else:
+        query = query.order_by(column.desc(), File.id.desc())
+    
+    # One extra row tells whether another page follows
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = cursors.encode(sort, order, getattr(last, sort), last.id)
     
-    # Combine and format the results
     all_files = []
-    for file in own_files + shared_files:
+    for file, permission in rows:
         file_dict = file.to_dict()
-        # Add sharing status
         file_dict['is_owner'] = file.owner_id == user_id
         if not file_dict['is_owner']:
-            share = FileShare.query.filter_by(file_id=file.id, user_id=user_id).first()
-            file_dict['permission'] = share.permission if share else 'read'
+            file_dict['permission'] = permission or 'read'
         all_files.append(file_dict)
     
-    return jsonify({'files': all_files})
+    return jsonify({'files': all_files, 'next_cursor': next_cursor})
+
+def register_file(name, blob, mime_type, owner_id):
+    """Create the File row for a stored blob, with its activity and log entries."""
+    new_file = File(
+        name=name,
+        storage_path=blob.storage_path,
+        size=blob.size,
+        mime_type=mime_type,
+        owner_id=owner_id,
+        encryption_key=blob.encryption_key,
+        content_hash=blob.content_hash,
+        compression=blob.compression,
+        merkle_root=blob.merkle_root,
+        blob_id=blob.id
+    )
+    db.session.add(new_file)
+    # Usage counters move in the same transaction as the file row
+    quotas.charge(owner_id, blob.size, mime_type)
+    db.session.flush()
+    # The layout migration may have moved the blob since it was acquired: take its current
+    # path, with the blob row locked so that a concurrent move waits and then updates this file too
+    new_file.storage_path = db.session.query(Blob.storage_path).filter(Blob.id == blob.id) \
+        .with_for_update().scalar()
+    db.session.commit()  # Commit to get the file id
+    
+    # The activity and the log entry are committed in batches by the event writer
+    event_writer.record(Activity(
+        type='upload',
+        file_id=new_file.id,
+        user_id=owner_id
+    ))
+    
+    # Log action
+    log_action('UPLOAD', owner_id, f"File uploaded: {name}")
+    
+    # Previews are rendered off the request path and shared by identical uploads
+    if thumbnails.is_eligible(mime_type) and not blob.thumbnail_path:
+        thumbnails.schedule(current_app._get_current_object(), blob.id)
+    
+    return new_file
+
+def _encrypt_upload(stream, filename, mime_type, encrypted_path, data_key):
+    """Hash, compress (unless already compressed) and encrypt an upload; runs in the offload pool."""
+    hasher = hashlib.sha256()
+    source, codec = compression.prepare_stream(stream, filename, mime_type, hasher)
+    # The Merkle tree covers the stored ciphertext and is built as it is written
+    merkle = integrity.MerkleHasher()
+    with open(encrypted_path, 'wb') as encrypted_file:
+        encrypt_stream(source, integrity.HashingWriter(encrypted_file, merkle), data_key)
+    return hasher.hexdigest(), codec, (merkle.root(), merkle.leaves())
 
 @files_bp.route('/files/upload', methods=['POST'])
 @jwt_required()
@@ -52,6 +162,12 @@ def upload():
     """Upload a new file."""
     current_user_id = get_jwt_identity()
     
+    # Reject from the declared length, before the form body is read or spooled
+    try:
+        quotas.check_quota(int(current_user_id), request.content_length or 0)
+    except quotas.QuotaExceeded as e:
+        return jsonify(e.to_dict()), 413
+    
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -62,49 +178,36 @@ def upload():
     if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed'}), 400
     
+    temp_dir = None
     try:
         filename = secure_filename(file.filename)
-        temp_path = None
-        encrypted_path = None
-        
-        # Create upload directory if it doesn't exist
-        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         
-        # Save file temporarily
-        temp_path = os.path.join(Config.UPLOAD_FOLDER, f"temp_{filename}")
-        file.save(temp_path)
-        
-        # Encrypt file
-        encrypted_path = encrypt_file(temp_path)
-        
-        # Upload encrypted file to storage
-        storage_path = upload_file(encrypted_path, current_user_id)
-        
-        # Create and commit file record first
-        new_file = File(
-            name=filename,
-            storage_path=storage_path,
-            size=int(os.path.getsize(encrypted_path)),
-            mime_type=file.mimetype,
-            owner_id=int(current_user_id)
-        )
-        db.session.add(new_file)
-        db.session.commit()  # Commit to get the file id
+        # Per-request temp directory so concurrent uploads never share a path
+        temp_dir = os.path.join(Config.UPLOAD_FOLDER, 'temp', str(uuid.uuid4()))
+        os.makedirs(temp_dir, exist_ok=True)
         
-        # Now create and commit the activity record
-        activity = Activity(
-            type='upload',
-            file_id=new_file.id,  # Now we have the file id
-            user_id=int(current_user_id)
+        # The form is already spooled locally: the whole CPU-bound pipeline runs off the eventlet hub
+        # The data key comes first: its master-key lock must not be taken from a pool thread
+        data_key, wrapped_key = generate_data_key()
+        encrypted_path = os.path.join(temp_dir, f"{filename}.enc")
+        content_hash, codec, merkle = offload.run(
+            _encrypt_upload, file.stream, filename, file.mimetype, encrypted_path, data_key
         )
-        db.session.add(activity)
-        db.session.commit()
         
-        # Log action
-        log_action('UPLOAD', current_user_id, f"File uploaded: {filename}")
+        # Store the container, or reuse identical content that is already stored
+        blob, _ = blob_store.store(encrypted_path, content_hash, wrapped_key, codec, merkle)
+        try:
+            new_file = register_file(filename, blob, file.mimetype, int(current_user_id))
+        except Exception:
+            db.session.rollback()
+            blob_store.release(blob.id)
+            raise
         
         return jsonify({'file': new_file.to_dict()}), 201
         
+    except quotas.QuotaExceeded as e:
+        return jsonify(e.to_dict()), 413
+        
     except Exception as e:
         db.session.rollback()
         print(f"Upload error: {str(e)}")
@@ -113,38 +216,88 @@ def upload():
     finally:
         # Clean up temporary files
         try:
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-            if encrypted_path and os.path.exists(encrypted_path):
-                os.remove(encrypted_path)
+            if temp_dir and os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
         except Exception as e:
             print(f"Cleanup error: {str(e)}")
 
 
+@files_bp.route('/files/upload/hash', methods=['POST'])
+@jwt_required()
+def upload_by_hash():
+    """Create a file from content the server already stores, skipping the byte transfer."""
+    current_user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    filename = secure_filename(data.get('filename') or '')
+    content_hash = (data.get('content_hash') or '').lower()
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if len(content_hash) != 64 or any(c not in '0123456789abcdef' for c in content_hash):
+        return jsonify({'error': 'Invalid content hash'}), 400
+    
+    # Only content the user can already read is matched: knowing a digest must
+    # not be enough to obtain someone else's file. Other duplicates are still
+    # stored once, after a regular upload.
+    readable = File.query.outerjoin(FileShare, db.and_(
+        FileShare.file_id == File.id, FileShare.user_id == current_user_id
+    )).filter(
+        File.content_hash == content_hash,
+        File.blob_id.isnot(None),
+        db.or_(File.owner_id == current_user_id, FileShare.id.isnot(None))
+    ).first()
+    blob = blob_store.acquire(content_hash) if readable else None
+    if not blob:
+        return jsonify({'deduplicated': False}), 200
+    
+    try:
+        new_file = register_file(filename, blob, data.get('mime_type') or readable.mime_type, current_user_id)
+    except quotas.QuotaExceeded as e:
+        db.session.rollback()
+        blob_store.release(blob.id)
+        return jsonify(e.to_dict()), 413
+    except Exception as e:
+        db.session.rollback()
+        blob_store.release(blob.id)
+        print(f"Upload error: {str(e)}")
+        return jsonify({'error': 'File upload failed'}), 500
+    
+    return jsonify({'file': new_file.to_dict(), 'deduplicated': True}), 201
+
+
+@files_bp.route('/storage/usage', methods=['GET'])
+@jwt_required()
+def storage_usage():
+    """Return the caller's storage usage and quota."""
+    return jsonify({'usage': quotas.get_usage(int(get_jwt_identity()))})
+
+
 @files_bp.route('/files/<int:file_id>', methods=['DELETE'])
 @jwt_required()
+@require_file_access('delete', denied='Permission denied - must be file owner')
 def delete_file(file_id):
     """Delete a file."""
     try:
         current_user_id = int(get_jwt_identity())
         file = File.query.get_or_404(file_id)
 
-        # Check if user owns the file or has admin permission
-        if file.owner_id != current_user_id:
-            share = FileShare.query.filter_by(file_id=file_id, user_id=current_user_id).first()
-            if not share or share.permission != 'write':
-                return jsonify({'error': 'Permission denied - must be file owner'}), 403
-
-        # Delete file from storage if it exists
-        if file.storage_path and os.path.exists(file.storage_path):
-            os.remove(file.storage_path)
-
         # Log the action before deleting
         file_name = file.name
+        blob_id = file.blob_id
+        storage_path = file.storage_path
         
         # Delete the file - cascade will handle related records
+        quotas.credit(file.owner_id, file.size, file.mime_type)
+        feed.unsubscribe(file_id)
         db.session.delete(file)
         db.session.commit()
+        access.invalidate(file_id)
+
+        # Drop this file's reference to the shared content, or its own stored copy
+        if blob_id:
+            blob_store.release(blob_id)
+        elif storage_path:
+            remove_stored_file(storage_path)
 
         # Log after successful deletion
         log_action('DELETE_FILE', current_user_id, f'Deleted file: {file_name}')
@@ -156,84 +309,209 @@ def delete_file(file_id):
         print(f"Error deleting file: {str(e)}")
         return jsonify({'error': 'Failed to delete file'}), 500
     
+def _file_etag(file):
+    """Strong validator for the stored version of a file."""
+    # The content hash survives storage moves; older files fall back to their path
+    return hashlib.sha256(f"{file.id}:{file.content_hash or file.storage_path}".encode()).hexdigest()[:32]
+
 @files_bp.route('/files/<file_id>/download', methods=['GET'])
 @jwt_required()
+@require_file_access('read')
 def download(file_id):
-    """Download a file."""
+    """Download a file, honouring conditional and single byte-range requests."""
     user_id = int(get_jwt_identity())
     file = File.query.get_or_404(file_id)
     
+    # Unchanged file: answer from the validator without touching storage
+    etag = _file_etag(file)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
     
-    
-    # Check permissions
-    if file.owner_id != user_id:
-        share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
-        if not share:
-            return jsonify({'error': 'Permission denied'}), 403
+    try:
+        # Lire directement l'objet stocké, sans copie temporaire
+        stored_file = open_file(file.storage_path)
+    except Exception as e:
+        return jsonify({'message': f'Erreur lors du téléchargement: {str(e)}'}), 500
     
     try:
-        # Download from Google Cloud Storage
-       #bucket = current_app.extensions['storage_bucket']
-       #blob = bucket.blob(file.storage_path)
-        
-        
-        # Créer le répertoire temporaire s'il n'existe pas
-        temp_dir = os.path.join(Config.UPLOAD_FOLDER, 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Télécharger le fichier chiffré depuis GCP Storage
-        encrypted_path = download_file(file.storage_path, temp_dir)
-        
-        # Déchiffrer le fichier
-        decrypted_path = decrypt_file(encrypted_path)
-        
-        # Journaliser l'action
-        log_action('DOWNLOAD', user_id, f"Fichier téléchargé: {file.name}")
-        
-        
-        
-        
-        # Create temporary file
-       #temp_path = f"/tmp/{file.name}"
-        #blob.download_to_filename(temp_path)
-
-        
-        # Create activity record
-        activity = Activity(
-            type='download',
-            file_id=file_id,
-            user_id=user_id
-        )
-        db.session.add(activity)
-        db.session.commit()
-        
-        
-        
-        return send_file(
-            decrypted_path,
-            as_attachment=True,
-            download_name=file.name,
-            mimetype=file.mime_type
+        # Les anciens fichiers sans clé de données utilisent une clé dérivée du sel
+        data_key = unwrap_data_key(file.encryption_key) if file.encryption_key else None
+        sizes = inspect_container(stored_file)
+        
+        status = 200
+        headers = {
+            'Content-Disposition': f'attachment; filename="{file.name}"',
+            'Cache-Control': 'private, no-cache'
+        }
+        if sizes is None:
+            # Ancien format Fernet: pas d'accès aléatoire possible
+            chunks = iter_decrypt_stream(stored_file, data_key)
+            start = 0
+        elif file.compression:
+            # Compressed content has no plaintext offsets: always stream it whole
+            headers['Accept-Ranges'] = 'none'
+            chunks = compression.iter_decompress(iter_decrypt(stored_file, data_key), file.compression)
+            start = 0
+        else:
+            container_size, length = sizes
+            start, stop = 0, length
+            headers['Accept-Ranges'] = 'bytes'
+            
+            byte_range = request.range
+            if byte_range and (request.if_range.etag is None or request.if_range.etag == etag) \
+                    and request.if_range.date is None:
+                satisfiable = byte_range.range_for_length(length)
+                if satisfiable is None and len(byte_range.ranges) == 1:
+                    stored_file.close()
+                    response = Response(status=416)
+                    response.headers['Content-Range'] = f'bytes */{length}'
+                    return response
+                if satisfiable is not None:
+                    start, stop = satisfiable
+                    status = 206
+                    headers['Content-Range'] = f'bytes {start}-{stop - 1}/{length}'
+            
+            headers['Content-Length'] = str(stop - start)
+            chunks = iter_decrypt_range(stored_file, container_size, start, stop, data_key)
+        
+        # Only the first request of a ranged transfer counts as a download
+        # (written by the event writer: the download itself commits nothing)
+        if start == 0:
+            log_action('DOWNLOAD', user_id, f"Fichier téléchargé: {file.name}")
+            event_writer.record(Activity(
+                type='download',
+                file_id=file_id,
+                user_id=user_id
+            ))
+        
+        def generate():
+            try:
+                for chunk in chunks:
+                    yield chunk
+            finally:
+                stored_file.close()
+        
+        response = Response(
+            stream_with_context(generate()),
+            status=status,
+            mimetype=file.mime_type,
+            headers=headers,
+            direct_passthrough=True
         )
+        response.set_etag(etag)
+        return response
         
     except Exception as e:
+        stored_file.close()
+        db.session.rollback()
         return jsonify({'message': f'Erreur lors du téléchargement: {str(e)}'}), 500
 
-@files_bp.route('/files/<file_id>/share', methods=['POST'])
+def _iter_member(storage_path, encryption_key, codec):
+    """Decrypt one archive member, opening its stored object only when its turn comes."""
+    data_key = unwrap_data_key(encryption_key) if encryption_key else None
+    with open_file(storage_path) as stored_file:
+        yield from compression.iter_decompress(iter_decrypt_stream(stored_file, data_key), codec)
+
+@files_bp.route('/files/download/zip', methods=['POST'])
 @jwt_required()
-def share_file(file_id):
-    """Share a file with another user."""
+def download_zip():
+    """Stream several readable files as one ZIP archive built on the fly."""
     user_id = int(get_jwt_identity())
-
+    data = request.get_json(silent=True) or {}
+    file_ids = data.get('file_ids')
+    if not isinstance(file_ids, list) or not file_ids:
+        return jsonify({'error': 'file_ids must be a non-empty list'}), 400
+    try:
+        file_ids = list(dict.fromkeys(int(file_id) for file_id in file_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'file_ids must contain integers'}), 400
+    if len(file_ids) > Config.ZIP_MAX_FILES:
+        return jsonify({'error': f'At most {Config.ZIP_MAX_FILES} files per archive'}), 400
+    
+    # One query for every permission check: owned or shared with the user
+    files = File.query.outerjoin(
+        FileShare, db.and_(FileShare.file_id == File.id, FileShare.user_id == user_id)
+    ).filter(
+        File.id.in_(file_ids),
+        db.or_(File.owner_id == user_id, FileShare.id.isnot(None))
+    ).all()
+    if len(files) != len(file_ids):
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    order = {file_id: position for position, file_id in enumerate(file_ids)}
+    files.sort(key=lambda file: order[file.id])
+    
+    used_names = set()
+    members = []
+    activities = []
+    for file in files:
+        # Uncompressed plaintext is never larger than its container; compressed sizes are unknown
+        large = bool(file.compression) or file.size >= zipfile.ZIP64_LIMIT
+        members.append((
+            unique_name(file.name, used_names),
+            file.updated_at or file.created_at,
+            _iter_member(file.storage_path, file.encryption_key, file.compression),
+            compression.should_compress(file.name, file.mime_type),
+            large
+        ))
+        activities.append(Activity(type='download', file_id=file.id, user_id=user_id))
+    for activity in activities:
+        event_writer.record(activity)
+    log_action('DOWNLOAD', user_id, f"Archive téléchargée: {len(files)} fichiers")
+    
+    return Response(
+        stream_with_context(iter_zip(members)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': 'attachment; filename="files.zip"',
+            'Cache-Control': 'private, no-store'
+        },
+        direct_passthrough=True
+    )
+
+@files_bp.route('/files/<int:file_id>/thumbnail', methods=['GET'])
+@jwt_required()
+@require_file_access('read')
+def thumbnail(file_id):
+    """Serve the encrypted preview of an image, cacheable for as long as its content."""
     file = File.query.get_or_404(file_id)
     
-    # Check ownership
-    # Check ownership or write-permission
-    if file.owner_id != user_id:
-        share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
-        if not share or share.permission != 'write':
-            return jsonify({'error': 'Only the owner or users with write access can share this file'}), 403
+    blob = file.blob
+    if blob is None or not thumbnails.is_eligible(file.mime_type):
+        return jsonify({'error': 'No preview available for this file'}), 404
+    if not blob.thumbnail_path:
+        # Uploaded before previews existed, or still rendering
+        thumbnails.schedule(current_app._get_current_object(), blob.id)
+        return jsonify({'error': 'Preview not ready yet'}), 404
+    
+    # Thumbnails are addressed by content: the validator never changes
+    etag = f"thumb-{blob.content_hash[:32]}"
+    cache_control = 'private, max-age=31536000, immutable'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+    
+    try:
+        data = thumbnails.read_thumbnail(blob)
+    except Exception as e:
+        print(f"Error reading thumbnail: {str(e)}")
+        return jsonify({'error': 'Failed to read preview'}), 500
+    
+    response = Response(data, mimetype=thumbnails.thumbnail_mime_type(blob.thumbnail_path))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
 
+@files_bp.route('/files/<file_id>/share', methods=['POST'])
+@jwt_required()
+@require_file_access('share', denied='Only the owner or users with write access can share this file')
+def share_file(file_id):
+    """Share a file with another user."""
+    user_id = int(get_jwt_identity())
     
     data = request.get_json()
     email = data.get('email')
@@ -268,6 +546,8 @@ def share_file(file_id):
                 permission=permission
             )
             db.session.add(new_share)
+            # The new recipient sees the file's recent history in their feed
+            feed.subscribe(int(file_id), share_user.id)
         
         # Create activity record
         activity = Activity(
@@ -276,7 +556,9 @@ def share_file(file_id):
             user_id=user_id
         )
         db.session.add(activity)
+        feed.publish(activity)
         db.session.commit()
+        access.invalidate(file_id, share_user.id)
         
         return jsonify({'message': 'File shared successfully'})
     except Exception as e:
@@ -288,6 +570,7 @@ def share_file(file_id):
 
 @files_bp.route('/files/<int:file_id>/share/<int:user_id>', methods=['PUT'])
 @jwt_required()
+@require_file_access('manage', denied='Permission denied - must be file owner or admin')
 def update_file_share(file_id: int, user_id: int):
     """Update file share permissions for a user."""
     try:
@@ -298,12 +581,6 @@ def update_file_share(file_id: int, user_id: int):
             return jsonify({'error': 'Permission level is required'}), 400
 
         file = File.query.get_or_404(file_id)
-        
-        # Check if current user is the file owner or has admin permissions
-        if not (file.owner_id == current_user_id or 
-                any(share.user_id == current_user_id and share.permission == 'admin' 
-                    for share in file.shares)):
-            return jsonify({'error': 'Permission denied - must be file owner or admin'}), 403
 
         # Find the share to update
         share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
@@ -317,6 +594,7 @@ def update_file_share(file_id: int, user_id: int):
         # Update permission
         share.permission = data['permission']
         db.session.commit()
+        access.invalidate(file_id, user_id)
 
         # Log the action
         log_action(
@@ -342,14 +620,12 @@ def update_file_share(file_id: int, user_id: int):
 
 @files_bp.route('/files/<int:file_id>/share/<int:user_id>', methods=['DELETE'])
 @jwt_required()
+@require_file_access('own', denied='Permission denied - must be file owner')
 def remove_file_share(file_id: int, user_id: int):
     """Remove file share for a specific user."""
     try:
         current_user_id = int(get_jwt_identity())   
         file = File.query.get_or_404(file_id)
-        # Check if current user is the file owner
-        if not (file.owner_id == current_user_id):
-            return jsonify({'error': 'Permission denied - must be file owner'}), 403
 
         # Check if target user has a share
         share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
@@ -361,7 +637,9 @@ def remove_file_share(file_id: int, user_id: int):
             return jsonify({'error': 'Cannot remove owner share'}), 403
             
         db.session.delete(share)
+        feed.unsubscribe(file_id, user_id)
         db.session.commit()
+        access.invalidate(file_id, user_id)
         
         # Log the action
         log_action('REMOVE_SHARE', current_user_id, f'Removed share for file {file_id} from user {user_id}')
@@ -418,35 +696,64 @@ def remove_share(file_id):
 @files_bp.route('/activities', methods=['GET'])
 @jwt_required()
 def list_activities():
-    """List recent activities."""
+    """List recent activities from the user's feed, newest first."""
     user_id = int(get_jwt_identity())
     
-    # Get activities for user's own files and shared files
-    activities = Activity.query.join(File).filter(
-        (File.owner_id == user_id) |
-        (File.id.in_(
-            db.session.query(FileShare.file_id)
-            .filter(FileShare.user_id == user_id)
-        ))
-    ).order_by(Activity.created_at.desc()).limit(50).all()
+    try:
+        limit = int(request.args.get('limit', Config.FEED_PAGE_SIZE))
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or since parameter'}), 400
+    limit = max(1, min(limit, Config.FEED_MAX_PAGE_SIZE))
+    
+    # Entries were written when the activities happened: one indexed range read
+    try:
+        entries, next_cursor = feed.read(user_id, limit, request.args.get('cursor'), since)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'activities': [activity.to_dict() for activity in activities]
+        'activities': [entry.to_dict() for entry in entries],
+        'next_cursor': next_cursor
     })
 
+@files_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_content():
+    """Search file names, file discussions and chat messages visible to the user."""
+    user_id = int(get_jwt_identity())
+    text = request.args.get('q', '')
+
+    try:
+        limit = int(request.args.get('limit', Config.SEARCH_PAGE_SIZE))
+        offset = 0
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_text, offset = cursors.decode(cursor, str, int)
+            if cursor_text != text:
+                return jsonify({'error': 'Cursor does not match the search query'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor parameter'}), 400
+    limit = max(1, min(limit, Config.SEARCH_MAX_PAGE_SIZE))
+
+    # Results are ranked, so pages are addressed by position; one extra hit tells whether more follow
+    try:
+        results = search.search(user_id, text, limit + 1, offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = cursors.encode(text, offset + limit)
+
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
 @files_bp.route('/files/<file_id>/activities', methods=['GET'])
 @jwt_required()
+@require_file_access('read')
 def list_file_activities(file_id):
     """List activities for a specific file."""
-    user_id = int(get_jwt_identity())
-    file = File.query.get_or_404(file_id)
-    
-    # Check permissions
-    if file.owner_id != user_id:
-        share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
-        if not share:
-            return jsonify({'error': 'Permission denied'}), 403
-    
     activities = Activity.query.filter_by(file_id=file_id)\
         .order_by(Activity.created_at.desc()).all()
     
@@ -456,36 +763,74 @@ def list_file_activities(file_id):
 
 @files_bp.route('/files/<file_id>/messages', methods=['GET'])
 @jwt_required()
+@require_file_access('read')
 def list_messages(file_id):
-    """List messages for a file."""
-    user_id = int(get_jwt_identity())
-    file = File.query.get_or_404(file_id)
-    
-    # Check permissions
-    if file.owner_id != user_id:
-        share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
-        if not share:
-            return jsonify({'error': 'Permission denied'}), 403
-    
-    messages = Message.query.filter_by(file_id=file_id)\
-        .order_by(Message.created_at.asc()).all()
-    
+    """List a file's discussion, oldest message first.
+    
+    Without parameters the whole discussion is returned, as existing clients
+    expect. With any paging parameter a page is returned: ``limit`` alone
+    gives the latest page, ``before`` pages back through older messages,
+    ``after`` (a cursor) or ``since`` (a timestamp) return only newer ones,
+    for incremental polling.
+    """
+    paged = any(name in request.args for name in ('limit', 'before', 'after', 'since'))
+    try:
+        limit = int(request.args.get('limit', Config.MESSAGE_PAGE_SIZE))
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since) if since else None
+        before = request.args.get('before')
+        before = cursors.decode(before, datetime, str) if before else None
+        after = request.args.get('after')
+        after = cursors.decode(after, datetime, str) if after else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit, cursor or since parameter'}), 400
+    limit = max(1, min(limit, Config.MESSAGE_MAX_PAGE_SIZE))
+    
+    # Range read on the (file_id, created_at) index, authors joined in the same statement
+    query = Message.query.options(db.joinedload(Message.user)).filter(Message.file_id == int(file_id))
+    if before:
+        query = query.filter(db.or_(
+            Message.created_at < before[0],
+            db.and_(Message.created_at == before[0], Message.id < before[1])
+        ))
+    if after:
+        query = query.filter(db.or_(
+            Message.created_at > after[0],
+            db.and_(Message.created_at == after[0], Message.id > after[1])
+        ))
+    if since:
+        query = query.filter(Message.created_at > since)
+    
+    # Newer messages are read forwards, the latest page and older ones backwards
+    forwards = bool(after or since)
+    if forwards:
+        query = query.order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+    if paged:
+        messages = query.limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    else:
+        messages, has_more = query.all(), False
+    if not forwards:
+        messages.reverse()
+    
+    first, last = (messages[0], messages[-1]) if messages else (None, None)
     return jsonify({
-        'messages': [message.to_dict() for message in messages]
+        'messages': [message.to_dict() for message in messages],
+        'has_more': has_more,
+        # Cursor for older messages, and for polling newer ones (unchanged when nothing is new)
+        'before': cursors.encode(first.created_at, first.id) if first else None,
+        'after': cursors.encode(last.created_at, last.id) if last else request.args.get('after'),
     })
 
 @files_bp.route('/files/<file_id>/messages', methods=['POST'])
 @jwt_required()
+@require_file_access('read')
 def create_message(file_id):
     """Create a new message for a file."""
     user_id = int(get_jwt_identity())
-    file = File.query.get_or_404(file_id)
-    
-    # Check permissions
-    if file.owner_id != user_id:
-        share = FileShare.query.filter_by(file_id=file_id, user_id=user_id).first()
-        if not share:
-            return jsonify({'error': 'Permission denied'}), 403
     
     data = request.get_json()
     content = data.get('content')
@@ -510,6 +855,7 @@ def create_message(file_id):
         
         db.session.add(message)
         db.session.add(activity)
+        feed.publish(activity)
         db.session.commit()
         
         return jsonify({'message': message.to_dict()}), 201
@@ -533,22 +879,13 @@ from app.models.user import User
 
 @files_bp.route('/files/<file_id>/shared-users', methods=['GET'])
 @jwt_required()
+@require_file_access('read', denied='Unauthorized')
 def get_file_shared_users(file_id):
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user_id = int(get_jwt_identity())
 
     # Get file with eager loading of relationships
     file = File.query.get(file_id)
 
-    if not file:
-        return jsonify({'error': 'File not found'}), 404
-
-    # Check if user is owner or has access to the file
-    if file.owner_id != current_user.id and not any(
-        share.user_id == current_user.id for share in file.shares
-    ):
-        return jsonify({'error': 'Unauthorized'}), 403
-
     shared_users = [
         {
             "id": share.user.id,
@@ -557,7 +894,7 @@ def get_file_shared_users(file_id):
             "permission": share.permission
         }
         for share in file.shares
-        if share.user and share.user.id != current_user.id
+        if share.user and share.user.id != current_user_id
     ]
 
     return jsonify({
@@ -0,0 +1,196 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.utils import secure_filename
+from app.models.user import db
+from app.models.upload_session import UploadSession
+from app.config.config import Config
+from app.routes.files2 import allowed_file, register_file
+from app.utils.encryption import encrypted_size, generate_data_key
+from app.utils import blob_store, quotas
+from app.utils.upload_sessions import (
+    UploadError,
+    append_chunk,
+    discard,
+    finalize_digest,
+    partial_path,
+    session_lock,
+)
+
+uploads_bp = Blueprint('uploads', __name__)
+
+
+def _get_session(session_id, user_id):
+    """Return the caller's open upload session, or an error response."""
+    session = UploadSession.query.filter_by(id=session_id, owner_id=int(user_id)).first()
+    if not session:
+        return None, (jsonify({'error': 'Upload session not found'}), 404)
+    if session.status != 'open':
+        return None, (jsonify({'error': f'Upload session is {session.status}'}), 409)
+    if session.expires_at < datetime.utcnow():
+        return None, (jsonify({'error': 'Upload session expired'}), 410)
+    return session, None
+
+
+@uploads_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_session():
+    """Open a resumable upload session."""
+    current_user_id = get_jwt_identity()
+    data = request.get_json() or {}
+
+    filename = secure_filename(data.get('filename') or '')
+    if not filename:
+        return jsonify({'error': 'No file selected'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+
+    try:
+        total_size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'File size is required'}), 400
+    if total_size < 0 or total_size > Config.MAX_UPLOAD_SIZE:
+        return jsonify({'error': 'File too large', 'max_size': Config.MAX_UPLOAD_SIZE}), 413
+    # Refus avant le premier morceau: le fichier complet ne tiendrait pas dans le quota.
+    # Le quota est imputé sur la taille du conteneur chiffré (File.size), et les
+    # morceaux sont chiffrés sans compression: cette taille est connue d'avance.
+    try:
+        quotas.check_quota(int(current_user_id), encrypted_size(total_size))
+    except quotas.QuotaExceeded as e:
+        return jsonify(e.to_dict()), 413
+
+    _, wrapped_key = generate_data_key()
+    session = UploadSession(
+        owner_id=int(current_user_id),
+        filename=filename,
+        mime_type=data.get('mime_type') or 'application/octet-stream',
+        total_size=total_size,
+        chunk_size=Config.UPLOAD_CHUNK_SIZE,
+        encryption_key=wrapped_key,
+        expires_at=datetime.utcnow() + Config.UPLOAD_SESSION_TTL
+    )
+    db.session.add(session)
+    db.session.commit()
+
+    return jsonify({'upload': session.to_dict()}), 201
+
+
+@uploads_bp.route('/uploads/<session_id>', methods=['GET'])
+@jwt_required()
+def get_session(session_id):
+    """Return the state of an upload session, including the received offset."""
+    session = UploadSession.query.filter_by(id=session_id, owner_id=int(get_jwt_identity())).first()
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+    return jsonify({'upload': session.to_dict()})
+
+
+@uploads_bp.route('/uploads/<session_id>/chunks/<int:index>', methods=['PUT'])
+@jwt_required()
+def put_chunk(session_id, index):
+    """Receive one chunk as the raw request body."""
+    session, error = _get_session(session_id, get_jwt_identity())
+    if error:
+        return error
+
+    if index < 0 or index >= session.total_chunks:
+        return jsonify({'error': 'Invalid chunk index'}), 400
+    expected = session.expected_chunk_length(index)
+    if (request.content_length or 0) != expected:
+        return jsonify({'error': 'Invalid chunk size', 'expected': expected}), 400
+
+    with session_lock(session.id):
+        db.session.refresh(session)
+        # Morceau déjà reçu: le client rejoue après une coupure, rien à faire
+        if index < session.next_chunk:
+            return jsonify({'upload': session.to_dict()})
+        if index != session.next_chunk:
+            return jsonify({'error': 'Unexpected chunk', 'next_chunk': session.next_chunk}), 409
+
+        try:
+            received = append_chunk(session, index, request.stream)
+        except UploadError as e:
+            return jsonify({'error': str(e), 'next_chunk': session.next_chunk}), 400
+
+        session.received_bytes += received
+        session.next_chunk = index + 1
+        db.session.commit()
+
+    return jsonify({'upload': session.to_dict()})
+
+
+@uploads_bp.route('/uploads/<session_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_session(session_id):
+    """Turn a fully received upload session into a file."""
+    current_user_id = get_jwt_identity()
+    session, error = _get_session(session_id, current_user_id)
+    if error:
+        return error
+
+    with session_lock(session.id):
+        db.session.refresh(session)
+        if session.next_chunk < session.total_chunks or session.received_bytes != session.total_size:
+            return jsonify({'error': 'Upload incomplete', 'next_chunk': session.next_chunk}), 409
+
+        # Les morceaux reçus restent en place: le client peut libérer de l'espace puis réessayer
+        try:
+            quotas.check_quota(session.owner_id, encrypted_size(session.total_size))
+        except quotas.QuotaExceeded as e:
+            return jsonify(e.to_dict()), 413
+
+        consumed = False
+        try:
+            content_hash = finalize_digest(session)
+
+            # Le conteneur est déjà chiffré: il est déplacé tel quel, ou ignoré si le contenu existe déjà
+            blob, _ = blob_store.store(partial_path(session), content_hash, session.encryption_key)
+            consumed = True
+            try:
+                new_file = register_file(session.filename, blob, session.mime_type, session.owner_id)
+            except Exception:
+                db.session.rollback()
+                blob_store.release(blob.id)
+                raise
+
+            session.status = 'complete'
+            session.file_id = new_file.id
+            db.session.commit()
+            discard(session)
+
+            return jsonify({'file': new_file.to_dict(), 'upload': session.to_dict()}), 201
+
+        except quotas.QuotaExceeded as e:
+            # Quota atteint entre-temps par un autre téléversement: le conteneur a déjà été consommé
+            session.status = 'aborted'
+            db.session.commit()
+            discard(session)
+            return jsonify(e.to_dict()), 413
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Upload finalize error: {str(e)}")
+            if not consumed:
+                # Les morceaux reçus sont toujours là: une nouvelle tentative est possible
+                return jsonify({'error': 'Upload failed, retry completing the upload'}), 500
+            # Le conteneur a quitté la session: elle ne peut plus aboutir, le client doit recommencer
+            session.status = 'failed'
+            db.session.commit()
+            discard(session)
+            return jsonify({'error': 'Upload failed, start a new upload', 'upload': session.to_dict()}), 500
+
+
+@uploads_bp.route('/uploads/<session_id>', methods=['DELETE'])
+@jwt_required()
+def abort_session(session_id):
+    """Abort an upload session and drop the received chunks."""
+    session, error = _get_session(session_id, get_jwt_identity())
+    if error:
+        return error
+
+    with session_lock(session.id):
+        session.status = 'aborted'
+        db.session.commit()
+        discard(session)
+
+    return jsonify({'message': 'Upload aborted'})
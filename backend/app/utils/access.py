@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+from app.config.config import Config
+from app.models.user import db
+from app.models.file import File
+from app.models.file_share import FileShare
+from app.utils.logging import log_action
+
+# Rôles autorisés pour chaque action: 'owner' pour le propriétaire, sinon la
+# permission du partage de l'utilisateur. Les permissions ne sont pas ordonnées:
+# un partage 'admin' gère les droits mais ne peut ni supprimer ni repartager.
+ACTIONS = {
+    'read': None,                  # tout partage: télécharger, lire les activités et les messages, commenter
+    'write': {'owner', 'write'},
+    'share': {'owner', 'write'},   # partager avec un autre utilisateur
+    'delete': {'owner', 'write'},
+    'manage': {'owner', 'admin'},  # modifier les droits des autres utilisateurs
+    'own': {'owner'},              # révoquer un partage
+}
+
+
+class AccessCache:
+    """
+    Cache en mémoire du rôle (fichier, utilisateur) -> rôle.
+
+    Propre à chaque processus: les entrées expirent après ``ttl`` secondes,
+    ce qui borne le délai de prise en compte d'un changement fait par un
+    autre processus. Les routes qui modifient les partages ou suppriment un
+    fichier invalident les entrées concernées dans leur processus.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (id du fichier, id de l'utilisateur) -> (rôle, expiration)
+        self._users = {}  # id du fichier -> utilisateurs en cache
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, file_id, user_id):
+        """
+        Returns:
+            tuple: (trouvé, rôle) ; le rôle est vide sans accès
+        """
+        key = (file_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._forget(key)
+                self._metrics['expired'] += 1
+                entry = None
+            if entry is None:
+                self._metrics['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return True, entry[0]
+
+    def put(self, file_id, user_id, role):
+        key = (file_id, user_id)
+        with self._lock:
+            self._entries[key] = (role, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._users.setdefault(file_id, set()).add(user_id)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+                self._metrics['evictions'] += 1
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        users = self._users.get(key[0])
+        if users is not None:
+            users.discard(key[1])
+            if not users:
+                del self._users[key[0]]
+
+    def invalidate(self, file_id, user_id=None):
+        """Oublie l'accès d'un utilisateur à un fichier, ou de tous ses utilisateurs."""
+        with self._lock:
+            user_ids = [user_id] if user_id is not None else list(self._users.get(file_id, ()))
+            for uid in user_ids:
+                self._forget((file_id, uid))
+            self._metrics['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._users.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._metrics['hits'] + self._metrics['misses']
+            return {
+                **self._metrics,
+                'hit_rate': round(self._metrics['hits'] / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'ttl_seconds': self.ttl,
+            }
+
+
+_cache = AccessCache(Config.ACL_CACHE_TTL, Config.ACL_CACHE_SIZE)
+
+
+def access_role(user_id, file_id):
+    """
+    Rôle d'un utilisateur sur un fichier, lu dans le cache ou en une requête.
+
+    Args:
+        user_id (int): Identifiant de l'utilisateur
+        file_id (int): Identifiant du fichier
+
+    Returns:
+        str: 'owner', la permission de son partage, '' sans accès, ou None si le fichier n'existe pas
+    """
+    found, role = _cache.get(file_id, user_id)
+    if found:
+        return role
+
+    # Propriétaire et partage de l'appelant en un seul aller-retour
+    row = db.session.query(File.owner_id, FileShare.permission).outerjoin(FileShare, db.and_(
+        FileShare.file_id == File.id, FileShare.user_id == user_id
+    )).filter(File.id == file_id).first()
+    if row is None:
+        # Non mis en cache: un identifiant libre peut être réattribué
+        return None
+    owner_id, permission = row
+    role = 'owner' if owner_id == user_id else permission or ''
+    _cache.put(file_id, user_id, role)
+    return role
+
+
+def can(user_id, file_id, action):
+    """
+    Indique si un utilisateur peut effectuer une action sur un fichier.
+
+    Args:
+        user_id (int): Identifiant de l'utilisateur
+        file_id (int): Identifiant du fichier
+        action (str): Action (voir ACTIONS)
+
+    Returns:
+        bool: Autorisation, ou None si le fichier n'existe pas
+    """
+    try:
+        file_id = int(file_id)
+    except (TypeError, ValueError):
+        return None
+    role = access_role(int(user_id), file_id)
+    if role is None:
+        return None
+    allowed = ACTIONS[action]
+    return bool(role) if allowed is None else role in allowed
+
+
+def require_file_access(action, denied='Permission denied', not_found='File not found', field='error', audit=None):
+    """
+    Décorateur de route: vérifie l'accès de l'appelant au fichier ``file_id`` de l'URL.
+
+    À placer sous ``@jwt_required()``.
+
+    Args:
+        action (str): Action requise (voir ACTIONS)
+        denied (str): Message renvoyé avec le code 403
+        not_found (str): Message renvoyé avec le code 404
+        field (str): Clé du message dans la réponse JSON
+        audit (str, optional): Détail journalisé (UNAUTHORIZED_ACCESS) en cas de refus, avec {file_id}
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = int(get_jwt_identity())
+            allowed = can(user_id, kwargs['file_id'], action)
+            if allowed is None:
+                return jsonify({field: not_found}), 404
+            if not allowed:
+                if audit:
+                    log_action('UNAUTHORIZED_ACCESS', user_id, audit.format(file_id=kwargs['file_id']))
+                return jsonify({field: denied}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def invalidate(file_id, user_id=None):
+    """
+    Oublie les accès en cache après un changement de partage ou la suppression d'un fichier.
+
+    Args:
+        file_id (int): Identifiant du fichier
+        user_id (int, optional): Utilisateur concerné (par défaut: tous)
+    """
+    _cache.invalidate(int(file_id), None if user_id is None else int(user_id))
+
+
+def clear():
+    """Vide le cache (changement de base de données, tests)."""
+    _cache.clear()
+
+
+def acl_metrics():
+    """
+    Retourne les compteurs du cache des droits d'accès.
+
+    Returns:
+        dict: Succès, échecs, taux de succès, entrées, ...
+    """
+    return _cache.metrics()
@@ -0,0 +1,130 @@
+import os
+from sqlalchemy.exc import IntegrityError
+from app.models.user import db
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.storage_usage import StorageUsage
+from app.utils.storage import store_blob, delete_file
+from app.utils.integrity import build_tree
+
+
+def acquire(content_hash):
+    """
+    Ajoute une référence à un contenu déjà stocké.
+
+    L'incrément est fait par une seule requête UPDATE pour rester correct
+    lorsque plusieurs téléversements du même contenu arrivent en même temps.
+
+    Args:
+        content_hash (str): Empreinte SHA-256 du contenu en clair
+
+    Returns:
+        Blob: Le contenu référencé, ou None s'il n'existe pas
+    """
+    updated = Blob.query.filter_by(content_hash=content_hash).update(
+        {Blob.ref_count: Blob.ref_count + 1}, synchronize_session=False
+    )
+    db.session.commit()
+    if not updated:
+        return None
+    return Blob.query.filter_by(content_hash=content_hash).first()
+
+
+def store(encrypted_path, content_hash, encryption_key, compression=None, merkle=None):
+    """
+    Enregistre un conteneur chiffré, ou réutilise le contenu identique existant.
+
+    Si le contenu est déjà connu, le conteneur fourni est simplement ignoré
+    (il reste dans le répertoire temporaire de l'appelant) et une référence
+    est ajoutée au contenu existant.
+
+    Args:
+        encrypted_path (str): Chemin du conteneur chiffré local
+        content_hash (str): Empreinte SHA-256 du contenu en clair
+        encryption_key (str): Clé de données enveloppée du conteneur
+        compression (str, optional): Codec appliqué avant le chiffrement
+        merkle (tuple, optional): (racine, feuilles) de l'arbre de Merkle du
+            conteneur, calculé ici à partir du fichier s'il n'est pas fourni
+
+    Returns:
+        tuple: (Blob, bool) le contenu et s'il existait déjà
+    """
+    blob = acquire(content_hash)
+    if blob:
+        return blob, True
+
+    if merkle is None:
+        with open(encrypted_path, 'rb') as container:
+            merkle = build_tree(container)
+    merkle_root, merkle_leaves = merkle
+    size = os.path.getsize(encrypted_path)
+    storage_path = store_blob(encrypted_path, content_hash)
+    blob = Blob(
+        content_hash=content_hash,
+        storage_path=storage_path,
+        size=size,
+        encryption_key=encryption_key,
+        compression=compression,
+        merkle_root=merkle_root,
+        merkle_leaves=merkle_leaves,
+        ref_count=1
+    )
+    db.session.add(blob)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Un autre téléversement du même contenu a été enregistré entre-temps
+        db.session.rollback()
+        delete_file(storage_path)
+        blob = acquire(content_hash)
+        if blob is None:
+            raise
+        return blob, True
+
+    return blob, False
+
+
+def release(blob_id):
+    """
+    Retire une référence à un contenu et le supprime s'il n'est plus utilisé.
+
+    La ligne n'est supprimée que si le compteur est toujours à zéro, pour ne
+    pas perdre un contenu qui vient d'être référencé à nouveau.
+
+    Args:
+        blob_id (int): ID du contenu
+    """
+    Blob.query.filter_by(id=blob_id).update(
+        {Blob.ref_count: Blob.ref_count - 1}, synchronize_session=False
+    )
+    db.session.commit()
+
+    blob = db.session.get(Blob, blob_id)
+    if blob is None:
+        return
+    storage_paths = [blob.storage_path, blob.thumbnail_path]
+    deleted = Blob.query.filter(Blob.id == blob_id, Blob.ref_count <= 0).delete(synchronize_session=False)
+    db.session.commit()
+    if deleted:
+        for storage_path in filter(None, storage_paths):
+            delete_file(storage_path)
+
+
+def dedup_stats():
+    """
+    Calcule le volume logique et le volume réellement stocké.
+
+    Returns:
+        dict: Octets logiques, octets stockés et taux de déduplication
+    """
+    # Volume logique lu dans les compteurs d'usage plutôt que sommé sur tous les fichiers
+    logical = db.session.query(db.func.coalesce(db.func.sum(StorageUsage.used_bytes), 0)).scalar()
+    stored = db.session.query(db.func.coalesce(db.func.sum(Blob.size), 0)).scalar()
+    # Les fichiers antérieurs à la déduplication occupent leur propre espace
+    stored += db.session.query(db.func.coalesce(db.func.sum(File.size), 0)).filter(File.blob_id.is_(None)).scalar()
+    return {
+        'blobs': Blob.query.count(),
+        'logical_bytes': int(logical),
+        'stored_bytes': int(stored),
+        'dedup_ratio': round(logical / stored, 2) if stored else 1.0
+    }
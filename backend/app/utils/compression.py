@@ -0,0 +1,232 @@
+import io
+import os
+import zlib
+from app.config.config import Config
+from app.utils import offload
+
+try:
+    import zstandard
+except ImportError:  # zstd est optionnel: zlib est toujours disponible
+    zstandard = None
+
+CODEC_ZLIB = 'zlib'
+CODEC_ZSTD = 'zstd'
+
+READ_SIZE = 64 * 1024
+
+# Formats déjà compressés: les recompresser coûte du temps sans rien gagner
+SKIP_MIME_PREFIXES = ('image/', 'video/', 'audio/')
+SKIP_MIME_TYPES = {
+    'application/zip', 'application/gzip', 'application/x-gzip', 'application/x-7z-compressed',
+    'application/x-rar-compressed', 'application/x-bzip2', 'application/x-xz', 'application/zstd',
+    'application/pdf',
+}
+SKIP_EXTENSIONS = {
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'zip', 'gz', 'tgz', '7z', 'rar', 'bz2', 'xz', 'zst',
+    'mp3', 'mp4', 'mov', 'avi', 'mkv', 'pdf',
+}
+# Formats textuels compressibles même si leur type MIME commence par image/
+ALWAYS_MIME_TYPES = {'image/svg+xml', 'image/bmp'}
+
+# Un échantillon qui ne descend pas sous ce ratio est stocké tel quel
+MIN_RATIO = 0.9
+
+
+def available_codecs():
+    """Codecs de compression utilisables dans ce processus."""
+    return [CODEC_ZSTD, CODEC_ZLIB] if zstandard else [CODEC_ZLIB]
+
+
+def default_codec():
+    """
+    Codec utilisé pour les nouveaux téléversements (Config.COMPRESSION_CODEC).
+
+    Returns:
+        str: Nom du codec, ou None si la compression est désactivée
+    """
+    codec = Config.COMPRESSION_CODEC
+    if codec == 'none':
+        return None
+    if codec == 'auto' or codec not in available_codecs():
+        return available_codecs()[0]
+    return codec
+
+
+def should_compress(filename, mime_type):
+    """
+    Indique si un fichier mérite d'être compressé d'après son type et son extension.
+
+    Args:
+        filename (str): Nom du fichier
+        mime_type (str): Type MIME déclaré
+
+    Returns:
+        bool: False pour les formats déjà compressés
+    """
+    mime_type = (mime_type or '').lower()
+    if mime_type in ALWAYS_MIME_TYPES:
+        return True
+    if mime_type in SKIP_MIME_TYPES or mime_type.startswith(SKIP_MIME_PREFIXES):
+        return False
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    return extension not in SKIP_EXTENSIONS
+
+
+def _compressor(codec):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6)
+
+
+class CompressingReader(io.RawIOBase):
+    """
+    Flux en lecture qui hache puis compresse (éventuellement) une source.
+
+    L'empreinte porte toujours sur les données en clair non compressées, afin
+    que la déduplication ne dépende pas du codec choisi.
+    """
+
+    def __init__(self, source, codec=None, hasher=None, first_chunk=b''):
+        self._source = source
+        self._compressor = _compressor(codec) if codec else None
+        self._hasher = hasher
+        self._pending = first_chunk
+        self._buffer = b''
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _next_input(self):
+        if self._pending:
+            chunk, self._pending = self._pending, b''
+            return chunk
+        return self._source.read(READ_SIZE)
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._next_input()
+            if not chunk:
+                self._eof = True
+                if self._compressor:
+                    self._buffer += self._compressor.flush()
+                break
+            if self._hasher is not None:
+                self._hasher.update(chunk)
+            self._buffer += self._compressor.compress(chunk) if self._compressor else chunk
+
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def prepare_stream(source, filename, mime_type, hasher=None):
+    """
+    Choisit le codec d'un téléversement et retourne le flux à chiffrer.
+
+    Un premier bloc est compressé à titre d'essai: si le gain est négligeable
+    (document bureautique déjà zippé, média mal étiqueté), le fichier est
+    stocké sans compression.
+
+    Args:
+        source: Flux binaire des données en clair
+        filename (str): Nom du fichier
+        mime_type (str): Type MIME déclaré
+        hasher (optional): Objet hashlib mis à jour avec les données en clair
+
+    Returns:
+        tuple: (flux à chiffrer, nom du codec ou None)
+    """
+    codec = default_codec() if should_compress(filename, mime_type) else None
+    first_chunk = source.read(READ_SIZE)
+    if codec and first_chunk:
+        compressor = _compressor(codec)
+        sample = compressor.compress(first_chunk) + compressor.flush()
+        if len(sample) > len(first_chunk) * MIN_RATIO:
+            codec = None
+    return CompressingReader(source, codec, hasher, first_chunk), codec
+
+
+def iter_decompress(chunks, codec, chunk_size=READ_SIZE):
+    """
+    Décompresse un flux de blocs avec une mémoire bornée.
+
+    Args:
+        chunks: Itérable de blocs compressés
+        codec (str): Nom du codec (None: les blocs sont transmis tels quels)
+        chunk_size (int, optional): Taille maximale des blocs produits
+
+    Yields:
+        bytes: Les données décompressées
+    """
+    if not codec:
+        yield from chunks
+        return
+
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError('Fichier compressé avec zstd mais le module zstandard est absent')
+        reader = zstandard.ZstdDecompressor().stream_reader(_IterReader(chunks))
+        while True:
+            data = reader.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    decompressor = zlib.decompressobj()
+    for chunk in chunks:
+        done = False
+        while not done:
+            outputs, chunk, done = offload.run(_inflate, decompressor, chunk, chunk_size)
+            yield from outputs
+    data = decompressor.flush()
+    if data:
+        yield data
+    if not decompressor.eof:
+        raise zlib.error('Flux compressé tronqué')
+
+
+def _inflate(decompressor, chunk, chunk_size, max_outputs=16):
+    """
+    Décompresse un bloc d'entrée en morceaux d'au plus ``chunk_size`` octets.
+
+    Returns:
+        tuple: (morceaux produits, entrée restante, bloc entièrement consommé)
+    """
+    outputs = []
+    data = decompressor.decompress(chunk, chunk_size)
+    while data:
+        outputs.append(data)
+        if len(outputs) >= max_outputs:
+            # La sortie est bornée: l'appelant reprendra avec le reste de l'entrée
+            return outputs, decompressor.unconsumed_tail, False
+        data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+    return outputs, b'', True
+
+
+class _IterReader(io.RawIOBase):
+    """Adapte un itérable de blocs en flux lisible."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b''
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode(*values):
+    """
+    Encode une position de pagination par clé (« keyset ») en curseur opaque.
+
+    Args:
+        *values: Valeurs de la clé de tri de la dernière ligne lue (les dates sont acceptées)
+
+    Returns:
+        str: Curseur utilisable dans une URL
+    """
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode(cursor, *types):
+    """
+    Décode un curseur produit par ``encode``.
+
+    Args:
+        cursor (str): Curseur reçu du client
+        *types: Type attendu de chaque valeur (datetime, int, str, ...)
+
+    Returns:
+        list: Valeurs converties
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        converted = []
+        for value, expected in zip(values, types):
+            if expected is datetime:
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, expected) or isinstance(value, bool):
+                raise ValueError
+            converted.append(value)
+        return converted
+    except Exception:
+        raise ValueError('Invalid cursor')
@@ -1,39 +1,147 @@
-
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from app.config.config import Config
 from app.models.user import db
+from app.utils.replicas import init_replicas, start_replica_health_checks
 import os
+import sqlite3
+
+SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def database_uri(uri=None):
+    """
+    Normalise l'URI de la base de données.
+
+    Args:
+        uri (str, optional): URI configurée (par défaut: Config.SQLALCHEMY_DATABASE_URI)
+
+    Returns:
+        str: URI utilisable par SQLAlchemy (« postgres:// » devient « postgresql:// »)
+    """
+    uri = uri or Config.SQLALCHEMY_DATABASE_URI
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(uri):
+    """
+    Options de création du moteur SQLAlchemy selon la base utilisée.
+
+    Args:
+        uri (str): URI de la base de données
+
+    Returns:
+        dict: Options pour SQLALCHEMY_ENGINE_OPTIONS
+    """
+    if make_url(uri).get_backend_name() == 'sqlite':
+        # Flask-SQLAlchemy choisit le pool adapté (fichier ou mémoire); les pragmas sont posés à la connexion
+        return {}
+    return {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_timeout': Config.DB_POOL_TIMEOUT,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+        'pool_pre_ping': Config.DB_POOL_PRE_PING,
+    }
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    """Pose les pragmas SQLite sur une nouvelle connexion (les autres bases sont ignorées)."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        # Une base en mémoire n'a pas de journal sur disque
+        main = [path for _, name, path in cursor.execute('PRAGMA database_list') if name == 'main']
+        in_memory = not main or not main[0]
+        if Config.SQLITE_WAL and not in_memory:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS.upper()}')
+        cursor.execute(f'PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT)}')
+        cursor.execute(f'PRAGMA mmap_size={int(Config.SQLITE_MMAP_SIZE)}')
+    finally:
+        cursor.close()
+
+
+def configure_sqlite():
+    """
+    Applique les pragmas SQLite à chaque nouvelle connexion SQLite du processus.
+
+    Le gestionnaire est posé sur la classe Engine, avant la création de tout
+    moteur: une connexion ouverte pendant le démarrage (contrôle des réplicas,
+    create_all) les reçoit aussi.
+    """
+    if Config.SQLITE_SYNCHRONOUS.upper() not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"SQLITE_SYNCHRONOUS invalide: {Config.SQLITE_SYNCHRONOUS}")
+    if not event.contains(Engine, 'connect', _set_pragmas):
+        event.listen(Engine, 'connect', _set_pragmas)
+
+
+def _patch_psycopg_for_eventlet():
+    """Rend les appels psycopg2 coopératifs quand eventlet a remplacé les sockets."""
+    try:
+        import eventlet.patcher
+        if not eventlet.patcher.is_monkey_patched('socket'):
+            return
+        from psycogreen.eventlet import patch_psycopg
+    except ImportError:
+        print("AVERTISSEMENT: psycogreen absent, chaque requête PostgreSQL bloquera le hub eventlet")
+        return
+    patch_psycopg()
 
 
 def init_db(app):
     """
-    Initialise la base de données SQLite et crée les tables nécessaires.
-    
+    Initialise la base de données (SQLite ou PostgreSQL) et crée les tables nécessaires.
+
     Args:
         app (Flask): L'application Flask
     """
-    # Configurer SQLAlchemy
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+    # Configurer SQLAlchemy: l'URI de l'application, à défaut celle de la configuration
+    uri = database_uri(app.config.get('SQLALCHEMY_DATABASE_URI'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(uri), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    if make_url(uri).get_backend_name() == 'postgresql':
+        _patch_psycopg_for_eventlet()
+    # Avant db.init_app: aucune connexion SQLite ne doit être ouverte sans ses pragmas
+    configure_sqlite()
+
     # Initialiser l'extension
     db.init_app(app)
-    
+    # Réplicas en lecture éventuels, contrôlés en arrière-plan
+    with app.app_context():
+        if init_replicas(app):
+            start_replica_health_checks(app)
+
     # Initialiser Flask-Migrate
     migrate = Migrate(app, db)
-    
+
     # Créer le répertoire de la base de données s'il n'existe pas
     db_path = os.path.join(os.path.dirname(app.instance_path), 'instance')
     os.makedirs(db_path, exist_ok=True)
-    
+
     # Créer les tables
     with app.app_context():
         from app.models.file import File, Activity, Message
+        from app.models.upload_session import UploadSession
+        from app.models.storage_usage import StorageUsage, StorageTypeUsage
+        from app.models.feed_entry import FeedEntry
         from app.models.activeUser import ActiveUser
         from app.models.user import User
         from app.models.Message import Chat
+        from app.models.search_document import SearchDocument
+        import app.utils.search  # noqa: F401 - table FTS5 et mise à jour de l'index
+        from app.models.activity_rollup import ActivityRollup
+        import app.utils.rollups  # noqa: F401 - mise à jour des compteurs d'activité
         #rom app.models.file_share import file_shares
         db.create_all()
-        
+
     return db
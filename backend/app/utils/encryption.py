@@ -2,105 +2,524 @@ from cryptography.fernet import Fernet
 import os
 from app.config.config import Config
 import base64
+import struct
+import threading
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
+from app.utils import offload
 
 # Clé de chiffrement principale (dans un environnement de production, cette clé devrait être stockée de manière sécurisée)
 # Pour simplifier, nous utilisons une clé fixe ici, mais en production, elle devrait être stockée dans un coffre-fort ou une variable d'environnement
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY') or 'clé-de-chiffrement-par-défaut-à-changer-en-production'
 
+# Sel fixe de la clé maître: il doit être identique pour tous les processus afin
+# que les clés de données enveloppées restent lisibles après un redémarrage
+MASTER_KEY_SALT = (os.environ.get('ENCRYPTION_KEY_SALT') or 'seccollab-master-key').encode()
+
+# Format du conteneur chiffré par segments:
+#   en-tête  = MAGIC (4) | version (1) | flags (1) | taille de segment (4) | sel (16)
+#   segment  = nonce (12) | données chiffrées AES-GCM + tag (16)
+# Chaque segment est authentifié avec l'en-tête, son index et un indicateur de
+# segment final, ce qui empêche la réorganisation et la troncature du fichier.
+MAGIC = b'SCE1'
+FORMAT_VERSION = 1
+FLAG_DERIVED_KEY = 0x01
+NO_SALT = bytes(16)
+DATA_KEY_SIZE = 32
+_DATA_KEY_AAD = b'seccollab-data-key'
+SEGMENT_SIZE = 64 * 1024
+NONCE_SIZE = 12
+TAG_SIZE = 16
+SEGMENT_OVERHEAD = NONCE_SIZE + TAG_SIZE
+HEADER = struct.Struct('>4sBBI16s')
+HEADER_SIZE = HEADER.size
+_SEGMENT_AAD = struct.Struct('>QB')
+# Segments chiffrés ou déchiffrés par appel au pool de calcul (1 Mo)
+BATCH_SEGMENTS = 16
+
+
+class EncryptionError(Exception):
+    """Erreur levée lorsqu'un conteneur chiffré est invalide ou altéré."""
+
+
 def derive_key(key_material, salt=None):
     """
     Dérive une clé de chiffrement à partir d'un matériel de clé et d'un sel optionnel.
-    
+
     Args:
         key_material (str): Le matériel de clé (mot de passe ou clé principale)
         salt (bytes, optional): Le sel à utiliser pour la dérivation
-        
+
     Returns:
         tuple: (clé dérivée, sel utilisé)
     """
     if salt is None:
         salt = os.urandom(16)
-    
+
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
         salt=salt,
         iterations=100000,
     )
-    
-    key = base64.urlsafe_b64encode(kdf.derive(key_material.encode()))
+
+    # 100 000 itérations: hors du hub eventlet
+    key = base64.urlsafe_b64encode(offload.run(kdf.derive, key_material.encode()))
     return key, salt
 
-def encrypt_file(file_path):
+
+_master_key = None
+_master_key_lock = threading.Lock()
+
+
+def get_master_key():
+    """
+    Retourne la clé maître brute, dérivée une seule fois par processus.
+
+    Returns:
+        bytes: La clé maître de 32 octets
+    """
+    global _master_key
+    if _master_key is None:
+        with _master_key_lock:
+            if _master_key is None:
+                key, _ = derive_key(ENCRYPTION_KEY, MASTER_KEY_SALT)
+                _master_key = base64.urlsafe_b64decode(key)
+    return _master_key
+
+
+def generate_data_key():
+    """
+    Génère une clé de données aléatoire et sa version enveloppée par la clé maître.
+
+    Returns:
+        tuple: (clé de données brute, clé enveloppée encodée en base64 à stocker avec le fichier)
+    """
+    data_key = AESGCM.generate_key(bit_length=DATA_KEY_SIZE * 8)
+    return data_key, wrap_data_key(data_key)
+
+
+def wrap_data_key(data_key):
+    """
+    Chiffre une clé de données avec la clé maître.
+
+    Args:
+        data_key (bytes): La clé de données brute
+
+    Returns:
+        str: La clé enveloppée (nonce + clé chiffrée) encodée en base64
+    """
+    nonce = os.urandom(NONCE_SIZE)
+    wrapped = AESGCM(get_master_key()).encrypt(nonce, data_key, _DATA_KEY_AAD)
+    return base64.b64encode(nonce + wrapped).decode('ascii')
+
+
+def unwrap_data_key(wrapped_key):
+    """
+    Déchiffre une clé de données enveloppée avec wrap_data_key.
+
+    Args:
+        wrapped_key (str): La clé enveloppée encodée en base64
+
+    Returns:
+        bytes: La clé de données brute
+    """
+    raw = base64.b64decode(wrapped_key)
+    try:
+        return AESGCM(get_master_key()).decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], _DATA_KEY_AAD)
+    except InvalidTag:
+        raise EncryptionError('Clé de données invalide pour la clé maître courante')
+
+
+def _segment_aad(header, index, final):
+    return header + _SEGMENT_AAD.pack(index, 1 if final else 0)
+
+
+class EncryptingWriter:
+    """
+    Objet fichier en écriture seule qui chiffre les données par segments de
+    taille fixe au fur et à mesure qu'elles sont écrites.
+
+    La mémoire utilisée reste bornée à environ BATCH_SEGMENTS segments, quelle
+    que soit la taille totale des données. Sans clé de données, une clé est dérivée
+    par PBKDF2 à partir d'un sel propre au fichier (mode historique, coûteux).
+    """
+
+    def __init__(self, fileobj, key=None, segment_size=SEGMENT_SIZE, start_index=0):
+        self._fileobj = fileobj
+        self._segment_size = segment_size
+        self._buffer = bytearray()
+        self._index = start_index
+        self._closed = False
+
+        if key is None:
+            if start_index:
+                raise EncryptionError('Une clé de données est requise pour reprendre un conteneur')
+            salt = os.urandom(16)
+            derived, _ = derive_key(ENCRYPTION_KEY, salt)
+            key, flags = base64.urlsafe_b64decode(derived), FLAG_DERIVED_KEY
+        else:
+            salt, flags = NO_SALT, 0
+        self._aesgcm = AESGCM(key)
+        self._header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, segment_size, salt)
+        self.bytes_written = 0
+        # Un conteneur repris à partir d'un segment donné a déjà son en-tête
+        if not start_index:
+            self._fileobj.write(self._header)
+            self.bytes_written = HEADER_SIZE
+
+    def _seal(self, chunks, final):
+        records = []
+        for offset, chunk in enumerate(chunks):
+            nonce = os.urandom(NONCE_SIZE)
+            is_final = final and offset == len(chunks) - 1
+            aad = _segment_aad(self._header, self._index + offset, is_final)
+            records.append(nonce + self._aesgcm.encrypt(nonce, bytes(chunk), aad))
+        return records
+
+    def _emit_many(self, chunks, final=False):
+        # Le chiffrement se fait par lots hors du hub; l'écriture reste dans le thread appelant
+        for record in offload.run(self._seal, chunks, final):
+            self._fileobj.write(record)
+            self.bytes_written += len(record)
+        self._index += len(chunks)
+
+    def _emit(self, chunk, final):
+        self._emit_many([chunk], final)
+
+    def _drain(self, keep_last):
+        # Émet les segments complets du tampon, par lots de BATCH_SEGMENTS
+        size = self._segment_size
+        while len(self._buffer) > (size if keep_last else 0):
+            count = min(BATCH_SEGMENTS, (len(self._buffer) - (1 if keep_last else 0)) // size)
+            if count <= 0:
+                break
+            self._emit_many([self._buffer[i * size:(i + 1) * size] for i in range(count)])
+            del self._buffer[:count * size]
+
+    def write(self, data):
+        if self._closed:
+            raise ValueError('Écriture dans un conteneur déjà fermé')
+        self._buffer += data
+        # Le dernier segment complet est conservé jusqu'à la prochaine écriture
+        # afin de pouvoir le marquer comme final lors de la fermeture.
+        if len(self._buffer) >= (BATCH_SEGMENTS + 1) * self._segment_size:
+            self._drain(keep_last=True)
+        return len(data)
+
+    def flush_segments(self):
+        """
+        Émet les segments complets en attente comme segments non finaux.
+
+        Utilisé par les téléversements en plusieurs morceaux, dont chaque
+        morceau intermédiaire contient un nombre entier de segments.
+        """
+        if len(self._buffer) % self._segment_size:
+            raise EncryptionError('Les données doivent être alignées sur la taille des segments')
+        self._drain(keep_last=False)
+
+    @property
+    def segment_index(self):
+        return self._index
+
+    def close(self):
+        if self._closed:
+            return
+        self._drain(keep_last=True)
+        self._emit(self._buffer, final=True)
+        self._buffer = bytearray()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def read_header(fileobj):
+    """
+    Lit et valide l'en-tête d'un conteneur chiffré.
+
+    Args:
+        fileobj: Objet fichier positionné au début du conteneur
+
+    Returns:
+        tuple: (en-tête brut, taille de segment, flags, sel)
+    """
+    header = fileobj.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE:
+        raise EncryptionError('En-tête de conteneur tronqué')
+    magic, version, flags, segment_size, salt = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise EncryptionError('Format de conteneur inconnu')
+    if segment_size <= 0:
+        raise EncryptionError('En-tête de conteneur invalide')
+    return header, segment_size, flags, salt
+
+
+def _container_cipher(flags, salt, key):
+    if flags & FLAG_DERIVED_KEY:
+        derived, _ = derive_key(ENCRYPTION_KEY, salt)
+        return AESGCM(base64.urlsafe_b64decode(derived))
+    if key is None:
+        raise EncryptionError('Clé de données requise pour déchiffrer ce conteneur')
+    return AESGCM(key)
+
+
+def _open_segments(aesgcm, header, records):
+    """Déchiffre un lot de segments [(index, enregistrement, final)]."""
+    plaintexts = []
+    for index, record, final in records:
+        try:
+            plaintexts.append(aesgcm.decrypt(record[:NONCE_SIZE], record[NONCE_SIZE:],
+                                             _segment_aad(header, index, final)))
+        except InvalidTag:
+            raise EncryptionError(f'Segment {index} altéré ou conteneur tronqué')
+    return plaintexts
+
+
+def iter_decrypt(fileobj, key=None):
+    """
+    Déchiffre un conteneur segment par segment.
+
+    Args:
+        fileobj: Objet fichier en lecture positionné au début du conteneur
+        key (bytes, optional): La clé de données du fichier (absente pour les
+            conteneurs dont la clé est dérivée du sel)
+
+    Yields:
+        bytes: Les données déchiffrées de chaque segment
+    """
+    header, segment_size, flags, salt = read_header(fileobj)
+    aesgcm = _container_cipher(flags, salt, key)
+    record_size = segment_size + SEGMENT_OVERHEAD
+
+    # Les lectures restent dans le thread appelant; le déchiffrement se fait par lots hors du hub
+    index = 0
+    current = fileobj.read(record_size)
+    while True:
+        batch = []
+        while current and len(batch) < BATCH_SEGMENTS:
+            if len(current) < SEGMENT_OVERHEAD:
+                break
+            following = fileobj.read(record_size) if len(current) == record_size else b''
+            batch.append((index, current, not following))
+            current = following
+            index += 1
+        yield from offload.run(_open_segments, aesgcm, header, batch)
+        if batch and batch[-1][2]:
+            return
+        if not current or len(current) < SEGMENT_OVERHEAD:
+            raise EncryptionError('Conteneur tronqué')
+
+
+def plaintext_size(container_size, segment_size=SEGMENT_SIZE):
+    """
+    Calcule la taille des données en clair à partir de la taille du conteneur.
+
+    Args:
+        container_size (int): Taille totale du conteneur chiffré
+        segment_size (int, optional): Taille de segment déclarée dans l'en-tête
+
+    Returns:
+        int: Taille des données en clair
+    """
+    body = container_size - HEADER_SIZE
+    record_size = segment_size + SEGMENT_OVERHEAD
+    segments = -(-body // record_size)
+    if body < SEGMENT_OVERHEAD or body - (segments - 1) * record_size < SEGMENT_OVERHEAD:
+        raise EncryptionError('Taille de conteneur invalide')
+    return body - segments * SEGMENT_OVERHEAD
+
+
+def encrypted_size(size, segment_size=SEGMENT_SIZE):
+    """
+    Calcule la taille du conteneur produit pour des données en clair.
+
+    Args:
+        size (int): Taille des données en clair
+        segment_size (int, optional): Taille des segments du conteneur
+
+    Returns:
+        int: Taille totale du conteneur chiffré (un segment final, même vide)
+    """
+    segments = max(1, -(-size // segment_size))
+    return HEADER_SIZE + size + segments * SEGMENT_OVERHEAD
+
+
+def inspect_container(fileobj):
+    """
+    Détermine les tailles d'un conteneur stocké sans le déchiffrer.
+
+    Args:
+        fileobj: Objet fichier en lecture, positionnable
+
+    Returns:
+        tuple: (taille du conteneur, taille des données en clair), ou None pour
+        un fichier de l'ancien format Fernet
+    """
+    container_size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(0)
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        fileobj.seek(0)
+        return None
+    fileobj.seek(0)
+    _, segment_size, _, _ = read_header(fileobj)
+    fileobj.seek(0)
+    return container_size, plaintext_size(container_size, segment_size)
+
+
+def iter_decrypt_range(fileobj, container_size, start, stop, key=None):
+    """
+    Déchiffre uniquement les segments couvrant la plage [start, stop[ des données en clair.
+
+    Args:
+        fileobj: Objet fichier en lecture, positionnable, contenant le conteneur
+        container_size (int): Taille totale du conteneur chiffré
+        start (int): Position de début dans les données en clair
+        stop (int): Position de fin (exclue) dans les données en clair
+        key (bytes, optional): La clé de données du fichier
+
+    Yields:
+        bytes: Les données en clair de la plage demandée
+    """
+    fileobj.seek(0)
+    header, segment_size, flags, salt = read_header(fileobj)
+    aesgcm = _container_cipher(flags, salt, key)
+    record_size = segment_size + SEGMENT_OVERHEAD
+    last_index = -(-(container_size - HEADER_SIZE) // record_size) - 1
+
+    if start >= stop:
+        return
+
+    first = start // segment_size
+    last = (stop - 1) // segment_size
+    fileobj.seek(HEADER_SIZE + first * record_size)
+    for batch_start in range(first, last + 1, BATCH_SEGMENTS):
+        batch = []
+        for index in range(batch_start, min(batch_start + BATCH_SEGMENTS, last + 1)):
+            record = fileobj.read(record_size)
+            if len(record) < SEGMENT_OVERHEAD:
+                raise EncryptionError('Conteneur tronqué')
+            batch.append((index, record, index == last_index))
+        for (index, _, _), plaintext in zip(batch, offload.run(_open_segments, aesgcm, header, batch)):
+            offset = index * segment_size
+            yield plaintext[max(start - offset, 0):stop - offset]
+
+
+def encrypt_stream(source, destination, key=None, chunk_size=SEGMENT_SIZE, hasher=None):
+    """
+    Chiffre un flux vers un autre flux sans le charger entièrement en mémoire.
+
+    Args:
+        source: Objet fichier en lecture contenant les données en clair
+        destination: Objet fichier en écriture recevant le conteneur chiffré
+        key (bytes, optional): La clé de données du fichier
+        chunk_size (int, optional): Taille des lectures sur la source
+        hasher (optional): Objet hashlib mis à jour avec les données en clair
+
+    Returns:
+        int: Nombre d'octets écrits dans la destination
     """
-    Chiffre un fichier en utilisant AES (via Fernet).
-    
+    writer = EncryptingWriter(destination, key)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if hasher is not None:
+            hasher.update(chunk)
+        writer.write(chunk)
+    writer.close()
+    return writer.bytes_written
+
+
+def encrypt_file(file_path, key=None):
+    """
+    Chiffre un fichier en utilisant AES-GCM par segments.
+
     Args:
         file_path (str): Chemin du fichier à chiffrer
-        
+        key (bytes, optional): La clé de données du fichier
+
     Returns:
         str: Chemin du fichier chiffré
     """
-    # Dériver une clé de chiffrement
-    key, salt = derive_key(ENCRYPTION_KEY)
-    
-    # Créer un objet Fernet avec la clé dérivée
-    fernet = Fernet(key)
-    
-    # Lire le contenu du fichier
-    with open(file_path, 'rb') as file:
-        file_data = file.read()
-    
-    # Chiffrer les données
-    encrypted_data = fernet.encrypt(file_data)
-    
-    # Préparer les données à écrire (sel + données chiffrées)
-    data_to_write = salt + encrypted_data
-    
-    # Écrire les données chiffrées dans un nouveau fichier
     encrypted_path = f"{file_path}.enc"
-    with open(encrypted_path, 'wb') as file:
-        file.write(data_to_write)
-    
+    with open(file_path, 'rb') as source, open(encrypted_path, 'wb') as destination:
+        encrypt_stream(source, destination, key)
+
     return encrypted_path
 
-def decrypt_file(encrypted_path):
+
+def _decrypt_legacy(data):
+    """Déchiffre des données produites par l'ancien format Fernet (sel + jeton)."""
+    salt = data[:16]
+    encrypted_data = data[16:]
+    key, _ = derive_key(ENCRYPTION_KEY, salt)
+    return Fernet(key).decrypt(encrypted_data)
+
+
+def iter_decrypt_stream(fileobj, key=None):
+    """
+    Déchiffre un flux chiffré, quel que soit son format.
+
+    Les données de l'ancien format Fernet sont déchiffrées d'un seul bloc.
+
+    Args:
+        fileobj: Objet fichier en lecture positionné au début des données chiffrées
+        key (bytes, optional): La clé de données du fichier
+
+    Yields:
+        bytes: Les données déchiffrées
+    """
+    magic = fileobj.read(len(MAGIC))
+    if magic != MAGIC:
+        yield _decrypt_legacy(magic + fileobj.read())
+        return
+
+    fileobj.seek(0)
+    yield from iter_decrypt(fileobj, key)
+
+
+def iter_decrypt_file(encrypted_path, key=None):
+    """
+    Déchiffre un fichier chiffré en flux, quel que soit son format.
+
+    Args:
+        encrypted_path (str): Chemin du fichier chiffré
+        key (bytes, optional): La clé de données du fichier
+
+    Yields:
+        bytes: Les données déchiffrées
+    """
+    with open(encrypted_path, 'rb') as file:
+        yield from iter_decrypt_stream(file, key)
+
+
+def decrypt_file(encrypted_path, key=None):
     """
     Déchiffre un fichier chiffré avec encrypt_file.
-    
+
     Args:
         encrypted_path (str): Chemin du fichier chiffré
-        
+        key (bytes, optional): La clé de données du fichier
+
     Returns:
         str: Chemin du fichier déchiffré
     """
-    # Lire le contenu du fichier chiffré
-    with open(encrypted_path, 'rb') as file:
-        data = file.read()
-    
-    # Extraire le sel et les données chiffrées
-    salt = data[:16]
-    encrypted_data = data[16:]
-    
-    # Dériver la clé de chiffrement avec le sel extrait
-    key, _ = derive_key(ENCRYPTION_KEY, salt)
-    
-    # Créer un objet Fernet avec la clé dérivée
-    fernet = Fernet(key)
-    
-    # Déchiffrer les données
-    decrypted_data = fernet.decrypt(encrypted_data)
-    
     # Écrire les données déchiffrées dans un nouveau fichier
     decrypted_path = encrypted_path[:-4]  # Supprimer l'extension .enc
     if os.path.exists(decrypted_path):
         # Si le fichier existe déjà, créer un nouveau nom
         base, ext = os.path.splitext(decrypted_path)
         decrypted_path = f"{base}_decrypted{ext}"
-    
+
     with open(decrypted_path, 'wb') as file:
-        file.write(decrypted_data)
-    
+        for chunk in iter_decrypt_file(encrypted_path, key):
+            file.write(chunk)
+
     return decrypted_path
@@ -0,0 +1,248 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import current_app, has_app_context
+from app.config.config import Config
+from app.models.user import db
+from app.models.file import Activity
+from app.utils import feed
+
+# Les entrées de journal (Log) et les activités (Activity) ne sont pas écrites
+# par la requête qui les produit: elles sont confiées à un thread d'écriture
+# qui les insère par lots, un seul commit par lot (« group commit »). Un lot part
+# quand il atteint EVENT_WRITER_BATCH_SIZE événements ou EVENT_WRITER_INTERVAL_MS
+# après son premier événement. La file est bornée: quand elle est pleine, ou
+# sans thread d'écriture (tests, scripts), l'événement est écrit sur place
+# comme auparavant. Ce qui reste en file à l'arrêt du processus est écrit avant
+# sa sortie.
+
+# Compteurs cumulés depuis le démarrage du processus
+_metrics = {
+    'queued': 0,
+    'batches': 0,
+    'written': 0,
+    'largest_batch': 0,
+    'direct_writes': 0,
+    'overflows': 0,
+    'failed': 0,
+    'commit_ms_total': 0.0,
+}
+_metrics_lock = threading.Lock()
+
+
+def _count(**values):
+    with _metrics_lock:
+        for name, value in values.items():
+            _metrics[name] += value
+
+
+def _persist(events):
+    """Insère des événements dans la session courante et les valide en un seul commit."""
+    db.session.add_all(events)
+    feed.publish(*[event for event in events if isinstance(event, Activity)])
+    db.session.commit()
+
+
+class EventWriter:
+    """
+    File bornée d'événements et thread qui les écrit par lots.
+
+    Args:
+        app (Flask): Application dont le contexte sert aux écritures
+        batch_size (int, optional): Événements au plus par commit
+        interval_ms (int, optional): Attente maximale d'un événement avant son commit
+        max_pending (int, optional): Événements au plus en attente d'écriture
+    """
+
+    def __init__(self, app, batch_size=None, interval_ms=None, max_pending=None):
+        self.app = app
+        self.batch_size = batch_size or Config.EVENT_WRITER_BATCH_SIZE
+        self.interval = (interval_ms or Config.EVENT_WRITER_INTERVAL_MS) / 1000
+        self._queue = queue.Queue(maxsize=max_pending or Config.EVENT_WRITER_MAX_PENDING)
+        # Événements acceptés et événements traités (écrits ou en échec), pour flush()
+        self._submitted = 0
+        self._settled = 0
+        self._progress = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, event):
+        """
+        Met un événement en file.
+
+        Returns:
+            bool: False si la file est pleine ou le thread arrêté: l'appelant écrit l'événement lui-même
+        """
+        with self._progress:
+            if self._stopping or self._thread is None or not self._thread.is_alive():
+                return False
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                return False
+            self._submitted += 1
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """
+        Attend l'écriture de tous les événements mis en file avant l'appel.
+
+        Args:
+            timeout (float, optional): Attente maximale en secondes
+
+        Returns:
+            bool: True si tout a été écrit à temps
+        """
+        with self._progress:
+            target = self._submitted
+            return self._progress.wait_for(lambda: self._settled >= target, timeout)
+
+    def close(self, timeout=5):
+        """Arrête le thread puis écrit les événements restés en file."""
+        with self._progress:
+            if self._stopping:
+                return
+            self._stopping = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(remaining), self.batch_size):
+            self._write(remaining[start:start + self.batch_size])
+
+    def _run(self):
+        while not self._stopping:
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                _persist(batch)
+                _count(batches=1, written=len(batch), commit_ms_total=(time.perf_counter() - started) * 1000)
+                with _metrics_lock:
+                    _metrics['largest_batch'] = max(_metrics['largest_batch'], len(batch))
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erreur d'écriture d'un lot de {len(batch)} événements: {e}")
+                # Un événement invalide ne doit pas faire perdre les autres: chacun est réécrit seul
+                for event in batch:
+                    try:
+                        _persist([event])
+                        _count(batches=1, written=1)
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"Événement abandonné ({event!r}): {e}")
+                        _count(failed=1)
+            finally:
+                db.session.remove()
+        with self._progress:
+            self._settled += len(batch)
+            self._progress.notify_all()
+
+
+def init_event_writer(app, **options):
+    """
+    Installe et démarre le thread d'écriture des journaux et activités d'une application.
+
+    Args:
+        app (Flask): L'application Flask
+        **options: batch_size, interval_ms, max_pending (par défaut: configuration)
+
+    Returns:
+        EventWriter: Le thread d'écriture installé
+    """
+    writer = EventWriter(app, **options).start()
+    app.extensions['event_writer'] = writer
+    # Les événements en file sont écrits avant la sortie du processus
+    atexit.register(writer.close)
+    return writer
+
+
+def _current_writer():
+    return current_app.extensions.get('event_writer') if has_app_context() else None
+
+
+def record(event):
+    """
+    Enregistre une entrée de journal ou une activité, par lot si un thread d'écriture est installé.
+
+    L'horodatage est fixé ici: il reste celui de l'action et non celui du lot.
+
+    Args:
+        event (Log | Activity): Événement à insérer, hors session
+
+    Returns:
+        L'événement (sans identifiant tant que son lot n'est pas écrit)
+    """
+    if isinstance(event, Activity):
+        event.created_at = event.created_at or datetime.utcnow()
+    else:
+        event.timestamp = event.timestamp or datetime.utcnow()
+    writer = _current_writer()
+    if writer is not None:
+        if writer.submit(event):
+            _count(queued=1)
+            return event
+        _count(overflows=1)
+    _persist([event])
+    _count(direct_writes=1)
+    return event
+
+
+def flush_events(timeout=None):
+    """
+    Attend l'écriture des événements mis en file (barrière pour les tests et les scripts).
+
+    Args:
+        timeout (float, optional): Attente maximale en secondes
+
+    Returns:
+        bool: True si tout a été écrit à temps (ou sans thread d'écriture)
+    """
+    writer = _current_writer()
+    return writer.flush(timeout) if writer is not None else True
+
+
+def event_writer_metrics():
+    """
+    Retourne les compteurs du thread d'écriture.
+
+    Returns:
+        dict: Copie des compteurs (événements en file, lots, écritures directes, ...)
+    """
+    writer = _current_writer()
+    with _metrics_lock:
+        return {**_metrics, 'pending': writer.pending() if writer is not None else 0}
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import datetime
+from app.config.config import Config
+from app.models.user import db, User
+from app.models.file import File, Activity
+from app.models.file_share import FileShare
+from app.models.feed_entry import FeedEntry
+from app.utils import cursors
+
+# Les activités sont recopiées dans le fil de chaque destinataire au moment où
+# elles se produisent (« fan-out » à l'écriture): la lecture d'un fil est un
+# parcours d'intervalle sur l'index (user_id, created_at, id), sans jointure.
+
+
+def publish(*activities):
+    """
+    Ajoute des activités au fil du propriétaire et des utilisateurs qui partagent chaque fichier.
+
+    Écrit dans la transaction en cours: l'appelant valide les activités et
+    leurs entrées ensemble.
+
+    Args:
+        *activities (Activity): Activités ajoutées à la session
+    """
+    if not activities:
+        return
+    db.session.flush()
+
+    # Les routes passent parfois l'identifiant du fichier tel qu'il figure dans l'URL
+    file_ids = {int(activity.file_id) for activity in activities}
+    files = {
+        row.id: row for row in
+        db.session.query(File.id, File.name, File.owner_id).filter(File.id.in_(file_ids))
+    }
+    recipients = defaultdict(set)
+    for file in files.values():
+        recipients[file.id].add(file.owner_id)
+    for file_id, user_id in db.session.query(FileShare.file_id, FileShare.user_id).filter(
+        FileShare.file_id.in_(file_ids)
+    ):
+        recipients[file_id].add(user_id)
+    actors = dict(db.session.query(User.id, User.name).filter(
+        User.id.in_({activity.user_id for activity in activities})
+    ))
+
+    rows = []
+    for activity in activities:
+        file_id = int(activity.file_id)
+        if file_id not in files:
+            continue
+        for user_id in recipients[file_id]:
+            rows.append({
+                'user_id': user_id,
+                'activity_id': activity.id,
+                'file_id': file_id,
+                'actor_id': activity.user_id,
+                'type': activity.type,
+                'file_name': files[file_id].name,
+                'actor_name': actors.get(activity.user_id),
+                'created_at': activity.created_at,
+            })
+    if rows:
+        db.session.execute(db.insert(FeedEntry), rows)
+
+
+def subscribe(file_id, user_id):
+    """
+    Recopie l'historique récent d'un fichier dans le fil d'un utilisateur qui vient d'y avoir accès.
+
+    Args:
+        file_id (int): Identifiant du fichier
+        user_id (int): Nouveau destinataire
+    """
+    present = db.session.query(FeedEntry.activity_id).filter_by(file_id=file_id, user_id=user_id)
+    recent = db.session.query(
+        Activity.id, Activity.type, Activity.user_id, Activity.created_at, File.name, User.name
+    ).join(File, File.id == Activity.file_id).join(User, User.id == Activity.user_id).filter(
+        Activity.file_id == file_id, Activity.id.notin_(present)
+    ).order_by(Activity.created_at.desc()).limit(Config.FEED_BACKFILL).all()
+
+    rows = [
+        {
+            'user_id': user_id,
+            'activity_id': activity_id,
+            'file_id': file_id,
+            'actor_id': actor_id,
+            'type': activity_type,
+            'file_name': file_name,
+            'actor_name': actor_name,
+            'created_at': created_at,
+        }
+        for activity_id, activity_type, actor_id, created_at, file_name, actor_name in recent
+    ]
+    if rows:
+        db.session.execute(db.insert(FeedEntry), rows)
+
+
+def unsubscribe(file_id, user_id=None):
+    """
+    Retire un fichier du fil d'un utilisateur (partage révoqué) ou de tous les fils (fichier supprimé).
+
+    Args:
+        file_id (int): Identifiant du fichier
+        user_id (int, optional): Utilisateur concerné (par défaut: tous)
+    """
+    query = FeedEntry.query.filter_by(file_id=file_id)
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    query.delete(synchronize_session=False)
+
+
+def read(user_id, limit, cursor=None, since=None):
+    """
+    Lit une page du fil d'un utilisateur, de la plus récente à la plus ancienne activité.
+
+    Args:
+        user_id (int): Identifiant du lecteur
+        limit (int): Nombre maximal d'entrées
+        cursor (str, optional): Curseur de la page précédente (entrées plus anciennes)
+        since (datetime, optional): Ne renvoie que les activités postérieures (interrogation incrémentale)
+
+    Returns:
+        tuple: (entrées, curseur de la page suivante ou None)
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    query = FeedEntry.query.filter(FeedEntry.user_id == user_id)
+    if cursor:
+        created_at, entry_id = cursors.decode(cursor, datetime, int)
+        query = query.filter(db.or_(
+            FeedEntry.created_at < created_at,
+            db.and_(FeedEntry.created_at == created_at, FeedEntry.id < entry_id)
+        ))
+    if since:
+        query = query.filter(FeedEntry.created_at > since)
+
+    # Une entrée de plus indique s'il reste une page
+    entries = query.order_by(FeedEntry.created_at.desc(), FeedEntry.id.desc()).limit(limit + 1).all()
+    if len(entries) > limit:
+        entries = entries[:limit]
+        return entries, cursors.encode(entries[-1].created_at, entries[-1].id)
+    return entries, None
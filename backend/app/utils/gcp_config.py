@@ -2,12 +2,15 @@ import os
 from google.cloud import storage
 from google.oauth2 import service_account
 import json
+import threading
 
 # Configuration pour GCP
 class GCPConfig:
     def __init__(self):
         self.bucket_name = os.environ.get('GCP_BUCKET_NAME', 'secure-collab-platform-bucket')
         self.credentials_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', None)
+        self._client = None
+        self._client_lock = threading.Lock()
         
         # Créer un fichier de configuration simulé pour GCP si nécessaire
         if not self.credentials_path:
@@ -42,14 +45,29 @@ class GCPConfig:
     
 
     def get_storage_client(self):
-        try:
-            credentials = service_account.Credentials.from_service_account_file(
-                self.credentials_path
-            )
-            return storage.Client(credentials=credentials)
-        except Exception as e:
-            print(f"Erreur lors de la création du client GCP: {str(e)}")
-            return None
+        """
+        Retourne le client GCP Storage du processus.
+        
+        Le client (et son pool de connexions HTTP) est créé une seule fois puis
+        réutilisé. Si STORAGE_EMULATOR_HOST est défini, le client cible ce
+        serveur local sans authentification.
+        """
+        if self._client is not None:
+            return self._client
+        with self._client_lock:
+            if self._client is None:
+                try:
+                    if os.environ.get('STORAGE_EMULATOR_HOST'):
+                        self._client = storage.Client(project=os.environ.get('GOOGLE_CLOUD_PROJECT', 'test-project'))
+                    else:
+                        credentials = service_account.Credentials.from_service_account_file(
+                            self.credentials_path
+                        )
+                        self._client = storage.Client(credentials=credentials)
+                except Exception as e:
+                    print(f"Erreur lors de la création du client GCP: {str(e)}")
+                    return None
+        return self._client
 
 
     
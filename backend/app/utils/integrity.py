@@ -0,0 +1,416 @@
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime
+from app.config.config import Config
+from app.models.user import db
+from app.models.blob import Blob
+from app.models.file import File
+from app.utils.compression import iter_decompress
+from app.utils.encryption import (
+    HEADER, HEADER_SIZE, MAGIC, SEGMENT_OVERHEAD, EncryptionError, iter_decrypt_stream, unwrap_data_key
+)
+from app.utils.storage import open_file
+
+# Arbre de Merkle sur le conteneur chiffré stocké:
+#   feuille 0 = en-tête, feuille i = enregistrement du segment i - 1 (nonce + données + tag)
+#   feuille   = SHA-256(0x00 | octets), nœud = SHA-256(0x01 | gauche | droite)
+# Les préfixes distinguent feuilles et nœuds; un nœud sans frère remonte tel quel.
+# L'arbre porte sur les octets stockés: il se vérifie sans clé ni déchiffrement.
+DIGEST_SIZE = 32
+READ_SIZE = 1024 * 1024
+
+_metrics = {
+    'runs': 0,
+    'last_run': None,
+    'last_duration_seconds': None,
+    'last_throughput_mb_s': None,
+    'blobs_checked': 0,
+    'bytes_read': 0,
+    'corrupt': 0,
+    'missing': 0,
+    'backfilled': 0,
+    'corrupt_blob_ids': [],
+}
+_metrics_lock = threading.Lock()
+
+
+def _leaf(data):
+    return hashlib.sha256(b'\x00' + data).digest()
+
+
+def merkle_root(leaves):
+    """
+    Calcule la racine de l'arbre de Merkle à partir des empreintes des feuilles.
+
+    Args:
+        leaves (bytes): Empreintes des feuilles concaténées (32 octets chacune)
+
+    Returns:
+        str: Racine en hexadécimal
+    """
+    level = [leaves[offset:offset + DIGEST_SIZE] for offset in range(0, len(leaves), DIGEST_SIZE)]
+    if not level:
+        return _leaf(b'').hex()
+    while len(level) > 1:
+        paired = [hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+class MerkleHasher:
+    """
+    Calcule l'arbre de Merkle d'un conteneur au fil de son écriture.
+
+    S'utilise comme un objet hashlib: ``update`` reçoit les octets du
+    conteneur dans l'ordre, quel que soit leur découpage.
+    """
+
+    def __init__(self):
+        self._header = b''
+        self._record_size = None
+        self._current = None
+        self._filled = 0
+        self._leaves = bytearray()
+
+    def update(self, data):
+        data = memoryview(data)
+        if self._record_size is None:
+            missing = HEADER_SIZE - len(self._header)
+            self._header += bytes(data[:missing])
+            data = data[missing:]
+            if len(self._header) < HEADER_SIZE:
+                return
+            if self._header[:len(MAGIC)] != MAGIC:
+                raise EncryptionError('Format de conteneur inconnu')
+            self._record_size = HEADER.unpack(self._header)[3] + SEGMENT_OVERHEAD
+            self._leaves += _leaf(self._header)
+
+        while data:
+            if self._current is None:
+                self._current = hashlib.sha256(b'\x00')
+                self._filled = 0
+            take = min(len(data), self._record_size - self._filled)
+            self._current.update(data[:take])
+            self._filled += take
+            data = data[take:]
+            if self._filled == self._record_size:
+                self._leaves += self._current.digest()
+                self._current = None
+
+    def leaves(self):
+        """Empreintes des feuilles concaténées, y compris le dernier segment incomplet."""
+        if self._current is not None:
+            return bytes(self._leaves) + self._current.digest()
+        return bytes(self._leaves)
+
+    def root(self):
+        return merkle_root(self.leaves())
+
+
+class HashingWriter:
+    """Objet fichier en écriture qui transmet aussi chaque écriture à un hasher."""
+
+    def __init__(self, fileobj, hasher):
+        self._fileobj = fileobj
+        self._hasher = hasher
+
+    def write(self, data):
+        self._hasher.update(data)
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+
+def build_tree(fileobj):
+    """
+    Calcule l'arbre de Merkle d'un conteneur déjà écrit.
+
+    Args:
+        fileobj: Objet fichier en lecture positionné au début du conteneur
+
+    Returns:
+        tuple: (racine hexadécimale, empreintes des feuilles concaténées)
+    """
+    hasher = MerkleHasher()
+    while True:
+        chunk = fileobj.read(READ_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    leaves = hasher.leaves()
+    return merkle_root(leaves), leaves
+
+
+def _leaf_span(index, record_size, container_size):
+    if index == 0:
+        return 0, HEADER_SIZE
+    offset = HEADER_SIZE + (index - 1) * record_size
+    return offset, min(record_size, container_size - offset)
+
+
+def verify_container(fileobj, root, leaves, indices=None):
+    """
+    Vérifie les octets stockés d'un conteneur contre son arbre de Merkle.
+
+    Seules les feuilles demandées sont lues: un échantillon ne coûte que
+    quelques segments, quelle que soit la taille du fichier.
+
+    Args:
+        fileobj: Objet fichier en lecture, positionnable
+        root (str): Racine enregistrée
+        leaves (bytes): Empreintes des feuilles enregistrées
+        indices (iterable, optional): Feuilles à vérifier (toutes par défaut)
+
+    Returns:
+        tuple: (feuilles altérées, nombre de feuilles vérifiées, octets lus);
+        la feuille -1 signale des feuilles enregistrées incohérentes avec la
+        racine ou un conteneur de taille inattendue
+    """
+    if merkle_root(leaves) != root:
+        return [-1], 0, 0
+
+    count = len(leaves) // DIGEST_SIZE
+    container_size = fileobj.seek(0, 2)
+    fileobj.seek(0)
+    header = fileobj.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+        return [0], 1, len(header)
+    record_size = HEADER.unpack(header)[3] + SEGMENT_OVERHEAD
+    expected_size = HEADER_SIZE + (count - 2) * record_size + SEGMENT_OVERHEAD if count > 1 else HEADER_SIZE
+    if not expected_size <= container_size <= HEADER_SIZE + (count - 1) * record_size:
+        return [-1], 0, len(header)
+
+    bad = []
+    checked = 0
+    bytes_read = len(header)
+    indices = range(count) if indices is None else sorted(set(indices))
+    for index in indices:
+        if index == 0:
+            data = header
+        else:
+            offset, length = _leaf_span(index, record_size, container_size)
+            fileobj.seek(offset)
+            data = fileobj.read(length)
+            bytes_read += len(data)
+        checked += 1
+        if _leaf(data) != leaves[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE]:
+            bad.append(index)
+    return bad, checked, bytes_read
+
+
+def _content_digest(storage_path, encryption_key, codec):
+    data_key = unwrap_data_key(encryption_key) if encryption_key else None
+    hasher = hashlib.sha256()
+    with open_file(storage_path) as stored:
+        for chunk in iter_decompress(iter_decrypt_stream(stored, data_key), codec):
+            hasher.update(chunk)
+        size = stored.seek(0, 2)
+    return hasher.hexdigest(), size
+
+
+def verify_content(storage_path, encryption_key, codec, content_hash):
+    """
+    Déchiffre un objet stocké et compare l'empreinte de son contenu en clair.
+
+    Returns:
+        dict: Résultat de la vérification
+    """
+    try:
+        current_hash, size = _content_digest(storage_path, encryption_key, codec)
+    except FileNotFoundError:
+        return {'status': 'missing', 'current_hash': None, 'bytes_read': 0}
+    except EncryptionError as e:
+        return {'status': 'corrupt', 'current_hash': None, 'bytes_read': 0, 'error': str(e)}
+    return {
+        'status': 'valid' if current_hash == content_hash else 'corrupt',
+        'current_hash': current_hash,
+        'bytes_read': size,
+    }
+
+
+def verify_blob(blob, mode='full', sample_size=None):
+    """
+    Vérifie l'objet stocké d'un contenu.
+
+    Args:
+        blob (Blob): Le contenu à vérifier
+        mode (str): 'sample' (quelques segments tirés au hasard), 'full'
+            (tous les segments, sans déchiffrer) ou 'content' (déchiffrement
+            et comparaison de l'empreinte SHA-256 du contenu en clair)
+        sample_size (int, optional): Nombre de segments vérifiés en mode 'sample'
+
+    Returns:
+        dict: Résultat ('status', 'current_hash', 'bad_segments', 'bytes_read', ...)
+    """
+    if mode == 'content' or blob.merkle_root is None:
+        result = verify_content(blob.storage_path, blob.encryption_key, blob.compression, blob.content_hash)
+        result['mode'] = 'content'
+        return result
+
+    leaves = blob.merkle_leaves
+    count = len(leaves) // DIGEST_SIZE
+    indices = None
+    if mode == 'sample':
+        sample_size = sample_size or Config.INTEGRITY_SAMPLE_SEGMENTS
+        # L'en-tête et le dernier segment sont toujours vérifiés (troncature)
+        indices = {0, count - 1} | set(random.sample(range(count), min(sample_size, count)))
+
+    try:
+        with open_file(blob.storage_path) as stored:
+            bad, checked, bytes_read = verify_container(stored, blob.merkle_root, leaves, indices)
+    except FileNotFoundError:
+        return {'status': 'missing', 'mode': mode, 'current_hash': None, 'bytes_read': 0}
+
+    return {
+        'status': 'corrupt' if bad else 'valid',
+        'mode': mode,
+        'current_hash': None if bad else blob.merkle_root,
+        'bad_segments': [index - 1 for index in bad if index > 0],
+        'checked_segments': checked,
+        'bytes_read': bytes_read,
+    }
+
+
+def verify_file(file, mode='full'):
+    """
+    Vérifie l'objet stocké d'un fichier.
+
+    Les fichiers antérieurs à la déduplication n'ont pas d'arbre: leur
+    contenu est déchiffré lorsque son empreinte est connue.
+
+    Args:
+        file (File): Le fichier à vérifier
+        mode (str): Voir ``verify_blob``
+
+    Returns:
+        dict: Résultat de la vérification
+    """
+    if file.blob is not None:
+        return verify_blob(file.blob, mode)
+    if not file.content_hash:
+        return {'status': 'unverifiable', 'mode': mode, 'current_hash': None, 'bytes_read': 0}
+    result = verify_content(file.storage_path, file.encryption_key, file.compression, file.content_hash)
+    result['mode'] = 'content'
+    return result
+
+
+def _backfill(blob):
+    """Construit l'arbre d'un contenu stocké avant son introduction, après vérification de son contenu."""
+    result = verify_content(blob.storage_path, blob.encryption_key, blob.compression, blob.content_hash)
+    if result['status'] != 'valid':
+        result['mode'] = 'content'
+        return result
+    with open_file(blob.storage_path) as stored:
+        root, leaves = build_tree(stored)
+    Blob.query.filter_by(id=blob.id, merkle_root=None).update(
+        {Blob.merkle_root: root, Blob.merkle_leaves: leaves}, synchronize_session=False
+    )
+    File.query.filter_by(blob_id=blob.id).update({File.merkle_root: root}, synchronize_session=False)
+    result['mode'] = 'content'
+    _count(backfilled=1)
+    return result
+
+
+def _count(**values):
+    with _metrics_lock:
+        for name, value in values.items():
+            _metrics[name] += value
+
+
+def integrity_metrics():
+    """
+    Retourne les compteurs de la vérification d'intégrité du stockage.
+
+    Returns:
+        dict: Copie des compteurs (débit, contenus altérés, ...)
+    """
+    with _metrics_lock:
+        return {**_metrics, 'corrupt_blob_ids': list(_metrics['corrupt_blob_ids'])}
+
+
+def verify_store(mode='full', batch_size=100, stop_event=None):
+    """
+    Vérifie tous les contenus stockés, par lots.
+
+    Les contenus sans arbre de Merkle sont déchiffrés, comparés à leur
+    empreinte puis dotés d'un arbre.
+
+    Args:
+        mode (str): 'sample' ou 'full' (voir ``verify_blob``)
+        batch_size (int, optional): Nombre de contenus chargés par requête
+        stop_event (threading.Event, optional): Interrompt la vérification
+
+    Returns:
+        dict: Bilan (contenus vérifiés, altérés, manquants, débit en Mo/s)
+    """
+    started = time.monotonic()
+    stats = {'checked': 0, 'valid': 0, 'corrupt': 0, 'missing': 0, 'bytes_read': 0}
+    corrupt_ids = []
+    last_id = 0
+    while not (stop_event and stop_event.is_set()):
+        blobs = Blob.query.filter(Blob.id > last_id).order_by(Blob.id).limit(batch_size).all()
+        if not blobs:
+            break
+        last_id = blobs[-1].id
+        for blob in blobs:
+            result = _backfill(blob) if blob.merkle_root is None else verify_blob(blob, mode)
+            stats['checked'] += 1
+            stats[result['status']] += 1
+            stats['bytes_read'] += result['bytes_read']
+            if result['status'] == 'valid':
+                blob.verified_at = datetime.utcnow()
+            elif result['status'] == 'corrupt':
+                corrupt_ids.append(blob.id)
+                print(f"Contenu {blob.id} altéré ({blob.storage_path}): {result}")
+        db.session.commit()
+
+    duration = time.monotonic() - started
+    stats['seconds'] = round(duration, 3)
+    stats['throughput_mb_s'] = round(stats['bytes_read'] / (1024 * 1024) / duration, 1) if duration else None
+    with _metrics_lock:
+        _metrics['runs'] += 1
+        _metrics['last_run'] = datetime.utcnow().isoformat()
+        _metrics['last_duration_seconds'] = stats['seconds']
+        _metrics['last_throughput_mb_s'] = stats['throughput_mb_s']
+        _metrics['blobs_checked'] += stats['checked']
+        _metrics['bytes_read'] += stats['bytes_read']
+        _metrics['corrupt'] += stats['corrupt']
+        _metrics['missing'] += stats['missing']
+        _metrics['corrupt_blob_ids'] = corrupt_ids[-100:]
+    return stats
+
+
+def start_integrity_scan(app, interval=None, mode=None):
+    """
+    Lance la vérification d'intégrité du stockage en arrière-plan, à intervalle régulier.
+
+    Args:
+        app (Flask): L'application Flask
+        interval (float, optional): Intervalle en secondes entre deux passages
+        mode (str, optional): Mode de vérification ('sample' ou 'full')
+
+    Returns:
+        threading.Event: Événement à positionner pour arrêter la vérification
+    """
+    stop_event = threading.Event()
+    interval = interval or Config.INTEGRITY_SCAN_INTERVAL
+    mode = mode or Config.INTEGRITY_SCAN_MODE
+
+    def worker():
+        while not stop_event.wait(interval):
+            with app.app_context():
+                try:
+                    print(f"Vérification d'intégrité du stockage: {verify_store(mode, stop_event=stop_event)}")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Erreur de vérification d'intégrité: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=worker, name='integrity-scan', daemon=True).start()
+    return stop_event
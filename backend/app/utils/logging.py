@@ -1,4 +1,5 @@
 from app.models.user import db
+from app.utils import event_writer
 from datetime import datetime
 import json
 
@@ -12,6 +13,12 @@ class Log(db.Model):
     ip_address = db.Column(db.String(50), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Journal d'un utilisateur et d'un type d'action, du plus récent au plus ancien
+        db.Index('ix_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_logs_action_timestamp', 'action', 'timestamp'),
+    )
+    
     def __repr__(self):
         return f'<Log {self.action} by user_id={self.user_id}>'
     
@@ -46,7 +53,8 @@ def log_action(action, user_id, details, ip_address=None):
         ip_address=ip_address
     )
     
-    log_entry.save()
+    # Écrite par lot avec les autres événements, sans commit propre à la requête
+    event_writer.record(log_entry)
     
     # En plus de l'enregistrement en base de données, on pourrait également
     # écrire dans un fichier de log pour une redondance de sécurité
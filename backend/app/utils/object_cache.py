@@ -0,0 +1,263 @@
+import io
+import threading
+from collections import OrderedDict
+from app.config.config import Config
+from app.utils.storage_backends import StorageBackend, get_backend
+
+# Nombre d'objets dont la fréquence d'ouverture est suivie
+TRACKED_OBJECTS = 10000
+
+
+class BlockCache:
+    """
+    Cache en mémoire des blocs chiffrés des objets les plus demandés.
+
+    Les blocs sont évincés dans l'ordre LRU. Un objet n'est admis qu'à partir
+    de sa ``admit_after``-ième ouverture (fréquence suivie sur les objets
+    récents): un parcours ponctuel (archive ZIP, vérification d'intégrité,
+    gros téléchargement isolé) ne chasse donc pas les fichiers populaires.
+    Seuls des octets chiffrés sont conservés.
+    """
+
+    def __init__(self, max_bytes, block_size, admit_after=2):
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.admit_after = admit_after
+        self._blocks = OrderedDict()  # (clé, index du bloc) -> octets
+        self._indexes = {}  # clé -> indices des blocs en cache
+        self._objects = OrderedDict()  # clé -> [ouvertures, taille]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0,
+                         'bytes_from_cache': 0, 'bytes_from_backend': 0}
+
+    def note_open(self, key):
+        """
+        Enregistre l'ouverture d'un objet.
+
+        Returns:
+            tuple: (admissible dans le cache, taille connue ou None)
+        """
+        with self._lock:
+            entry = self._objects.pop(key, None) or [0, None]
+            entry[0] += 1
+            self._objects[key] = entry
+            if len(self._objects) > TRACKED_OBJECTS:
+                self._objects.popitem(last=False)
+            return entry[0] >= self.admit_after, entry[1]
+
+    def set_size(self, key, size):
+        with self._lock:
+            if key in self._objects:
+                self._objects[key][1] = size
+
+    def get(self, key, index):
+        with self._lock:
+            block = self._blocks.get((key, index))
+            if block is None:
+                self._metrics['misses'] += 1
+                return None
+            self._blocks.move_to_end((key, index))
+            self._metrics['hits'] += 1
+            self._metrics['bytes_from_cache'] += len(block)
+            return block
+
+    def put(self, key, index, block):
+        with self._lock:
+            self._metrics['bytes_from_backend'] += len(block)
+            if (key, index) in self._blocks or len(block) > self.max_bytes:
+                return
+            self._blocks[(key, index)] = block
+            self._indexes.setdefault(key, set()).add(index)
+            self._bytes += len(block)
+            while self._bytes > self.max_bytes:
+                (old_key, old_index), old_block = self._blocks.popitem(last=False)
+                self._forget(old_key, old_index, old_block)
+                self._metrics['evictions'] += 1
+
+    def count_backend_read(self, size):
+        with self._lock:
+            self._metrics['bytes_from_backend'] += size
+
+    def _forget(self, key, index, block):
+        self._bytes -= len(block)
+        indexes = self._indexes.get(key)
+        if indexes is not None:
+            indexes.discard(index)
+            if not indexes:
+                del self._indexes[key]
+
+    def invalidate(self, key):
+        """Retire un objet du cache (suppression ou réécriture de la clé)."""
+        with self._lock:
+            self._objects.pop(key, None)
+            for index in self._indexes.pop(key, ()):
+                self._bytes -= len(self._blocks.pop((key, index)))
+            self._metrics['invalidations'] += 1
+
+    def metrics(self):
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            dict: Succès, échecs, taux de succès, octets en cache, ...
+        """
+        with self._lock:
+            lookups = self._metrics['hits'] + self._metrics['misses']
+            return {
+                **self._metrics,
+                'hit_rate': round(self._metrics['hits'] / lookups, 4) if lookups else None,
+                'cached_bytes': self._bytes,
+                'cached_blocks': len(self._blocks),
+                'max_bytes': self.max_bytes,
+            }
+
+
+class _CachedReader(io.RawIOBase):
+    """Objet fichier positionnable qui lit un objet bloc par bloc à travers le cache."""
+
+    def __init__(self, cache, source, key, admit, size):
+        self._cache = cache
+        self._source = source
+        self._key = key
+        self._admit = admit
+        self._size = size
+        self._position = 0
+        # Dernier bloc lu: les petites lectures successives ne repassent pas par le cache
+        self._current = (None, b'')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _object_size(self):
+        if self._size is None:
+            self._size = self._source.seek(0, io.SEEK_END)
+            self._cache.set_size(self._key, self._size)
+        return self._size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._object_size()
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def _block(self, index):
+        if self._current[0] == index:
+            return self._current[1]
+        block = self._cache.get(self._key, index)
+        if block is None:
+            block = self._fetch(index)
+        self._current = (index, block)
+        return block
+
+    def _fetch(self, index):
+        self._source.seek(index * self._cache.block_size)
+        chunks = []
+        remaining = self._cache.block_size
+        while remaining:
+            chunk = self._source.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        block = b''.join(chunks)
+        # Un objet plus gros qu'un quart du cache le viderait à lui seul
+        if self._admit and self._object_size() <= self._cache.max_bytes // 4:
+            self._cache.put(self._key, index, block)
+        else:
+            self._cache.count_backend_read(len(block))
+        return block
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        size = self._object_size()
+        while filled < len(view) and self._position < size:
+            block_size = self._cache.block_size
+            index, offset = divmod(self._position, block_size)
+            block = self._block(index)
+            count = min(len(view) - filled, len(block) - offset)
+            if count <= 0:
+                break
+            view[filled:filled + count] = block[offset:offset + count]
+            filled += count
+            self._position += count
+        return filled
+
+    def close(self):
+        if not self.closed:
+            self._source.close()
+        super().close()
+
+
+class CachingStorageBackend(StorageBackend):
+    """
+    Pilote de stockage qui place un cache de blocs devant un autre pilote.
+
+    Les clés du stockage changent avec le contenu (nom aléatoire ou empreinte
+    suffixée): un bloc en cache ne peut donc pas devenir obsolète. Les
+    écritures et suppressions passant par ce pilote invalident tout de même
+    la clé concernée, pour libérer la mémoire au plus tôt.
+    """
+
+    def __init__(self, backend, max_bytes=None, block_size=None, admit_after=None):
+        self.backend = backend
+        self.cache = BlockCache(
+            max_bytes or Config.OBJECT_CACHE_SIZE,
+            block_size or Config.OBJECT_CACHE_BLOCK_SIZE,
+            admit_after or Config.OBJECT_CACHE_ADMIT_AFTER
+        )
+
+    def __getattr__(self, name):
+        # Attributs propres au pilote sous-jacent (root, bucket, ...)
+        return getattr(self.backend, name)
+
+    def put(self, key, source):
+        self.cache.invalidate(key)
+        self.backend.put(key, source)
+
+    def put_file(self, key, file_path, move=False):
+        self.cache.invalidate(key)
+        self.backend.put_file(key, file_path, move=move)
+
+    def get(self, key, destination_path):
+        self.backend.get(key, destination_path)
+
+    def open(self, key):
+        admit, size = self.cache.note_open(key)
+        return _CachedReader(self.cache, self.backend.open(key), key, admit, size)
+
+    def copy(self, source_key, destination_key):
+        self.cache.invalidate(destination_key)
+        self.backend.copy(source_key, destination_key)
+
+    def delete(self, key):
+        self.cache.invalidate(key)
+        self.backend.delete(key)
+
+    def stat(self, key):
+        return self.backend.stat(key)
+
+    def iter_objects(self, prefix=''):
+        return self.backend.iter_objects(prefix)
+
+
+def cache_metrics():
+    """
+    Retourne les compteurs du cache d'objets du pilote configuré.
+
+    Returns:
+        dict: Compteurs du cache, ou {'enabled': False} s'il est désactivé
+    """
+    backend = get_backend()
+    if not isinstance(backend, CachingStorageBackend):
+        return {'enabled': False}
+    return {'enabled': True, **backend.cache.metrics()}
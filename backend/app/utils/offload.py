@@ -0,0 +1,122 @@
+import threading
+import time
+from app.config.config import Config
+
+try:
+    from eventlet import patcher, tpool
+    from eventlet.semaphore import BoundedSemaphore as GreenSemaphore
+except ImportError:  # eventlet absent: les appels sont simplement exécutés sur place
+    patcher = tpool = GreenSemaphore = None
+
+# Sous eventlet, toutes les requêtes et les websockets d'un processus partagent
+# un seul thread système (le hub). Un calcul long en C (AES-GCM, PBKDF2, bcrypt,
+# zlib) bloque alors tout le processus: ces calculs sont confiés à un pool borné
+# de threads système (eventlet.tpool), les bibliothèques concernées relâchant le GIL.
+# Un pool de processus imposerait de sérialiser clés et segments à chaque appel.
+# Les fonctions confiées au pool ne doivent faire aucune E/S réseau « verte » ni
+# prendre de verrou partagé avec les greenlets (ils sont « verts » après monkey_patch).
+
+_metrics = {
+    'calls': 0,
+    'offloaded': 0,
+    'waiting': 0,
+    'running': 0,
+    'max_waiting': 0,
+    'wait_seconds_total': 0.0,
+    'run_seconds_total': 0.0,
+}
+_metrics_lock = threading.Lock()
+_slots = None
+_setup_lock = threading.Lock()
+# Marque les threads du pool: un appel imbriqué y est exécuté directement
+_local = threading.local()
+
+
+def enabled():
+    """Indique si les calculs sont confiés au pool (threads remplacés par eventlet et option activée)."""
+    return bool(Config.OFFLOAD_ENABLED and patcher is not None and patcher.is_monkey_patched('thread'))
+
+
+def _on_hub_thread():
+    # Seuls les greenlets du thread système qui fait tourner le hub (le thread
+    # principal) peuvent attendre le pool: depuis un autre thread système
+    # (serveur werkzeug quand create_app ne remplace que socket et select,
+    # pool des miniatures), tpool.execute attend un hub qui n'y tourne jamais.
+    return patcher.original('_thread').get_ident() == threading.main_thread().ident
+
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        with _setup_lock:
+            if _slots is None:
+                tpool.set_num_threads(Config.OFFLOAD_WORKERS)
+                _slots = GreenSemaphore(Config.OFFLOAD_WORKERS)
+    return _slots
+
+
+def run(func, *args, **kwargs):
+    """
+    Exécute un calcul coûteux sans bloquer le hub eventlet.
+
+    Hors eventlet, depuis un thread système autre que celui du hub (ou depuis
+    un thread du pool), la fonction est appelée directement. Les appelants en
+    excès attendent une place libre dans une file mesurée par ``offload_metrics``.
+
+    Args:
+        func: Fonction à exécuter (sans E/S réseau)
+
+    Returns:
+        Le résultat de ``func(*args, **kwargs)``
+    """
+    if getattr(_local, 'in_pool', False):
+        # Déjà dans un thread du pool: aucun verrou vert ne doit y être pris
+        return func(*args, **kwargs)
+    if not enabled() or not _on_hub_thread():
+        with _metrics_lock:
+            _metrics['calls'] += 1
+        return func(*args, **kwargs)
+
+    slots = _get_slots()
+    queued = time.monotonic()
+    with _metrics_lock:
+        _metrics['calls'] += 1
+        _metrics['waiting'] += 1
+        _metrics['max_waiting'] = max(_metrics['max_waiting'], _metrics['waiting'])
+    with slots:
+        started = time.monotonic()
+        with _metrics_lock:
+            _metrics['waiting'] -= 1
+            _metrics['running'] += 1
+            _metrics['wait_seconds_total'] += started - queued
+        try:
+            return tpool.execute(_in_pool, func, args, kwargs)
+        finally:
+            with _metrics_lock:
+                _metrics['running'] -= 1
+                _metrics['offloaded'] += 1
+                _metrics['run_seconds_total'] += time.monotonic() - started
+
+
+def _in_pool(func, args, kwargs):
+    _local.in_pool = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _local.in_pool = False
+
+
+def offload_metrics():
+    """
+    Retourne les compteurs du pool de calcul.
+
+    Returns:
+        dict: Appels, profondeur de la file (en attente, en cours, maximum), temps cumulés
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics['enabled'] = enabled()
+    metrics['workers'] = Config.OFFLOAD_WORKERS
+    metrics['wait_seconds_total'] = round(metrics['wait_seconds_total'], 3)
+    metrics['run_seconds_total'] = round(metrics['run_seconds_total'], 3)
+    return metrics
@@ -0,0 +1,87 @@
+import re
+from sqlalchemy import event
+
+# Lecture complète d'une table (« SCAN files ») ou de tout un index
+# (« SCAN files USING INDEX ... »), par opposition à une recherche par index
+# (« SEARCH files USING INDEX ... (owner_id=?) »). Les tables virtuelles (FTS5)
+# ont leur propre plan.
+_FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)\b(?! VIRTUAL TABLE)')
+
+# Sous-requête évaluée à part (« CO-ROUTINE anon_1 »): la parcourir n'est pas lire une table
+_SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+# Instructions dont le plan est examiné
+_EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class PlanRecorder:
+    """
+    Enregistre le plan d'exécution SQLite (EXPLAIN QUERY PLAN) de chaque requête
+    exécutée sur un moteur tant que l'enregistreur est actif.
+
+    Usage:
+        with PlanRecorder(db.engine) as recorder:
+            client.get('/api/files')
+        recorder.full_scans()
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        # Liste de (instruction SQL, lignes du plan)
+        self.plans = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._explain)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._explain)
+        return False
+
+    def _explain(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINED):
+            return
+        # Curseur distinct: celui de la requête en cours reste intact
+        explain_cursor = conn.connection.driver_connection.cursor()
+        try:
+            explain_cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            self.plans.append((statement, [row[3] for row in explain_cursor.fetchall()]))
+        finally:
+            explain_cursor.close()
+
+    def full_scans(self, allowed=()):
+        """
+        Retourne les requêtes enregistrées qui lisent une table entière.
+
+        Args:
+            allowed (iterable, optional): Tables (ou alias) dont la lecture complète est admise
+
+        Returns:
+            list: Couples (instruction SQL, étape du plan en cause)
+        """
+        allowed = set(allowed)
+        scans = []
+        for statement, plan in self.plans:
+            subqueries = {match.group(1) for match in map(_SUBQUERY.match, plan) if match}
+            for detail in plan:
+                match = _FULL_SCAN.match(detail)
+                if match and match.group(1) not in allowed | subqueries:
+                    scans.append((statement, detail))
+        return scans
+
+
+def format_plan(statement, plan):
+    """
+    Met en forme une requête et son plan pour un rapport.
+
+    Args:
+        statement (str): Instruction SQL
+        plan (list): Étapes du plan
+
+    Returns:
+        str: Texte sur plusieurs lignes
+    """
+    # La liste des colonnes n'apprend rien sur le plan
+    lines = [re.sub(r'^SELECT .*? FROM ', 'SELECT ... FROM ', ' '.join(statement.split()))]
+    lines.extend(f'    {detail}' for detail in plan)
+    return '\n'.join(lines)
@@ -0,0 +1,209 @@
+from sqlalchemy.exc import IntegrityError
+from app.config.config import Config
+from app.models.user import db
+from app.models.file import File
+from app.models.storage_usage import StorageUsage, StorageTypeUsage
+
+
+class QuotaExceeded(Exception):
+    """Le fichier ferait dépasser le quota de stockage de son propriétaire."""
+
+    def __init__(self, used_bytes, quota_bytes, requested_bytes):
+        super().__init__(f"Quota de stockage dépassé: {used_bytes} + {requested_bytes} > {quota_bytes} octets")
+        self.used_bytes = used_bytes
+        self.quota_bytes = quota_bytes
+        self.requested_bytes = requested_bytes
+
+    def to_dict(self):
+        return {
+            'error': 'Storage quota exceeded',
+            'used_bytes': self.used_bytes,
+            'quota_bytes': self.quota_bytes,
+            'requested_bytes': self.requested_bytes,
+        }
+
+
+def get_usage(user_id):
+    """
+    Lit l'espace occupé par un utilisateur et son quota, sans parcourir ses fichiers.
+
+    Args:
+        user_id (int): Identifiant du propriétaire
+
+    Returns:
+        dict: Octets utilisés, nombre de fichiers, quota (0: illimité) et espace restant
+    """
+    row = db.session.query(
+        StorageUsage.used_bytes, StorageUsage.file_count, StorageUsage.quota_bytes
+    ).filter(StorageUsage.user_id == user_id).first()
+    used, count, quota = row if row else (0, 0, None)
+    quota = Config.USER_STORAGE_QUOTA if quota is None else quota
+    return {
+        'used_bytes': used,
+        'file_count': count,
+        'quota_bytes': quota,
+        'available_bytes': max(quota - used, 0) if quota else None,
+    }
+
+
+def check_quota(user_id, incoming):
+    """
+    Refuse d'emblée un téléversement qui ne peut pas tenir dans le quota.
+
+    Simple lecture des compteurs: la vérification qui fait foi est celle de
+    ``charge``, dans la transaction qui crée le fichier.
+
+    Args:
+        user_id (int): Identifiant du propriétaire
+        incoming (int): Taille annoncée du téléversement en octets
+
+    Raises:
+        QuotaExceeded: Si le quota serait dépassé
+    """
+    usage = get_usage(user_id)
+    if usage['quota_bytes'] and usage['used_bytes'] + incoming > usage['quota_bytes']:
+        raise QuotaExceeded(usage['used_bytes'], usage['quota_bytes'], incoming)
+
+
+def _bump_type(mime_type, size, count):
+    updated = StorageTypeUsage.query.filter_by(mime_type=mime_type).update({
+        StorageTypeUsage.used_bytes: StorageTypeUsage.used_bytes + size,
+        StorageTypeUsage.file_count: StorageTypeUsage.file_count + count,
+    }, synchronize_session=False)
+    if updated or count < 0:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StorageTypeUsage(mime_type=mime_type, used_bytes=size, file_count=count))
+    except IntegrityError:
+        # Ligne créée entre-temps par un autre téléversement
+        _bump_type(mime_type, size, count)
+
+
+def charge(user_id, size, mime_type):
+    """
+    Ajoute un fichier aux compteurs de son propriétaire, dans la transaction en cours.
+
+    L'incrément n'a lieu que si le quota le permet, par une seule requête
+    UPDATE conditionnelle: deux téléversements simultanés ne peuvent pas
+    dépasser le quota à eux deux. L'appelant valide la transaction avec la
+    création du fichier.
+
+    Args:
+        user_id (int): Identifiant du propriétaire
+        size (int): Taille du fichier (File.size)
+        mime_type (str): Type MIME du fichier
+
+    Raises:
+        QuotaExceeded: Si le quota serait dépassé
+    """
+    quota = db.func.coalesce(StorageUsage.quota_bytes, Config.USER_STORAGE_QUOTA)
+    updated = StorageUsage.query.filter(
+        StorageUsage.user_id == user_id,
+        db.or_(quota == 0, StorageUsage.used_bytes + size <= quota)
+    ).update({
+        StorageUsage.used_bytes: StorageUsage.used_bytes + size,
+        StorageUsage.file_count: StorageUsage.file_count + 1,
+    }, synchronize_session=False)
+
+    if not updated:
+        usage = get_usage(user_id)
+        if usage['quota_bytes'] and usage['used_bytes'] + size > usage['quota_bytes']:
+            raise QuotaExceeded(usage['used_bytes'], usage['quota_bytes'], size)
+        # Premier fichier de l'utilisateur
+        try:
+            with db.session.begin_nested():
+                db.session.add(StorageUsage(user_id=user_id, used_bytes=size, file_count=1))
+        except IntegrityError:
+            return charge(user_id, size, mime_type)
+
+    _bump_type(mime_type, size, 1)
+
+
+def credit(user_id, size, mime_type):
+    """
+    Retire un fichier supprimé des compteurs, dans la transaction en cours.
+
+    Args:
+        user_id (int): Identifiant du propriétaire
+        size (int): Taille du fichier (File.size)
+        mime_type (str): Type MIME du fichier
+    """
+    StorageUsage.query.filter_by(user_id=user_id).update({
+        StorageUsage.used_bytes: StorageUsage.used_bytes - size,
+        StorageUsage.file_count: StorageUsage.file_count - 1,
+    }, synchronize_session=False)
+    _bump_type(mime_type, -size, -1)
+
+
+def set_quota(user_id, quota_bytes):
+    """
+    Définit le quota propre à un utilisateur.
+
+    Args:
+        user_id (int): Identifiant de l'utilisateur
+        quota_bytes (int, optional): Quota en octets, 0 pour illimité, None pour la valeur par défaut
+    """
+    updated = StorageUsage.query.filter_by(user_id=user_id).update(
+        {StorageUsage.quota_bytes: quota_bytes}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(StorageUsage(user_id=user_id, used_bytes=0, file_count=0, quota_bytes=quota_bytes))
+    db.session.commit()
+
+
+def usage_totals():
+    """
+    Totaux de stockage pour les tableaux de bord, lus dans les compteurs.
+
+    Returns:
+        dict: Octets et fichiers au total, puis par type MIME
+    """
+    used, count = db.session.query(
+        db.func.coalesce(db.func.sum(StorageUsage.used_bytes), 0),
+        db.func.coalesce(db.func.sum(StorageUsage.file_count), 0)
+    ).one()
+    by_type = StorageTypeUsage.query.filter(StorageTypeUsage.file_count > 0).all()
+    return {
+        'used_bytes': int(used),
+        'file_count': int(count),
+        'by_type': {row.mime_type: {'used_bytes': row.used_bytes, 'file_count': row.file_count} for row in by_type},
+    }
+
+
+def reconcile_usage():
+    """
+    Recalcule les compteurs à partir de la table des fichiers et corrige les écarts.
+
+    Chaque table est corrigée par une seule requête UPDATE corrélée, qui reste
+    cohérente avec les téléversements concurrents. Sert de rattrapage pour
+    les bases antérieures aux compteurs et au ramasse-miettes.
+
+    Returns:
+        int: Nombre de lignes de compteurs corrigées
+    """
+    # Propriétaires et types sans ligne de compteurs
+    owners = db.session.query(File.owner_id).outerjoin(
+        StorageUsage, StorageUsage.user_id == File.owner_id
+    ).filter(StorageUsage.user_id.is_(None)).distinct().all()
+    for (owner_id,) in owners:
+        db.session.add(StorageUsage(user_id=owner_id, used_bytes=0, file_count=0))
+    types = db.session.query(File.mime_type).outerjoin(
+        StorageTypeUsage, StorageTypeUsage.mime_type == File.mime_type
+    ).filter(StorageTypeUsage.mime_type.is_(None)).distinct().all()
+    for (mime_type,) in types:
+        db.session.add(StorageTypeUsage(mime_type=mime_type, used_bytes=0, file_count=0))
+    db.session.flush()
+
+    corrected = 0
+    for model, column, key in (
+        (StorageUsage, File.owner_id, StorageUsage.user_id),
+        (StorageTypeUsage, File.mime_type, StorageTypeUsage.mime_type),
+    ):
+        used = db.select(db.func.coalesce(db.func.sum(File.size), 0)).where(column == key).scalar_subquery()
+        count = db.select(db.func.count(File.id)).where(column == key).scalar_subquery()
+        corrected += model.query.filter(
+            db.or_(model.used_bytes != used, model.file_count != count)
+        ).update({model.used_bytes: used, model.file_count: count}, synchronize_session=False)
+    db.session.commit()
+    return corrected
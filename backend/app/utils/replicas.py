@@ -0,0 +1,251 @@
+import itertools
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from app.config.config import Config
+
+# Les requêtes en lecture seule (GET, HEAD) sont servies par un réplica quand
+# il y en a un en bonne santé. Tout le reste va au primaire: écritures, flush,
+# requêtes suivant une écriture dans la même transaction, et lectures d'un
+# utilisateur qui vient d'écrire (le réplica peut ne pas avoir encore reçu ses
+# changements).
+
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+# Compteurs cumulés depuis le démarrage du processus
+_metrics = {
+    'replica_reads': 0,
+    'primary_reads': 0,
+    'sticky_reads': 0,
+    'fallbacks': 0,
+    'health_failures': 0,
+}
+_metrics_lock = threading.Lock()
+
+# Dernière écriture de chaque utilisateur: {user_id: instant (monotonic)}
+_last_writes = {}
+_last_writes_lock = threading.Lock()
+
+
+def _count(name):
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+class ReplicaRouter:
+    """
+    Moteurs des réplicas d'une application, avec leur état de santé.
+
+    Un réplica en échec n'est plus utilisé jusqu'au contrôle suivant réussi.
+    """
+
+    def __init__(self, urls):
+        from app.utils.database import configure_sqlite, database_uri, engine_options
+
+        self.engines = []
+        for url in urls:
+            url = database_uri(url)
+            if make_url(url).get_backend_name() == 'sqlite':
+                configure_sqlite()
+            engine = create_engine(url, **engine_options(url))
+            # Un réplica qui perd ses connexions est écarté sans attendre le contrôle suivant
+            event.listen(engine, 'handle_error', self._on_error)
+            self.engines.append(engine)
+        self.healthy = list(self.engines)
+        self._cycle = itertools.count()
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """
+        Returns:
+            Engine: Réplica en bonne santé (à tour de rôle), ou None
+        """
+        with self._lock:
+            if not self.healthy:
+                return None
+            return self.healthy[next(self._cycle) % len(self.healthy)]
+
+    def _on_error(self, context):
+        if context.is_disconnect and context.engine is not None:
+            self.mark_unhealthy(context.engine)
+
+    def mark_unhealthy(self, engine):
+        with self._lock:
+            if engine in self.healthy:
+                self.healthy.remove(engine)
+        _count('health_failures')
+
+    def check_health(self):
+        """
+        Contrôle chaque réplica par une requête triviale.
+
+        Returns:
+            int: Nombre de réplicas en bonne santé
+        """
+        healthy = []
+        for engine in self.engines:
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                healthy.append(engine)
+            except Exception as e:
+                print(f"Réplica {engine.url.render_as_string(hide_password=True)} indisponible: {e}")
+                _count('health_failures')
+        with self._lock:
+            self.healthy = healthy
+        return len(healthy)
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+
+
+def init_replicas(app, urls=None):
+    """
+    Configure les réplicas en lecture d'une application.
+
+    Args:
+        app (Flask): L'application Flask
+        urls (list, optional): URI des réplicas (par défaut: Config.DATABASE_REPLICA_URLS)
+
+    Returns:
+        ReplicaRouter: Routeur installé, ou None sans réplica
+    """
+    urls = Config.DATABASE_REPLICA_URLS if urls is None else urls
+    if not urls:
+        return None
+    router = ReplicaRouter(urls)
+    router.check_health()
+    app.extensions['db_replicas'] = router
+    return router
+
+
+def start_replica_health_checks(app):
+    """
+    Lance le contrôle périodique des réplicas dans un thread démon.
+
+    Args:
+        app (Flask): L'application Flask
+    """
+    router = app.extensions.get('db_replicas')
+    if router is None:
+        return None
+
+    def run():
+        while True:
+            time.sleep(Config.REPLICA_HEALTH_INTERVAL)
+            try:
+                router.check_health()
+            except Exception as e:
+                print(f"Erreur lors du contrôle des réplicas: {e}")
+
+    thread = threading.Thread(target=run, name='replica-health', daemon=True)
+    thread.start()
+    return thread
+
+
+def use_primary():
+    """Envoie au primaire toutes les requêtes de la requête HTTP en cours."""
+    g.db_use_primary = True
+
+
+def _current_user_id():
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        identity = get_jwt_identity()
+    except Exception:
+        return None
+    return int(identity) if identity is not None else None
+
+
+def _recently_wrote(user_id):
+    with _last_writes_lock:
+        written_at = _last_writes.get(user_id)
+    return written_at is not None and time.monotonic() - written_at < Config.REPLICA_STICKY_SECONDS
+
+
+def record_write(user_id):
+    """
+    Note une écriture d'un utilisateur: ses lectures vont au primaire pendant
+    Config.REPLICA_STICKY_SECONDS.
+    """
+    now = time.monotonic()
+    with _last_writes_lock:
+        _last_writes[user_id] = now
+        # Les entrées échues ne servent plus
+        if len(_last_writes) > 10000:
+            for stale in [key for key, value in _last_writes.items()
+                          if now - value >= Config.REPLICA_STICKY_SECONDS]:
+                del _last_writes[stale]
+
+
+def replica_metrics():
+    """
+    Retourne les compteurs du routage vers les réplicas.
+
+    Returns:
+        dict: Copie des compteurs (lectures servies par un réplica, repli sur le primaire, ...)
+    """
+    router = current_app.extensions.get('db_replicas') if current_app else None
+    with _metrics_lock:
+        return {
+            **_metrics,
+            'replicas': len(router.engines) if router else 0,
+            'healthy_replicas': len(router.healthy) if router else 0,
+        }
+
+
+class RoutingSession(Session):
+    """Session qui envoie les lectures des requêtes GET et HEAD à un réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self._replica_for(clause)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_for(self, clause):
+        if not has_request_context() or request.method not in READ_ONLY_METHODS:
+            return None
+        router = current_app.extensions.get('db_replicas')
+        if router is None:
+            return None
+        # Écriture en cours ou déjà faite dans cette transaction: le primaire seul a ces données
+        if self._flushing or self.info.get('wrote') or getattr(clause, 'is_dml', False):
+            _count('primary_reads')
+            return None
+        if g.get('db_use_primary'):
+            _count('primary_reads')
+            return None
+        user_id = _current_user_id()
+        if user_id is not None and _recently_wrote(user_id):
+            _count('sticky_reads')
+            return None
+        engine = router.pick()
+        if engine is None:
+            _count('fallbacks')
+            return None
+        _count('replica_reads')
+        return engine
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        user_id = _current_user_id()
+        if user_id is not None:
+            record_write(user_id)
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    session.info.pop('wrote', None)
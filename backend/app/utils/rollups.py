@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import event, insert, inspect as sa_inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
+from app.models.user import db
+from app.models.activity_rollup import ActivityRollup
+from app.models.file import File
+from app.models.file_share import FileShare
+from app.utils.logging import Log
+
+# Les statistiques d'activité sont lues dans activity_rollups, un compteur par
+# jour, action et utilisateur tenu à jour au fil des écritures: chaque flush de
+# session qui ajoute une entrée de journal incrémente son compteur dans la même
+# transaction. Les partages de fichiers y figurent sous l'action FILE_SHARES,
+# au nom du propriétaire du fichier et au jour de création du partage.
+
+FILE_SHARES = 'FILE_SHARES'
+
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _increments(session):
+    increments = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Log) and obj.timestamp is not None:
+            increments[(obj.timestamp.date(), obj.action, obj.user_id)] += 1
+        elif isinstance(obj, FileShare):
+            _count_share(session, increments, obj, 1)
+    for obj in session.deleted:
+        if isinstance(obj, FileShare):
+            _count_share(session, increments, obj, -1)
+    return {key: delta for key, delta in increments.items() if delta}
+
+
+def _count_share(session, increments, share, delta):
+    # Un partage en attente ne charge pas sa relation: le fichier est lu par sa clé
+    file = sa_inspect(share).attrs.file.loaded_value
+    if file is NO_VALUE or file is None:
+        file = session.get(File, share.file_id)
+    owner_id = file.owner_id if file is not None else None
+    if owner_id is not None and share.created_at is not None:
+        increments[(share.created_at.date(), FILE_SHARES, owner_id)] += delta
+
+
+def _apply(connection, increments):
+    table = ActivityRollup.__table__
+    # Toujours dans le même ordre: deux transactions ne s'attendent pas mutuellement
+    rows = [{'day': day, 'action': action, 'user_id': user_id, 'count': delta}
+            for (day, action, user_id), delta in sorted(increments.items())]
+    make_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if make_insert is not None:
+        statement = make_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.action, table.c.user_id],
+            set_={'count': table.c.count + statement.excluded['count']},
+        )
+        connection.execute(statement, rows)
+        return
+    for row in rows:
+        updated = connection.execute(table.update().where(
+            table.c.day == row['day'], table.c.action == row['action'], table.c.user_id == row['user_id']
+        ).values(count=table.c.count + row['count']))
+        if not updated.rowcount:
+            connection.execute(table.insert().values(**row))
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups(session, flush_context):
+    increments = _increments(session)
+    if increments:
+        _apply(session.connection(), increments)
+
+
+def rebuild_rollups():
+    """
+    Recalcule les compteurs d'activité à partir des journaux et des partages.
+
+    Sert de rattrapage pour les bases antérieures aux compteurs; les entrées
+    de journal écrites pendant le recalcul doivent être évitées (à lancer
+    application arrêtée sur PostgreSQL).
+
+    Returns:
+        int: Nombre de lignes de compteurs créées
+    """
+    ActivityRollup.query.delete(synchronize_session=False)
+    columns = ['day', 'action', 'user_id', 'count']
+    log_day = db.func.date(Log.timestamp)
+    db.session.execute(insert(ActivityRollup).from_select(columns, select(
+        log_day, Log.action, Log.user_id, db.func.count()
+    ).where(Log.timestamp.isnot(None)).group_by(log_day, Log.action, Log.user_id)))
+    share_day = db.func.date(FileShare.created_at)
+    db.session.execute(insert(ActivityRollup).from_select(columns, select(
+        share_day, db.literal(FILE_SHARES), File.owner_id, db.func.count()
+    ).join(File, File.id == FileShare.file_id).where(
+        FileShare.created_at.isnot(None)
+    ).group_by(share_day, File.owner_id)))
+    db.session.commit()
+    return ActivityRollup.query.count()
+
+
+def daily_counts(actions, since, user_id=None):
+    """
+    Nombre d'actions par jour depuis une date, lu dans les compteurs.
+
+    Args:
+        actions (list): Actions comptées (UPLOAD, DOWNLOAD, FILE_SHARES, ...)
+        since (date): Premier jour inclus
+        user_id (int, optional): Utilisateur concerné (par défaut: tous)
+
+    Returns:
+        dict: {(jour, action): nombre}
+    """
+    query = db.session.query(
+        ActivityRollup.day, ActivityRollup.action, db.func.sum(ActivityRollup.count)
+    ).filter(ActivityRollup.action.in_(actions), ActivityRollup.day >= since)
+    if user_id is not None:
+        query = query.filter(ActivityRollup.user_id == user_id)
+    rows = query.group_by(ActivityRollup.day, ActivityRollup.action).all()
+    return {(day, action): int(count) for day, action, count in rows}
+
+
+def totals(actions, user_id=None):
+    """
+    Nombre total d'actions, lu dans les compteurs.
+
+    Args:
+        actions (list): Actions comptées
+        user_id (int, optional): Utilisateur concerné (par défaut: tous)
+
+    Returns:
+        dict: {action: nombre}, 0 pour une action jamais enregistrée
+    """
+    query = db.session.query(ActivityRollup.action, db.func.sum(ActivityRollup.count)).filter(
+        ActivityRollup.action.in_(actions)
+    )
+    if user_id is not None:
+        query = query.filter(ActivityRollup.user_id == user_id)
+    counts = dict(query.group_by(ActivityRollup.action).all())
+    return {action: int(counts.get(action) or 0) for action in actions}
+
+
+def week_days(today):
+    """
+    Returns:
+        list: Les sept jours (date) de la semaine de ``today``, du lundi au dimanche
+    """
+    monday = today - timedelta(days=today.weekday())
+    return [monday + timedelta(days=i) for i in range(7)]
@@ -0,0 +1,345 @@
+import re
+import threading
+import time
+from sqlalchemy import DDL, event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from app.config.config import Config
+from app.models.user import db
+from app.models.file import File, Message
+from app.models.file_share import FileShare
+from app.models.Message import Chat
+from app.models.search_document import SearchDocument, SEARCH_INDEX_TABLE
+
+# Les noms de fichiers, les discussions et les messages de chat sont indexés au
+# fil des écritures: chaque flush de session qui ajoute, modifie ou supprime
+# l'un d'eux met à jour l'index dans la même transaction.
+
+# Nombre maximal de mots pris en compte dans une recherche
+MAX_TERMS = 10
+
+_KINDS = {File: 'file', Message: 'message', Chat: 'chat'}
+
+# Champs indexés de chaque modèle: une modification d'un autre champ ne réindexe pas
+_INDEXED_FIELDS = {
+    File: ('name',),
+    Message: ('content',),
+    Chat: ('content', 'content_type', 'file_name'),
+}
+
+# Compteurs cumulés depuis le démarrage du processus
+_metrics = {
+    'queries': 0,
+    'query_ms_total': 0.0,
+    'slowest_query_ms': 0.0,
+    'documents_indexed': 0,
+    'documents_removed': 0,
+}
+_metrics_lock = threading.Lock()
+
+# Table FTS5 créée et supprimée avec search_documents (SQLite uniquement)
+event.listen(SearchDocument.__table__, 'after_create', DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} USING fts5("
+    "title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+).execute_if(dialect='sqlite'))
+event.listen(SearchDocument.__table__, 'before_drop', DDL(
+    f"DROP TABLE IF EXISTS {SEARCH_INDEX_TABLE}"
+).execute_if(dialect='sqlite'))
+
+
+def _count(**values):
+    with _metrics_lock:
+        for name, value in values.items():
+            _metrics[name] += value
+
+
+def search_metrics():
+    """
+    Retourne les compteurs de la recherche plein texte.
+
+    Returns:
+        dict: Copie des compteurs (requêtes, durée moyenne, documents indexés, ...)
+    """
+    with _metrics_lock:
+        queries = _metrics['queries']
+        return {
+            **_metrics,
+            'engine': Config.SEARCH_ENGINE,
+            'avg_query_ms': round(_metrics['query_ms_total'] / queries, 2) if queries else None,
+        }
+
+
+def parse_query(text):
+    """
+    Extrait les mots d'une recherche saisie par l'utilisateur.
+
+    Args:
+        text (str): Texte saisi
+
+    Returns:
+        list: Mots (au plus MAX_TERMS), vide si le texte n'en contient aucun
+    """
+    return re.findall(r'\w+', text or '')[:MAX_TERMS]
+
+
+def _document(obj):
+    """Champs indexés d'un fichier, d'un message de discussion ou d'un message de chat."""
+    if isinstance(obj, File):
+        return {'kind': 'file', 'ref': str(obj.id), 'file_id': obj.id,
+                'sender_id': None, 'receiver_id': None, 'title': obj.name, 'body': ''}
+    if isinstance(obj, Message):
+        return {'kind': 'message', 'ref': str(obj.id), 'file_id': int(obj.file_id),
+                'sender_id': None, 'receiver_id': None, 'title': '', 'body': obj.content}
+    # Chat: le contenu d'un message média est une URL, seul le nom du fichier joint est indexé
+    return {'kind': 'chat', 'ref': str(obj.id), 'file_id': None,
+            'sender_id': obj.sender_id, 'receiver_id': obj.receiver_id,
+            'title': obj.file_name or '', 'body': obj.content if obj.content_type == 'text' else ''}
+
+
+def _changed(obj):
+    state = sa_inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in _INDEXED_FIELDS[type(obj)])
+
+
+class SearchEngine:
+    """
+    Interface commune des moteurs de recherche.
+
+    Un moteur peut tenir son propre index (``maintains_index``), mis à jour
+    dans la transaction de l'écriture, ou interroger directement les tables.
+    """
+    maintains_index = False
+
+    def index(self, connection, documents):
+        """
+        Ajoute ou remplace des documents dans l'index.
+
+        Args:
+            connection: Connexion de la transaction en cours
+            documents (list): Documents produits par ``_document``
+        """
+
+    def remove(self, connection, keys, file_ids=()):
+        """
+        Retire des documents de l'index.
+
+        Args:
+            connection: Connexion de la transaction en cours
+            keys (list): Couples (kind, ref) des documents supprimés
+            file_ids (iterable, optional): Fichiers supprimés (avec leurs discussions)
+        """
+
+    def search(self, user_id, terms, limit, offset):
+        """
+        Recherche les documents accessibles à un utilisateur.
+
+        Args:
+            user_id (int): Identifiant de l'utilisateur
+            terms (list): Mots recherchés (tous requis, en préfixe)
+            limit (int): Nombre maximal de résultats
+            offset (int): Nombre de résultats à sauter
+
+        Returns:
+            list: Résultats (dict type, id, fileId, fileName, snippet)
+        """
+        raise NotImplementedError
+
+
+class Fts5SearchEngine(SearchEngine):
+    """Moteur SQLite FTS5: index inversé classé par pertinence (bm25)."""
+    maintains_index = True
+
+    def index(self, connection, documents):
+        table = SearchDocument.__table__
+        for document in documents:
+            existing = connection.execute(
+                db.select(table.c.id).where(table.c.kind == document['kind'], table.c.ref == document['ref'])
+            ).scalar()
+            if existing is None:
+                existing = connection.execute(table.insert().values(
+                    kind=document['kind'], ref=document['ref'], file_id=document['file_id'],
+                    sender_id=document['sender_id'], receiver_id=document['receiver_id']
+                )).inserted_primary_key[0]
+            else:
+                connection.execute(db.text(f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = :id"), {'id': existing})
+            connection.execute(
+                db.text(f"INSERT INTO {SEARCH_INDEX_TABLE} (rowid, title, body) VALUES (:id, :title, :body)"),
+                {'id': existing, 'title': document['title'], 'body': document['body']}
+            )
+
+    def remove(self, connection, keys, file_ids=()):
+        table = SearchDocument.__table__
+        conditions = [db.and_(table.c.kind == kind, table.c.ref == ref) for kind, ref in keys]
+        if file_ids:
+            conditions.append(table.c.file_id.in_(list(file_ids)))
+        if not conditions:
+            return
+        ids = connection.execute(db.select(table.c.id).where(db.or_(*conditions))).scalars().all()
+        if ids:
+            connection.execute(db.text(f"DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid IN ({','.join(map(str, ids))})"))
+            connection.execute(table.delete().where(table.c.id.in_(ids)))
+        _count(documents_removed=len(ids))
+
+    def search(self, user_id, terms, limit, offset):
+        # Chaque mot est cité (pas de syntaxe FTS5 injectée) et cherché en préfixe
+        match = ' '.join('"%s"*' % term for term in terms)
+        # Seuls les documents classés par l'index sont filtrés par les droits (jointure par rowid)
+        rows = db.session.execute(db.text(f"""
+            SELECT d.kind, d.ref, d.file_id, f.name,
+                   snippet({SEARCH_INDEX_TABLE}, -1, '**', '**', '…', 12)
+            FROM {SEARCH_INDEX_TABLE}
+            JOIN search_documents d ON d.id = {SEARCH_INDEX_TABLE}.rowid
+            LEFT JOIN files f ON f.id = d.file_id
+            WHERE {SEARCH_INDEX_TABLE} MATCH :match
+              AND (d.sender_id = :user_id OR d.receiver_id = :user_id
+                   OR f.owner_id = :user_id
+                   OR d.file_id IN (SELECT file_id FROM file_shares WHERE user_id = :user_id))
+            ORDER BY {SEARCH_INDEX_TABLE}.rank
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'user_id': user_id, 'limit': limit, 'offset': offset})
+        return [_hit(*row) for row in rows]
+
+
+class LikeSearchEngine(SearchEngine):
+    """Moteur sans index: recherche par LIKE dans les tables, du plus récent au plus ancien."""
+
+    def search(self, user_id, terms, limit, offset):
+        def contains(column):
+            return db.and_(*[
+                column.ilike('%' + term.replace('_', '\\_') + '%', escape='\\') for term in terms
+            ])
+
+        accessible = db.or_(
+            File.owner_id == user_id,
+            File.id.in_(db.select(FileShare.file_id).where(FileShare.user_id == user_id))
+        )
+        files = db.select(
+            db.literal('file').label('kind'), db.cast(File.id, db.String).label('ref'),
+            File.id.label('file_id'), File.name.label('file_name'), File.name.label('snippet'),
+            File.created_at.label('created_at')
+        ).where(contains(File.name), accessible)
+        messages = db.select(
+            db.literal('message'), Message.id, File.id, File.name, Message.content, Message.created_at
+        ).join(File, File.id == Message.file_id).where(contains(Message.content), accessible)
+        chats = db.select(
+            db.literal('chat'), Chat.id, db.null(), Chat.file_name, Chat.content, Chat.created_at
+        ).where(
+            db.or_(Chat.sender_id == user_id, Chat.receiver_id == user_id),
+            db.or_(db.and_(Chat.content_type == 'text', contains(Chat.content)), contains(Chat.file_name))
+        )
+        union = db.union_all(files, messages, chats).subquery()
+        rows = db.session.execute(
+            db.select(union.c.kind, union.c.ref, union.c.file_id, union.c.file_name, union.c.snippet)
+            .order_by(union.c.created_at.desc()).limit(limit).offset(offset)
+        )
+        return [_hit(*row) for row in rows]
+
+
+def _hit(kind, ref, file_id, file_name, snippet):
+    return {
+        'type': kind,
+        'id': int(ref) if kind == 'file' else ref,
+        'fileId': file_id,
+        'fileName': file_name,
+        'snippet': snippet,
+    }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Retourne le moteur de recherche configuré (Config.SEARCH_ENGINE); FTS5
+    n'existant que sous SQLite, les autres bases utilisent le moteur 'like'.
+
+    Returns:
+        SearchEngine: Instance partagée par le processus
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if Config.SEARCH_ENGINE == 'like' or db.engine.dialect.name != 'sqlite':
+                    _engine = LikeSearchEngine()
+                else:
+                    _engine = Fts5SearchEngine()
+    return _engine
+
+
+def search(user_id, text, limit, offset=0):
+    """
+    Recherche dans les fichiers, discussions et messages de chat accessibles à un utilisateur.
+
+    Args:
+        user_id (int): Identifiant de l'utilisateur
+        text (str): Texte saisi
+        limit (int): Nombre maximal de résultats
+        offset (int, optional): Nombre de résultats à sauter
+
+    Returns:
+        list: Résultats, les plus pertinents d'abord
+
+    Raises:
+        ValueError: Si le texte ne contient aucun mot
+    """
+    terms = parse_query(text)
+    if not terms:
+        raise ValueError('Empty search query')
+    started = time.perf_counter()
+    results = get_engine().search(user_id, terms, limit, offset)
+    elapsed = (time.perf_counter() - started) * 1000
+    with _metrics_lock:
+        _metrics['queries'] += 1
+        _metrics['query_ms_total'] += elapsed
+        _metrics['slowest_query_ms'] = max(_metrics['slowest_query_ms'], round(elapsed, 2))
+    return results
+
+
+def rebuild():
+    """
+    Reconstruit tout l'index à partir des tables (après une restauration ou un changement de moteur).
+
+    Returns:
+        int: Nombre de documents indexés
+    """
+    engine = get_engine()
+    if not engine.maintains_index:
+        return 0
+    connection = db.session.connection()
+    connection.execute(db.text(f"DELETE FROM {SEARCH_INDEX_TABLE}"))
+    connection.execute(SearchDocument.__table__.delete())
+    total = 0
+    for model in (File, Message, Chat):
+        documents = [_document(obj) for obj in model.query.options(db.lazyload('*')).yield_per(1000)]
+        engine.index(connection, documents)
+        total += len(documents)
+    db.session.commit()
+    _count(documents_indexed=total)
+    return total
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_index(session, flush_context):
+    engine = get_engine()
+    if not engine.maintains_index:
+        return
+    documents, keys, file_ids = [], [], set()
+    for obj in session.new:
+        if type(obj) in _INDEXED_FIELDS:
+            documents.append(_document(obj))
+    for obj in session.dirty:
+        if type(obj) in _INDEXED_FIELDS and _changed(obj):
+            documents.append(_document(obj))
+    for obj in session.deleted:
+        if isinstance(obj, File):
+            # Le fichier et toute sa discussion
+            file_ids.add(obj.id)
+        elif type(obj) in _INDEXED_FIELDS:
+            keys.append((_KINDS[type(obj)], str(obj.id)))
+    if not (documents or keys or file_ids):
+        return
+    connection = session.connection()
+    engine.remove(connection, keys, file_ids)
+    engine.index(connection, documents)
+    _count(documents_indexed=len(documents))
@@ -1,4 +1,5 @@
 import bcrypt
+from app.utils import offload
 
 def hash_password(password):
     """
@@ -13,7 +14,8 @@ def hash_password(password):
     # Générer un sel et hacher le mot de passe
     password_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt(rounds=12)  # 12 rounds est recommandé pour la sécurité
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    # ~250 ms de calcul: hors du hub eventlet
+    hashed = offload.run(bcrypt.hashpw, password_bytes, salt)
     
     # Retourner le hash en format string
     return hashed.decode('utf-8')
@@ -33,4 +35,4 @@ def check_password(password, hashed_password):
     hashed_bytes = hashed_password.encode('utf-8')
     
     # Vérifier le mot de passe
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    return offload.run(bcrypt.checkpw, password_bytes, hashed_bytes)
@@ -1,101 +1,130 @@
 import os
-from google.cloud import storage
 from app.config.config import Config
+from app.utils.storage_backends import get_backend
 import uuid
+import hashlib
 
-# Dans un environnement de production, l'authentification GCP serait configurée via des variables d'environnement
-# ou un fichier de clé de service. Pour simplifier, nous simulons l'interaction avec GCP Storage.
+# Les fichiers sont stockés par le pilote configuré (Config.STORAGE_BACKEND):
+# le répertoire local UPLOAD_FOLDER/storage par défaut, ou un bucket GCS.
+# Les objets sont répartis sur deux niveaux de sous-répertoires (ab/cd/) tirés des
+# premiers caractères hexadécimaux de leur nom, pour éviter les répertoires géants.
 
-def upload_file(file_path, user_id):
+def shard_path(prefix, name):
     """
-    Téléverse un fichier vers Google Cloud Storage.
+    Construit le chemin réparti d'un objet.
+    
+    Args:
+        prefix (str): Préfixe de l'espace de stockage (ex. user_1 ou cas)
+        name (str): Nom de l'objet, commençant par un UUID ou une empreinte
+        
+    Returns:
+        str: Chemin de la forme prefix/ab/cd/name
+    """
+    shard = name[:4].lower()
+    if len(shard) < 4 or any(c not in '0123456789abcdef' for c in shard):
+        # Nom non aléatoire (anciens fichiers): répartir selon son empreinte
+        shard = hashlib.sha256(name.encode()).hexdigest()[:4]
+    return f"{prefix}/{shard[:2]}/{shard[2:4]}/{name}"
+
+def upload_file(file_path, user_id, move=False):
+    """
+    Téléverse un fichier vers le stockage.
     
     Args:
         file_path (str): Chemin du fichier local à téléverser
         user_id (int): ID de l'utilisateur propriétaire du fichier
+        move (bool, optional): Déplacer le fichier local au lieu de le copier
         
     Returns:
-        str: Chemin de stockage dans GCP
-    """
-    # En production, nous utiliserions le code suivant pour téléverser vers GCP:
-    # 
-    # client = storage.Client()
-    # bucket = client.bucket(Config.GCP_STORAGE_BUCKET)
-    # 
-    # Générer un nom unique pour le fichier dans le bucket
-    # blob_name = f"user_{user_id}/{uuid.uuid4()}_{os.path.basename(file_path)}"
-    # blob = bucket.blob(blob_name)
-    # blob.upload_from_filename(file_path)
+        str: Chemin de stockage du fichier
+    """
+    # Générer un nom unique pour le fichier
+    storage_path = shard_path(f"user_{user_id}", f"{uuid.uuid4()}_{os.path.basename(file_path)}")
+    get_backend().put_file(storage_path, file_path, move=move)
     
-    # Pour simuler le téléversement, nous copions simplement le fichier dans un répertoire local
-    storage_dir = os.path.join(Config.UPLOAD_FOLDER, 'storage', f'user_{user_id}')
-    os.makedirs(storage_dir, exist_ok=True)
+    return storage_path
+
+def store_blob(file_path, content_hash):
+    """
+    Déplace un conteneur chiffré dans le magasin adressé par contenu.
     
-    # Générer un nom unique pour le fichier
-    storage_name = f"{uuid.uuid4()}_{os.path.basename(file_path)}"
-    storage_path = os.path.join(storage_dir, storage_name)
+    Le nom de l'objet est dérivé de l'empreinte du contenu en clair; un suffixe
+    aléatoire évite que deux premiers téléversements simultanés du même contenu
+    s'écrasent avant que la base de données n'ait désigné celui qui est conservé.
     
-    # Copier le fichier
-    with open(file_path, 'rb') as src_file:
-        with open(storage_path, 'wb') as dst_file:
-            dst_file.write(src_file.read())
+    Args:
+        file_path (str): Chemin du conteneur chiffré local
+        content_hash (str): Empreinte SHA-256 du contenu en clair
+        
+    Returns:
+        str: Chemin de stockage du contenu
+    """
+    storage_path = shard_path('cas', f"{content_hash}.{uuid.uuid4().hex[:8]}")
+    get_backend().put_file(storage_path, file_path, move=True)
     
-    # Retourner le chemin de stockage (qui serait l'URL GCP en production)
-    return f"user_{user_id}/{storage_name}"
+    return storage_path
 
 def download_file(storage_path, destination_dir):
     """
-    Télécharge un fichier depuis Google Cloud Storage.
+    Télécharge un fichier depuis le stockage.
     
     Args:
-        storage_path (str): Chemin de stockage dans GCP
+        storage_path (str): Chemin de stockage du fichier
         destination_dir (str): Répertoire local où télécharger le fichier
         
     Returns:
         str: Chemin du fichier téléchargé
     """
-    # En production, nous utiliserions le code suivant pour télécharger depuis GCP:
-    # 
-    # client = storage.Client()
-    # bucket = client.bucket(Config.GCP_STORAGE_BUCKET)
-    # blob = bucket.blob(storage_path)
-    # 
-    # Télécharger le fichier
-    # destination_file = os.path.join(destination_dir, os.path.basename(storage_path))
-    # blob.download_to_filename(destination_file)
-    
-    # Pour simuler le téléchargement, nous copions simplement le fichier depuis notre stockage local
-    source_path = os.path.join(Config.UPLOAD_FOLDER, 'storage', storage_path)
-    
     # Créer le répertoire de destination s'il n'existe pas
     os.makedirs(destination_dir, exist_ok=True)
     
     # Chemin de destination
     destination_file = os.path.join(destination_dir, os.path.basename(storage_path))
-    
-    # Copier le fichier
-    with open(source_path, 'rb') as src_file:
-        with open(destination_file, 'wb') as dst_file:
-            dst_file.write(src_file.read())
+    get_backend().get(storage_path, destination_file)
     
     return destination_file
 
-def delete_file(storage_path):
+def open_file(storage_path):
     """
-    Supprime un fichier de Google Cloud Storage.
+    Ouvre un fichier stocké en lecture binaire, sans copie locale.
     
     Args:
-        storage_path (str): Chemin de stockage dans GCP
-    """
-    # En production, nous utiliserions le code suivant pour supprimer depuis GCP:
-    # 
-    # client = storage.Client()
-    # bucket = client.bucket(Config.GCP_STORAGE_BUCKET)
-    # blob = bucket.blob(storage_path)
-    # blob.delete()
+        storage_path (str): Chemin de stockage du fichier
+        
+    Returns:
+        Objet fichier binaire positionnable
+    """
+    return get_backend().open(storage_path)
+
+def stat_file(storage_path):
+    """
+    Retourne la taille d'un fichier stocké.
+    
+    Args:
+        storage_path (str): Chemin de stockage du fichier
+        
+    Returns:
+        int: Taille en octets, ou None si le fichier n'existe pas
+    """
+    return get_backend().stat(storage_path)
+
+def iter_files(prefix=''):
+    """
+    Parcourt les fichiers présents dans le stockage.
     
-    # Pour simuler la suppression, nous supprimons simplement le fichier de notre stockage local
-    file_path = os.path.join(Config.UPLOAD_FOLDER, 'storage', storage_path)
+    Args:
+        prefix (str, optional): Ne parcourir que les chemins commençant par ce préfixe
+        
+    Yields:
+        tuple: (chemin de stockage, taille en octets, date de modification epoch)
+    """
+    return get_backend().iter_objects(prefix)
+
+def delete_file(storage_path):
+    """
+    Supprime un fichier du stockage.
     
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    Args:
+        storage_path (str): Chemin de stockage du fichier
+    """
+    get_backend().delete(storage_path)
@@ -0,0 +1,358 @@
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.config.config import Config
+
+# Taille des lectures/écritures pour les copies en flux
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class StorageBackend:
+    """
+    Interface commune des pilotes de stockage.
+
+    Les objets sont identifiés par une clé relative de la forme
+    ``user_1/<nom>`` ou ``cas/<empreinte>``, identique quel que soit le pilote.
+    """
+
+    def put(self, key, source):
+        """
+        Écrit un objet à partir d'un flux binaire.
+
+        Args:
+            key (str): Clé de l'objet
+            source: Flux binaire lisible
+        """
+        raise NotImplementedError
+
+    def put_file(self, key, file_path, move=False):
+        """
+        Écrit un objet à partir d'un fichier local.
+
+        Args:
+            key (str): Clé de l'objet
+            file_path (str): Chemin du fichier local
+            move (bool, optional): Le fichier local peut être consommé (déplacé)
+        """
+        with open(file_path, 'rb') as source:
+            self.put(key, source)
+        if move:
+            os.remove(file_path)
+
+    def get(self, key, destination_path):
+        """
+        Copie un objet vers un fichier local.
+
+        Args:
+            key (str): Clé de l'objet
+            destination_path (str): Chemin du fichier local à créer
+        """
+        with self.open(key) as source, open(destination_path, 'wb') as destination:
+            shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+
+    def open(self, key):
+        """
+        Ouvre un objet en lecture binaire, positionnable.
+
+        Args:
+            key (str): Clé de l'objet
+
+        Returns:
+            Objet fichier binaire
+        """
+        raise NotImplementedError
+
+    def copy(self, source_key, destination_key):
+        """
+        Copie un objet vers une nouvelle clé, l'original restant lisible.
+
+        Args:
+            source_key (str): Clé de l'objet existant
+            destination_key (str): Clé de la copie
+        """
+        with self.open(source_key) as source:
+            self.put(destination_key, source)
+
+    def delete(self, key):
+        """
+        Supprime un objet; ne fait rien s'il n'existe pas.
+
+        Args:
+            key (str): Clé de l'objet
+        """
+        raise NotImplementedError
+
+    def stat(self, key):
+        """
+        Retourne la taille d'un objet.
+
+        Args:
+            key (str): Clé de l'objet
+
+        Returns:
+            int: Taille en octets, ou None si l'objet n'existe pas
+        """
+        raise NotImplementedError
+
+    def iter_objects(self, prefix=''):
+        """
+        Parcourt les objets stockés.
+
+        Args:
+            prefix (str, optional): Ne parcourir que les clés commençant par ce préfixe
+
+        Yields:
+            tuple: (clé, taille en octets, date de modification en secondes epoch)
+        """
+        raise NotImplementedError
+
+
+class LocalStorageBackend(StorageBackend):
+    """Pilote stockant les objets sous un répertoire local."""
+
+    def __init__(self, root=None):
+        # Sans racine explicite, le dossier d'upload est relu à chaque appel
+        self._root = root
+
+    @property
+    def root(self):
+        return self._root or os.path.join(Config.UPLOAD_FOLDER, 'storage')
+
+    def path(self, key):
+        """Chemin local d'un objet."""
+        return os.path.join(self.root, *key.split('/'))
+
+    def _temp_path(self, path):
+        # Fichier temporaire dans le même répertoire pour que le renommage soit atomique
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def put(self, key, source):
+        path = self.path(key)
+        temp_path = self._temp_path(path)
+        try:
+            with open(temp_path, 'wb') as destination:
+                shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def put_file(self, key, file_path, move=False):
+        path = self.path(key)
+        if move:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                # Renommage immédiat lorsque la source est sur le même disque
+                os.replace(file_path, path)
+                # Dater l'objet de sa publication (et non de sa dernière écriture) pour le ramasse-miettes
+                os.utime(path)
+                return
+            except OSError:
+                pass
+
+        temp_path = self._temp_path(path)
+        try:
+            _copy_file(file_path, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if move:
+            os.remove(file_path)
+
+    def get(self, key, destination_path):
+        _copy_file(self.path(key), destination_path)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def copy(self, source_key, destination_key):
+        path = self.path(destination_key)
+        temp_path = self._temp_path(path)
+        try:
+            try:
+                # Lien physique: aucune donnée recopiée, l'original reste en place
+                os.link(self.path(source_key), temp_path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                _copy_file(self.path(source_key), temp_path)
+            os.replace(temp_path, path)
+            os.utime(path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def stat(self, key):
+        try:
+            return os.stat(self.path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    def iter_objects(self, prefix=''):
+        root = self.root
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, root).replace(os.sep, '/')
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield key, info.st_size, info.st_mtime
+
+
+def _copy_file(source_path, destination_path):
+    """Copie un fichier par sendfile (dans le noyau) lorsque c'est possible."""
+    with open(source_path, 'rb') as source, open(destination_path, 'wb') as destination:
+        if hasattr(os, 'sendfile'):
+            size = os.fstat(source.fileno()).st_size
+            offset = 0
+            try:
+                while offset < size:
+                    sent = os.sendfile(destination.fileno(), source.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+            except OSError:
+                # sendfile indisponible pour ces fichiers: reprendre en espace utilisateur
+                source.seek(offset)
+                destination.seek(offset)
+        shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+
+
+class GCSStorageBackend(StorageBackend):
+    """
+    Pilote Google Cloud Storage.
+
+    Le client GCP est partagé par tout le processus (voir
+    ``GCPConfig.get_storage_client``) afin de réutiliser ses connexions.
+    Les gros objets sont téléversés en plusieurs parties en parallèle puis
+    assemblés côté serveur (« parallel composite upload »).
+    Si STORAGE_EMULATOR_HOST est défini, le client cible ce serveur local.
+    """
+
+    # GCS assemble au plus 32 objets en une seule opération compose
+    MAX_COMPOSE_PARTS = 32
+
+    def __init__(self, bucket_name=None, client=None, composite_threshold=None, part_size=None, max_workers=None):
+        self.bucket_name = bucket_name or Config.GCP_STORAGE_BUCKET
+        self._client = client
+        self.composite_threshold = composite_threshold or Config.GCS_COMPOSITE_THRESHOLD
+        self.part_size = part_size or Config.GCS_COMPOSITE_PART_SIZE
+        self.max_workers = max_workers or Config.GCS_UPLOAD_WORKERS
+
+    @property
+    def bucket(self):
+        client = self._client
+        if client is None:
+            from app.utils.gcp_config import gcp_config
+            client = gcp_config.get_storage_client()
+            if client is None:
+                raise RuntimeError('Client GCP indisponible')
+        return client.bucket(self.bucket_name)
+
+    def put(self, key, source):
+        self.bucket.blob(key).upload_from_file(source, rewind=False)
+
+    def put_file(self, key, file_path, move=False):
+        size = os.path.getsize(file_path)
+        if size >= self.composite_threshold:
+            self._composite_upload(key, file_path, size)
+        else:
+            self.bucket.blob(key).upload_from_filename(file_path)
+        if move:
+            os.remove(file_path)
+
+    def _composite_upload(self, key, file_path, size):
+        bucket = self.bucket
+        part_size = max(self.part_size, -(-size // self.MAX_COMPOSE_PARTS))
+        ranges = [(offset, min(part_size, size - offset)) for offset in range(0, size, part_size)]
+        prefix = f"{key}.parts-{uuid.uuid4().hex}"
+
+        def upload_part(index):
+            offset, length = ranges[index]
+            part = bucket.blob(f"{prefix}/{index:02d}")
+            with open(file_path, 'rb') as source:
+                source.seek(offset)
+                part.upload_from_file(source, size=length, rewind=False)
+            return part
+
+        parts = []
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ranges))) as executor:
+                parts = list(executor.map(upload_part, range(len(ranges))))
+            bucket.blob(key).compose(parts)
+        finally:
+            for index in range(len(ranges)):
+                try:
+                    bucket.blob(f"{prefix}/{index:02d}").delete()
+                except Exception:
+                    pass
+
+    def get(self, key, destination_path):
+        self.bucket.blob(key).download_to_filename(destination_path)
+
+    def open(self, key):
+        return self.bucket.blob(key).open('rb', chunk_size=COPY_BUFFER_SIZE)
+
+    def copy(self, source_key, destination_key):
+        # Copie côté serveur, sans transfert de données par ce processus
+        bucket = self.bucket
+        bucket.copy_blob(bucket.blob(source_key), bucket, destination_key)
+
+    def delete(self, key):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(key).delete()
+        except NotFound:
+            pass
+
+    def stat(self, key):
+        blob = self.bucket.get_blob(key)
+        return blob.size if blob is not None else None
+
+    def iter_objects(self, prefix=''):
+        for blob in self.bucket.list_blobs(prefix=prefix or None):
+            yield blob.name, blob.size, blob.updated.timestamp()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Retourne le pilote de stockage configuré (Config.STORAGE_BACKEND).
+
+    Returns:
+        StorageBackend: Instance partagée par le processus
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if Config.STORAGE_BACKEND == 'gcs':
+                    backend = GCSStorageBackend()
+                else:
+                    backend = LocalStorageBackend()
+                if Config.OBJECT_CACHE_SIZE:
+                    from app.utils.object_cache import CachingStorageBackend
+                    backend = CachingStorageBackend(backend)
+                _backend = backend
+    return _backend
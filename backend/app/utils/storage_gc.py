@@ -0,0 +1,333 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from app.config.config import Config
+from app.models.user import db
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.upload_session import UploadSession
+from app.utils.storage import iter_files, delete_file
+from app.utils.storage_layout import awaiting_deletion
+from app.utils.upload_sessions import discard
+from app.utils.quotas import reconcile_usage
+
+# Compteurs cumulés depuis le démarrage du processus
+_metrics = {
+    'runs': 0,
+    'last_run': None,
+    'last_duration_seconds': None,
+    'objects_deleted': 0,
+    'bytes_reclaimed': 0,
+    'temp_entries_deleted': 0,
+    'temp_bytes_reclaimed': 0,
+    'sessions_expired': 0,
+    'blobs_deleted': 0,
+    'ref_counts_repaired': 0,
+    'missing_objects': 0,
+    'usage_counters_repaired': 0,
+}
+_metrics_lock = threading.Lock()
+
+# Contenus sans fichier vus lors du passage précédent: {id du contenu: ref_count observé}
+_blob_suspects = {}
+
+
+def _count(**values):
+    with _metrics_lock:
+        for name, value in values.items():
+            _metrics[name] += value
+
+
+def gc_metrics():
+    """
+    Retourne les compteurs du ramasse-miettes du stockage.
+
+    Returns:
+        dict: Copie des compteurs (octets récupérés, objets supprimés, ...)
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+class _RateLimiter:
+    """Découpe les suppressions en lots séparés par une pause."""
+
+    def __init__(self, batch_size, pause):
+        self.batch_size = batch_size
+        self.pause = pause
+        self._in_batch = 0
+
+    def tick(self):
+        self._in_batch += 1
+        if self._in_batch >= self.batch_size:
+            self._in_batch = 0
+            time.sleep(self.pause)
+
+
+def _referenced(paths):
+    """Sous-ensemble des chemins référencés par un fichier ou un contenu."""
+    paths = list(paths)
+    referenced = {path for (path,) in db.session.query(File.storage_path).filter(File.storage_path.in_(paths))}
+    referenced.update(path for (path,) in db.session.query(Blob.storage_path).filter(Blob.storage_path.in_(paths)))
+    referenced.update(path for (path,) in db.session.query(Blob.thumbnail_path).filter(Blob.thumbnail_path.in_(paths)))
+    return referenced
+
+
+def reconcile_storage(min_age, limiter, lookup_size=500):
+    """
+    Supprime les objets stockés qu'aucune ligne ne référence.
+
+    Un objet n'est supprimé que s'il est plus vieux que ``min_age``: un
+    téléversement en cours publie l'objet juste avant de l'enregistrer en base.
+
+    Args:
+        min_age (float): Âge minimal en secondes d'un objet supprimable
+        limiter (_RateLimiter): Limiteur de débit des suppressions
+
+    Returns:
+        tuple: (objets supprimés, octets récupérés, chemins présents dans le stockage)
+    """
+    cutoff = time.time() - min_age
+    deleted = reclaimed = 0
+    seen = set()
+
+    def collect(candidates):
+        nonlocal deleted, reclaimed
+        referenced = _referenced(candidates)
+        for path, size in candidates.items():
+            # Un ancien objet déplacé par la migration peut encore être lu pendant son délai de grâce
+            if path in referenced or awaiting_deletion(path):
+                continue
+            delete_file(path)
+            seen.discard(path)
+            deleted += 1
+            reclaimed += size
+            _count(objects_deleted=1, bytes_reclaimed=size)
+            limiter.tick()
+
+    candidates = {}
+    for path, size, modified in iter_files():
+        seen.add(path)
+        if modified > cutoff:
+            continue
+        candidates[path] = size
+        if len(candidates) >= lookup_size:
+            collect(candidates)
+            candidates = {}
+    if candidates:
+        collect(candidates)
+
+    return deleted, reclaimed, seen
+
+
+def count_missing_objects(existing, batch_size=500):
+    """
+    Compte les lignes dont l'objet stocké a disparu (signalées, jamais supprimées).
+
+    Args:
+        existing (set): Chemins présents dans le stockage
+
+    Returns:
+        int: Nombre de chemins référencés introuvables dans le stockage
+    """
+    missing = 0
+    for model in (Blob, File):
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, model.storage_path).filter(model.id > last_id) \
+                .order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            missing += sum(1 for _, path in rows if path not in existing)
+    with _metrics_lock:
+        _metrics['missing_objects'] = missing
+    return missing
+
+
+def reconcile_blobs(limiter):
+    """
+    Répare les compteurs de références et supprime les contenus sans fichier.
+
+    Un compteur inférieur au nombre réel de fichiers est relevé aussitôt.
+    Un contenu sans aucun fichier n'est supprimé que s'il était déjà dans cet
+    état, avec le même compteur, lors du passage précédent: cela écarte les
+    téléversements en cours, qui référencent le contenu avant de créer le fichier.
+
+    Returns:
+        int: Nombre de contenus supprimés
+    """
+    global _blob_suspects
+    file_count = db.session.query(db.func.count(File.id)).filter(File.blob_id == Blob.id).scalar_subquery()
+
+    repaired = Blob.query.filter(Blob.ref_count < file_count).update(
+        {Blob.ref_count: file_count}, synchronize_session=False
+    )
+    db.session.commit()
+    _count(ref_counts_repaired=repaired)
+
+    unreferenced = dict(db.session.query(Blob.id, Blob.ref_count).filter(file_count == 0).all())
+    deleted_ids = set()
+    for blob_id, ref_count in unreferenced.items():
+        if _blob_suspects.get(blob_id) != ref_count:
+            continue
+        blob = db.session.get(Blob, blob_id)
+        storage_path, thumbnail_path = blob.storage_path, blob.thumbnail_path
+        size = blob.size
+        removed = Blob.query.filter(Blob.id == blob_id, Blob.ref_count == ref_count, file_count == 0) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        if removed:
+            delete_file(storage_path)
+            if thumbnail_path:
+                delete_file(thumbnail_path)
+            deleted_ids.add(blob_id)
+            _count(blobs_deleted=1, objects_deleted=1, bytes_reclaimed=size)
+            limiter.tick()
+
+    _blob_suspects = {blob_id: ref_count for blob_id, ref_count in unreferenced.items() if blob_id not in deleted_ids}
+    return len(deleted_ids)
+
+
+def sweep_upload_sessions(limiter):
+    """
+    Expire les sessions de téléversement abandonnées et supprime leurs morceaux.
+
+    Returns:
+        int: Nombre de sessions expirées
+    """
+    now = datetime.utcnow()
+    expired = UploadSession.query.filter(UploadSession.status == 'open', UploadSession.expires_at < now).all()
+    for session in expired:
+        session.status = 'expired'
+        db.session.commit()
+        discard(session)
+        limiter.tick()
+
+    # Les sessions terminées ne servent plus qu'au suivi: les oublier une durée de vie après leur expiration
+    UploadSession.query.filter(UploadSession.status != 'open',
+                               UploadSession.expires_at < now - Config.UPLOAD_SESSION_TTL) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+
+    _count(sessions_expired=len(expired))
+    return len(expired)
+
+
+def _entry_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(directory, name))
+                   for directory, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def sweep_temp(max_age, limiter):
+    """
+    Supprime les fichiers temporaires abandonnés (téléversements interrompus,
+    copies laissées par les anciens téléchargements, sessions inconnues).
+
+    Args:
+        max_age (float): Âge minimal en secondes d'une entrée supprimable
+
+    Returns:
+        tuple: (entrées supprimées, octets récupérés)
+    """
+    temp_dir = os.path.join(Config.UPLOAD_FOLDER, 'temp')
+    sessions_dir = os.path.join(temp_dir, 'sessions')
+    cutoff = time.time() - max_age
+    open_sessions = {session_id for (session_id,) in
+                     db.session.query(UploadSession.id).filter(UploadSession.status == 'open')}
+
+    entries = []
+    if os.path.isdir(temp_dir):
+        entries += [os.path.join(temp_dir, name) for name in os.listdir(temp_dir) if name != 'sessions']
+    if os.path.isdir(sessions_dir):
+        entries += [os.path.join(sessions_dir, name) for name in os.listdir(sessions_dir)
+                    if name not in open_sessions]
+
+    deleted = reclaimed = 0
+    for path in entries:
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+            size = _entry_size(path)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        deleted += 1
+        reclaimed += size
+        limiter.tick()
+
+    _count(temp_entries_deleted=deleted, temp_bytes_reclaimed=reclaimed)
+    return deleted, reclaimed
+
+
+def collect_garbage(min_age=None, temp_max_age=None, batch_size=None, pause=None):
+    """
+    Exécute un passage complet du ramasse-miettes du stockage.
+
+    Args:
+        min_age (float, optional): Âge minimal d'un objet orphelin supprimable
+        temp_max_age (float, optional): Âge minimal d'un fichier temporaire supprimable
+        batch_size (int, optional): Nombre de suppressions par lot
+        pause (float, optional): Pause en secondes entre deux lots
+
+    Returns:
+        dict: Résultat du passage
+    """
+    started = time.monotonic()
+    limiter = _RateLimiter(batch_size or Config.STORAGE_GC_BATCH_SIZE,
+                           Config.STORAGE_GC_PAUSE if pause is None else pause)
+
+    result = {'sessions_expired': sweep_upload_sessions(limiter)}
+    result['temp_entries_deleted'], result['temp_bytes_reclaimed'] = sweep_temp(
+        Config.STORAGE_GC_TEMP_MAX_AGE if temp_max_age is None else temp_max_age, limiter
+    )
+    result['blobs_deleted'] = reconcile_blobs(limiter)
+    result['objects_deleted'], result['bytes_reclaimed'], existing = reconcile_storage(
+        Config.STORAGE_GC_MIN_AGE if min_age is None else min_age, limiter
+    )
+    result['missing_objects'] = count_missing_objects(existing)
+    result['usage_counters_repaired'] = reconcile_usage()
+    _count(usage_counters_repaired=result['usage_counters_repaired'])
+
+    with _metrics_lock:
+        _metrics['runs'] += 1
+        _metrics['last_run'] = datetime.utcnow().isoformat()
+        _metrics['last_duration_seconds'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def start_storage_gc(app, interval=None):
+    """
+    Lance le ramasse-miettes du stockage en arrière-plan, à intervalle régulier.
+
+    Args:
+        app (Flask): L'application Flask
+        interval (float, optional): Intervalle en secondes entre deux passages
+
+    Returns:
+        threading.Event: Événement à positionner pour arrêter le ramasse-miettes
+    """
+    stop_event = threading.Event()
+    interval = interval or Config.STORAGE_GC_INTERVAL
+
+    def worker():
+        while not stop_event.wait(interval):
+            with app.app_context():
+                try:
+                    result = collect_garbage()
+                    print(f"Ramasse-miettes du stockage: {result}")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Erreur du ramasse-miettes du stockage: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=worker, name='storage-gc', daemon=True).start()
+    return stop_event
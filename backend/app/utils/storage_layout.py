@@ -0,0 +1,164 @@
+import threading
+import time
+from app.models.user import db
+from app.models.blob import Blob
+from app.models.file import File
+from app.utils.storage import shard_path
+from app.utils.storage_backends import get_backend
+
+# Chemins déjà répartis: prefix/ab/cd/nom
+SHARDED_PATTERN = '%/__/__/%'
+
+# Anciens objets déplacés, supprimés à la fin du délai de grâce: le ramasse-miettes n'y touche pas
+_awaiting_deletion = set()
+_awaiting_lock = threading.Lock()
+
+
+def is_sharded(storage_path):
+    """Indique si un chemin de stockage suit déjà la disposition ab/cd/."""
+    parts = storage_path.split('/')
+    return len(parts) == 4 and len(parts[1]) == 2 and len(parts[2]) == 2
+
+
+def awaiting_deletion(storage_path):
+    """Indique si un ancien objet déplacé attend la fin de son délai de grâce."""
+    with _awaiting_lock:
+        return storage_path in _awaiting_deletion
+
+
+def target_path(storage_path):
+    """Chemin réparti correspondant à un ancien chemin plat."""
+    prefix, _, name = storage_path.rpartition('/')
+    return shard_path(prefix, name)
+
+
+def _move(model, row_id, old_path, extra_updates=()):
+    """
+    Copie un objet vers son chemin réparti puis bascule la ligne en base.
+
+    La bascule est conditionnée à l'ancien chemin: si la ligne a été modifiée
+    ou supprimée entre-temps, la copie est abandonnée.
+
+    Returns:
+        bool: True si la ligne pointe désormais vers le nouveau chemin
+    """
+    backend = get_backend()
+    new_path = target_path(old_path)
+    backend.copy(old_path, new_path)
+
+    updated = model.query.filter(model.id == row_id, model.storage_path == old_path).update(
+        {model.storage_path: new_path}, synchronize_session=False
+    )
+    for query in extra_updates:
+        query.update({File.storage_path: new_path}, synchronize_session=False)
+    if updated:
+        db.session.commit()
+        return True
+
+    db.session.rollback()
+    backend.delete(new_path)
+    return False
+
+
+def migrate_layout(batch_size=100, pause=0.5, grace_period=60, stop_event=None):
+    """
+    Déplace les objets stockés à plat vers la disposition répartie, en ligne.
+
+    Chaque objet est copié (lien physique en local, copie côté serveur sur
+    GCS), la base est mise à jour, puis l'ancien objet est supprimé après un
+    délai de grâce: une requête qui a lu l'ancien chemin juste avant la
+    bascule peut encore l'ouvrir. Le traitement est découpé en lots séparés
+    par une pause pour limiter la charge, et peut être relancé sans risque.
+
+    Args:
+        batch_size (int, optional): Nombre de lignes traitées par lot
+        pause (float, optional): Pause en secondes entre deux lots
+        grace_period (float, optional): Délai avant suppression des anciens objets
+        stop_event (threading.Event, optional): Permet d'interrompre la migration
+
+    Returns:
+        dict: Nombre d'objets déplacés, ignorés et en erreur
+    """
+    backend = get_backend()
+    stats = {'moved': 0, 'skipped': 0, 'failed': 0}
+    pending = []
+
+    def purge(older_than):
+        while pending and pending[0][1] <= older_than:
+            old_path = pending.pop(0)[0]
+            backend.delete(old_path)
+            with _awaiting_lock:
+                _awaiting_deletion.discard(old_path)
+
+    # Les contenus dédupliqués d'abord (leurs fichiers suivent), puis les anciens fichiers
+    sources = (
+        (Blob, Blob.query),
+        (File, File.query.filter(File.blob_id.is_(None))),
+    )
+    for model, query in sources:
+        last_id = 0
+        while not (stop_event and stop_event.is_set()):
+            rows = query.filter(model.id > last_id, model.storage_path.notlike(SHARDED_PATTERN)) \
+                .order_by(model.id).limit(batch_size).with_entities(model.id, model.storage_path).all()
+            if not rows:
+                break
+
+            for row_id, old_path in rows:
+                last_id = row_id
+                if is_sharded(old_path):
+                    continue
+                if backend.stat(old_path) is None:
+                    stats['skipped'] += 1
+                    continue
+                extra = ()
+                if model is Blob:
+                    extra = (File.query.filter(File.blob_id == row_id, File.storage_path == old_path),)
+                try:
+                    if _move(model, row_id, old_path, extra):
+                        with _awaiting_lock:
+                            _awaiting_deletion.add(old_path)
+                        pending.append((old_path, time.monotonic()))
+                        stats['moved'] += 1
+                    else:
+                        stats['skipped'] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    stats['failed'] += 1
+                    print(f"Migration de {old_path} impossible: {str(e)}")
+
+            purge(time.monotonic() - grace_period)
+            time.sleep(pause)
+
+    # Attendre la fin du délai de grâce des derniers objets déplacés
+    if pending:
+        time.sleep(max(0, pending[-1][1] + grace_period - time.monotonic()))
+        purge(time.monotonic())
+
+    print(f"Migration de la disposition du stockage terminée: {stats}")
+    return stats
+
+
+def start_layout_migration(app, **kwargs):
+    """
+    Lance la migration de la disposition du stockage en arrière-plan.
+
+    Args:
+        app (Flask): L'application Flask
+        **kwargs: Paramètres transmis à migrate_layout
+
+    Returns:
+        threading.Event: Événement à positionner pour arrêter la migration
+    """
+    stop_event = threading.Event()
+
+    def worker():
+        with app.app_context():
+            try:
+                migrate_layout(stop_event=stop_event, **kwargs)
+            except Exception as e:
+                print(f"Migration de la disposition du stockage interrompue: {str(e)}")
+            finally:
+                db.session.remove()
+
+    threading.Thread(target=worker, name='storage-layout-migration', daemon=True).start()
+    return stop_event
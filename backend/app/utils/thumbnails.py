@@ -0,0 +1,187 @@
+import io
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, UnidentifiedImageError
+from app.config.config import Config
+from app.models.user import db
+from app.models.blob import Blob
+from app.utils import offload
+from app.utils.compression import iter_decompress
+from app.utils.encryption import encrypt_stream, iter_decrypt, unwrap_data_key
+from app.utils.storage import open_file, shard_path
+from app.utils.storage_backends import get_backend
+
+# Types d'images dont une miniature peut être produite
+THUMBNAIL_MIME_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/bmp', 'image/webp'}
+# Au-delà, l'image décodée est gardée sur disque plutôt qu'en mémoire
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+# Production en cours pour chaque contenu (blob_id -> future)
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def is_eligible(mime_type):
+    """Indique si une miniature peut être produite pour ce type de fichier."""
+    return (mime_type or '').lower() in THUMBNAIL_MIME_TYPES
+
+
+def thumbnail_mime_type(thumbnail_path):
+    """Type MIME d'une miniature, déduit de son chemin de stockage."""
+    return 'image/png' if thumbnail_path.endswith('.png.enc') else 'image/jpeg'
+
+
+def render_thumbnail(source, max_size=None):
+    """
+    Réduit une image à la taille d'une miniature.
+
+    Les JPEG sont décodés directement à échelle réduite (draft), ce qui évite
+    de décompresser l'image en pleine résolution.
+
+    Args:
+        source: Flux binaire positionnable contenant l'image d'origine
+        max_size (int, optional): Plus grand côté de la miniature en pixels
+
+    Returns:
+        tuple: (octets de la miniature, extension 'jpg' ou 'png')
+    """
+    max_size = max_size or Config.THUMBNAIL_SIZE
+    with Image.open(source) as image:
+        image.draft('RGB', (max_size, max_size))
+        image.thumbnail((max_size, max_size))
+        output = io.BytesIO()
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Conserver la transparence
+            image.convert('RGBA').save(output, 'PNG', optimize=True)
+            return output.getvalue(), 'png'
+        image.convert('RGB').save(output, 'JPEG', quality=80, optimize=True)
+        return output.getvalue(), 'jpg'
+
+
+def generate(blob_id):
+    """
+    Produit et stocke la miniature chiffrée d'un contenu.
+
+    La miniature est chiffrée avec la clé de données du contenu et partagée,
+    comme lui, par tous les fichiers identiques.
+
+    Args:
+        blob_id (int): ID du contenu
+
+    Returns:
+        str: Chemin de stockage de la miniature, ou None si l'image est illisible
+    """
+    blob = db.session.get(Blob, blob_id)
+    if blob is None or blob.thumbnail_path:
+        return blob.thumbnail_path if blob else None
+
+    data_key = unwrap_data_key(blob.encryption_key)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as original:
+        with open_file(blob.storage_path) as stored:
+            for chunk in iter_decompress(iter_decrypt(stored, data_key), blob.compression):
+                original.write(chunk)
+        original.seek(0)
+        try:
+            # Décodage et réduction Pillow: sous eventlet complet, les threads du pool sont des greenlets du hub
+            thumbnail, extension = offload.run(render_thumbnail, original)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            print(f"Miniature impossible pour le contenu {blob_id}: {str(e)}")
+            return None
+
+    temp_dir = os.path.join(Config.UPLOAD_FOLDER, 'temp')
+    os.makedirs(temp_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(suffix='.enc', dir=temp_dir, delete=False) as encrypted:
+        encrypt_stream(io.BytesIO(thumbnail), encrypted, data_key)
+    # Nom propre à ce rendu: deux rendus simultanés du même contenu ne s'écrasent
+    # pas, et celui qui n'est pas retenu ne supprime que son propre objet
+    thumbnail_path = shard_path('thumbs', f"{blob.content_hash}.{uuid.uuid4().hex[:8]}.{extension}.enc")
+    try:
+        get_backend().put_file(thumbnail_path, encrypted.name, move=True)
+    finally:
+        if os.path.exists(encrypted.name):
+            os.remove(encrypted.name)
+
+    # Un contenu supprimé entre-temps ne doit pas garder de miniature
+    updated = Blob.query.filter_by(id=blob_id, thumbnail_path=None).update(
+        {Blob.thumbnail_path: thumbnail_path}, synchronize_session=False
+    )
+    db.session.commit()
+    if not updated:
+        get_backend().delete(thumbnail_path)
+        return None
+    return thumbnail_path
+
+
+def read_thumbnail(blob):
+    """
+    Déchiffre la miniature d'un contenu.
+
+    Args:
+        blob (Blob): Le contenu, qui doit avoir une miniature
+
+    Returns:
+        bytes: L'image de la miniature
+    """
+    with open_file(blob.thumbnail_path) as stored:
+        return b''.join(iter_decrypt(stored, unwrap_data_key(blob.encryption_key)))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS, thread_name_prefix='thumbnail')
+        return _executor
+
+
+def schedule(app, blob_id):
+    """
+    Demande la production d'une miniature en arrière-plan.
+
+    Une seule production par contenu est en cours à la fois: une demande pour
+    un contenu déjà en cours de production reçoit le même résultat.
+
+    Args:
+        app (Flask): L'application Flask
+        blob_id (int): ID du contenu
+
+    Returns:
+        concurrent.futures.Future: Résultat de la production
+    """
+    def task():
+        with app.app_context():
+            try:
+                return generate(blob_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erreur de production de miniature pour le contenu {blob_id}: {str(e)}")
+            finally:
+                db.session.remove()
+
+    with _pending_lock:
+        future = _pending.get(blob_id)
+        if future is not None:
+            return future
+        future = _get_executor().submit(task)
+        _pending[blob_id] = future
+    future.add_done_callback(lambda done: _discard_pending(blob_id, done))
+    return future
+
+
+def _discard_pending(blob_id, future):
+    with _pending_lock:
+        if _pending.get(blob_id) is future:
+            del _pending[blob_id]
+
+
+def wait_pending(timeout=None):
+    """Attend la fin des miniatures en cours de production."""
+    with _pending_lock:
+        futures = list(_pending.values())
+    for future in futures:
+        future.result(timeout)
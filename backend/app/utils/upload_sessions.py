@@ -0,0 +1,141 @@
+import hashlib
+import os
+import shutil
+import threading
+from app.config.config import Config
+from app.utils.encryption import (
+    EncryptingWriter,
+    HEADER_SIZE,
+    SEGMENT_OVERHEAD,
+    SEGMENT_SIZE,
+    iter_decrypt_file,
+    unwrap_data_key,
+)
+
+# Empreintes SHA-256 en cours de calcul, par session: (objet hashlib, octets déjà hachés).
+# Elles ne vivent que dans le processus qui a reçu les morceaux; si un morceau arrive
+# sur un autre processus, l'empreinte est recalculée lors de la finalisation.
+_hashers = {}
+_session_locks = {}
+_registry_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Erreur levée lorsqu'un morceau ne peut pas être accepté."""
+
+
+def session_dir(session):
+    """Répertoire temporaire propre à une session de téléversement."""
+    return os.path.join(Config.UPLOAD_FOLDER, 'temp', 'sessions', session.id)
+
+
+def partial_path(session):
+    """Chemin du conteneur chiffré en cours de construction."""
+    return os.path.join(session_dir(session), f"{session.filename}.enc")
+
+
+def session_lock(session_id):
+    """Verrou sérialisant les écritures d'une même session dans ce processus."""
+    with _registry_lock:
+        return _session_locks.setdefault(session_id, threading.Lock())
+
+
+def _segment_offset(segment_index):
+    return HEADER_SIZE + segment_index * (SEGMENT_SIZE + SEGMENT_OVERHEAD)
+
+
+def append_chunk(session, index, stream, read_size=SEGMENT_SIZE):
+    """
+    Chiffre un morceau reçu et l'ajoute au conteneur de la session.
+
+    Le morceau est lu, haché et chiffré au fil de l'eau: la mémoire utilisée
+    reste bornée à quelques segments. Réécrire un morceau déjà reçu (reprise
+    après une coupure) remplace simplement sa version précédente.
+
+    Les morceaux ne sont jamais compressés: chaque morceau doit occuper une
+    place fixe dans le conteneur pour pouvoir être repris, ce qu'un flux
+    compressé ne permet pas. Le conteneur final mesure donc exactement
+    ``encrypted_size(session.total_size)``.
+
+    Args:
+        session (UploadSession): La session de téléversement
+        index (int): Numéro du morceau, qui doit être le prochain attendu
+        stream: Flux contenant exactement les octets du morceau
+        read_size (int, optional): Taille des lectures sur le flux
+
+    Returns:
+        int: Nombre d'octets en clair ajoutés
+    """
+    length = session.expected_chunk_length(index)
+    final = index == session.total_chunks - 1
+    start_segment = index * (session.chunk_size // SEGMENT_SIZE)
+
+    # L'empreinte n'est poursuivie que si elle couvre exactement les octets déjà reçus
+    if index == 0:
+        hasher = hashlib.sha256()
+    else:
+        hasher, hashed_bytes = _hashers.get(session.id, (None, None))
+        hasher = hasher.copy() if hasher is not None and hashed_bytes == session.received_bytes else None
+
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as container:
+        # Tronquer ce qu'une tentative interrompue aurait pu écrire après le dernier morceau validé
+        container.seek(_segment_offset(start_segment) if index else 0)
+        container.truncate()
+
+        writer = EncryptingWriter(container, unwrap_data_key(session.encryption_key), start_index=start_segment)
+        remaining = length
+        while remaining:
+            data = stream.read(min(read_size, remaining))
+            if not data:
+                raise UploadError(f'Morceau {index} incomplet: {length - remaining}/{length} octets reçus')
+            if hasher is not None:
+                hasher.update(data)
+            writer.write(data)
+            remaining -= len(data)
+
+        if final:
+            writer.close()
+        else:
+            writer.flush_segments()
+        container.flush()
+        os.fsync(container.fileno())
+
+    if hasher is not None:
+        _hashers[session.id] = (hasher, session.received_bytes + length)
+    else:
+        _hashers.pop(session.id, None)
+    return length
+
+
+def finalize_digest(session):
+    """
+    Retourne l'empreinte SHA-256 des données en clair d'une session complète.
+
+    En temps normal l'empreinte a été calculée au fil des morceaux et cette
+    opération est immédiate. Si les morceaux ont été reçus par plusieurs
+    processus, le conteneur est relu et déchiffré pour la recalculer.
+
+    Args:
+        session (UploadSession): La session dont tous les morceaux ont été reçus
+
+    Returns:
+        str: L'empreinte SHA-256 en hexadécimal
+    """
+    hasher, hashed_bytes = _hashers.pop(session.id, (None, None))
+    if hasher is not None and hashed_bytes == session.total_size:
+        return hasher.hexdigest()
+
+    hasher = hashlib.sha256()
+    for chunk in iter_decrypt_file(partial_path(session), unwrap_data_key(session.encryption_key)):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def discard(session):
+    """Supprime les données temporaires et l'état en mémoire d'une session."""
+    _hashers.pop(session.id, None)
+    with _registry_lock:
+        _session_locks.pop(session.id, None)
+    shutil.rmtree(session_dir(session), ignore_errors=True)
@@ -0,0 +1,79 @@
+import zipfile
+from datetime import datetime
+
+# Les archives ZIP ne peuvent pas dater un membre avant 1980
+_ZIP_EPOCH = datetime(1980, 1, 1)
+
+
+class _StreamSink:
+    """
+    Destination non positionnable d'une archive ZIP.
+
+    Les octets écrits par zipfile sont retenus jusqu'au prochain ``drain``:
+    la mémoire utilisée ne dépasse pas quelques blocs.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def unique_name(name, used):
+    """
+    Retourne un nom de membre qui n'est pas déjà utilisé dans l'archive.
+
+    Args:
+        name (str): Nom souhaité
+        used (set): Noms déjà utilisés (mis à jour)
+
+    Returns:
+        str: ``name``, ou ``name (n).ext`` en cas de doublon
+    """
+    candidate = name
+    stem, dot, extension = name.rpartition('.')
+    if not stem:
+        stem, dot, extension = name, '', ''
+    counter = 1
+    while candidate in used:
+        candidate = f"{stem} ({counter}){dot}{extension}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def iter_zip(members):
+    """
+    Construit une archive ZIP à la volée, sans fichier temporaire.
+
+    Chaque membre est lu au moment où il est écrit; la taille et le CRC sont
+    placés dans un descripteur de données après son contenu, ce qui permet
+    d'écrire l'archive sur un flux non positionnable.
+
+    Args:
+        members: Itérable de tuples (nom, date de modification, itérable de
+            blocs en clair, compresser (bool), zip64 nécessaire (bool))
+
+    Yields:
+        bytes: Les blocs de l'archive
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for name, modified, chunks, compress, large in members:
+            info = zipfile.ZipInfo(name, max(modified or _ZIP_EPOCH, _ZIP_EPOCH).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with archive.open(info, 'w', force_zip64=large) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
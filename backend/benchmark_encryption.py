@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark du chiffrement par segments (app/utils/encryption.py).
+
+Mesure le débit de chiffrement / déchiffrement et le pic de mémoire résidente
+(RSS) pour des fichiers de 1 Mo, 50 Mo et 1 Go. Chaque taille est mesurée dans
+un sous-processus séparé pour que le pic de RSS d'une mesure n'influence pas
+la suivante. La colonne « Clé » donne le coût d'obtention de la clé de
+données (désenveloppement), à comparer au coût d'une dérivation PBKDF2.
+
+Usage:
+    python benchmark_encryption.py                # 1 Mo, 50 Mo, 1 Go
+    python benchmark_encryption.py --sizes 1 50   # tailles en Mo
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES_MB = [1, 50, 1024]
+WRITE_CHUNK = 1024 * 1024
+
+
+def _peak_rss_mb():
+    # ru_maxrss est exprimé en Ko sous Linux et en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _make_source(path, size):
+    block = os.urandom(WRITE_CHUNK)
+    with open(path, 'wb') as file:
+        remaining = size
+        while remaining > 0:
+            file.write(block[:min(remaining, WRITE_CHUNK)])
+            remaining -= WRITE_CHUNK
+
+
+def run_worker(size_mb):
+    """Mesure une taille de fichier et affiche le résultat en JSON."""
+    from app.utils.encryption import encrypt_stream, iter_decrypt_file, generate_data_key, unwrap_data_key, get_master_key
+
+    size = size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, 'source.bin')
+        encrypted_path = os.path.join(workdir, 'source.bin.enc')
+        _make_source(source_path, size)
+        baseline_rss = _peak_rss_mb()
+
+        # La clé maître est dérivée une seule fois par processus
+        start = time.perf_counter()
+        get_master_key()
+        master_key_ms = (time.perf_counter() - start) * 1000
+        data_key, wrapped_key = generate_data_key()
+
+        start = time.perf_counter()
+        with open(source_path, 'rb') as source, open(encrypted_path, 'wb') as destination:
+            encrypt_stream(source, destination, data_key)
+        encrypt_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        data_key = unwrap_data_key(wrapped_key)
+        key_ms = (time.perf_counter() - start) * 1000
+        decrypted = 0
+        for chunk in iter_decrypt_file(encrypted_path, data_key):
+            decrypted += len(chunk)
+        decrypt_seconds = time.perf_counter() - start
+
+        if decrypted != size:
+            raise RuntimeError(f'Taille déchiffrée incorrecte: {decrypted} != {size}')
+
+        print(json.dumps({
+            'size_mb': size_mb,
+            'ciphertext_mb': round(os.path.getsize(encrypted_path) / (1024 * 1024), 2),
+            'master_key_ms': round(master_key_ms, 1),
+            'key_ms': round(key_ms, 3),
+            'encrypt_mb_s': round(size_mb / encrypt_seconds, 1),
+            'decrypt_mb_s': round(size_mb / decrypt_seconds, 1),
+            'baseline_rss_mb': round(baseline_rss, 1),
+            'peak_rss_mb': round(_peak_rss_mb(), 1),
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES_MB, help='Tailles en Mo')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker)
+        return
+
+    print(f"{'Taille':>8} {'Chiffré':>9} {'Clé (ms)':>9} {'Chiffr. Mo/s':>13} {'Déchiffr. Mo/s':>15} {'RSS base':>9} {'RSS pic':>8}")
+    for size_mb in args.sizes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(size_mb)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['size_mb']:>6} Mo {result['ciphertext_mb']:>6} Mo {result['key_ms']:>9} {result['encrypt_mb_s']:>13} "
+              f"{result['decrypt_mb_s']:>15} {result['baseline_rss_mb']:>6} Mo {result['peak_rss_mb']:>5} Mo")
+    print(f"Dérivation PBKDF2 de la clé maître (une fois par processus): {result['master_key_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark de log_action avec et sans écriture par lots des événements.
+
+Plusieurs threads appellent log_action comme le font les routes (une entrée
+de journal par requête). Le script affiche, pour chaque mode, la latence de
+l'appel vue par la requête (p50, p99), le débit, le nombre de commits et le
+temps mis à tout écrire.
+
+Modes:
+    direct   chaque appel insère et valide son entrée (sans thread d'écriture)
+    batched  les entrées sont confiées à app/utils/event_writer.py
+
+Usage:
+    python benchmark_event_writer.py
+    python benchmark_event_writer.py --threads 16 --calls 500 --batch-size 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODES = ['direct', 'batched']
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(mode, threads, calls, batch_size, interval_ms, workdir):
+    """Mesure un mode: ``threads`` threads font chacun ``calls`` appels à log_action."""
+    from flask import Flask
+    from sqlalchemy import event
+    from app.models.user import db, User
+    from app.utils.database import init_db
+    from app.utils.event_writer import init_event_writer, flush_events
+    from app.utils.logging import Log, log_action
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, f'{mode}.db')}"
+    init_db(app)
+    with app.app_context():
+        user = User(email=f'bench-{mode}@example.com', name='Bench', password='not-used')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        commits = []
+        event.listen(db.engine, 'commit', lambda connection: commits.append(1))
+    if mode == 'batched':
+        writer = init_event_writer(app, batch_size=batch_size, interval_ms=interval_ms,
+                                   max_pending=threads * calls)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def work(worker):
+        mine = []
+        with app.app_context():
+            for index in range(calls):
+                started = time.perf_counter()
+                log_action('BENCH', user_id, f'{worker}-{index}')
+                mine.append(time.perf_counter() - started)
+            db.session.remove()
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    submitted = time.perf_counter() - started
+    with app.app_context():
+        flush_events()
+        written = time.perf_counter() - started
+        rows = Log.query.filter_by(action='BENCH').count()
+        db.session.remove()
+        if mode == 'batched':
+            writer.close()
+            app.extensions.pop('event_writer')
+        db.engine.dispose()
+
+    return {
+        'mode': mode,
+        'calls_per_second': len(latencies) / submitted,
+        'p50_ms': _percentile(latencies, 0.5) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'commits': len(commits),
+        'written_seconds': written,
+        'rows': rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence de log_action avec et sans écriture par lots")
+    parser.add_argument('--modes', nargs='+', default=DEFAULT_MODES, choices=DEFAULT_MODES)
+    parser.add_argument('--threads', type=int, default=8, help='threads appelant log_action')
+    parser.add_argument('--calls', type=int, default=200, help='appels par thread')
+    parser.add_argument('--batch-size', type=int, default=200, help='événements au plus par commit')
+    parser.add_argument('--interval-ms', type=int, default=50, help='attente maximale avant commit')
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.calls} appels\n")
+    print(f"{'mode':<10}{'appels/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'commits':>9}{'écrit en s':>12}{'lignes':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes:
+            result = run(mode, args.threads, args.calls, args.batch_size, args.interval_ms, workdir)
+            print(f"{result['mode']:<10}{result['calls_per_second']:>10.0f}{result['p50_ms']:>9.3f}"
+                  f"{result['p99_ms']:>9.3f}{result['commits']:>9}{result['written_seconds']:>12.2f}"
+                  f"{result['rows']:>8}")
+
+
+if __name__ == '__main__':
+    main()
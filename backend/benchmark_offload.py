@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la latence de l'API sous eventlet pendant des téléversements volumineux.
+
+Lance un serveur eventlet (blueprint des fichiers + route /api/ping) dans un
+sous-processus, avec puis sans le pool de calcul (app/utils/offload.py). Pendant
+que plusieurs clients téléversent de gros fichiers en parallèle, un autre
+interroge /api/ping en continu; le script affiche les percentiles de latence
+de ces requêtes légères.
+
+Usage:
+    python benchmark_offload.py                          # 4 x 50 Mo, pool activé et désactivé
+    python benchmark_offload.py --uploads 8 --size 100 --modes on
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(port, workdir):
+    """Serveur eventlet minimal utilisé par le benchmark (exécuté dans un sous-processus)."""
+    import eventlet
+    eventlet.monkey_patch()
+    from eventlet import wsgi
+    from flask import Flask, jsonify
+    from flask_jwt_extended import JWTManager, create_access_token
+
+    from app.config.config import Config
+    from app.models.user import db, User
+    from app.models.file import File, Activity, Message  # noqa: F401 (tables)
+    from app.models.file_share import FileShare  # noqa: F401
+    from app.models.upload_session import UploadSession  # noqa: F401
+    from app.utils.logging import Log  # noqa: F401
+    from app.routes.files2 import files_bp
+    from app.utils.offload import offload_metrics
+
+    Config.UPLOAD_FOLDER = workdir
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        JWT_SECRET_KEY='benchmark-key-with-enough-bytes-for-hs256',
+        MAX_CONTENT_LENGTH=None,
+    )
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(files_bp, url_prefix='/api')
+
+    @app.route('/api/ping')
+    def ping():
+        return jsonify({'ok': True})
+
+    @app.route('/api/offload-metrics')
+    def metrics():
+        return jsonify(offload_metrics())
+
+    with app.app_context():
+        db.create_all()
+        user = User(email='bench@example.com', name='Bench', password='not-used')
+        db.session.add(user)
+        db.session.commit()
+        print(create_access_token(identity=str(user.id)), flush=True)
+
+    wsgi.server(eventlet.listen(('127.0.0.1', port)), app, log_output=False)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(mode, uploads, size_mb, port):
+    """Mesure la latence de /api/ping pendant ``uploads`` téléversements simultanés."""
+    import requests
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, OFFLOAD_ENABLED='true' if mode == 'on' else 'false')
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', str(port), workdir],
+            stdout=subprocess.PIPE, text=True, env=env
+        )
+        try:
+            token = server.stdout.readline().strip()
+            headers = {'Authorization': f'Bearer {token}'}
+            base = f'http://127.0.0.1:{port}/api'
+            for _ in range(50):
+                try:
+                    requests.get(f'{base}/ping', timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+
+            # Texte compressible: la compression et le chiffrement coûtent tous deux
+            payload = (b'ligne de journal applicatif 0123456789 ' * 27 + os.urandom(24)) * (size_mb * 1024)
+            latencies = []
+            stop = threading.Event()
+
+            def pinger():
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    requests.get(f'{base}/ping', timeout=60)
+                    latencies.append(time.perf_counter() - start)
+                    time.sleep(0.01)
+
+            def uploader(index):
+                response = requests.post(f'{base}/files/upload', headers=headers, timeout=600,
+                                         files={'file': (f'journal-{index}.txt', payload)})
+                response.raise_for_status()
+
+            ping_thread = threading.Thread(target=pinger)
+            ping_thread.start()
+            started = time.perf_counter()
+            threads = [threading.Thread(target=uploader, args=(i,)) for i in range(uploads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            stop.set()
+            ping_thread.join()
+            metrics = requests.get(f'{base}/offload-metrics', timeout=10).json()
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'upload_mb_s': round(uploads * len(payload) / (1024 * 1024) / elapsed, 1),
+        'max_queue': metrics['max_waiting'],
+    }
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--serve':
+        serve(int(sys.argv[2]), sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=4, help='Téléversements simultanés')
+    parser.add_argument('--size', type=int, default=50, help='Taille de chaque fichier en Mo')
+    parser.add_argument('--modes', nargs='+', choices=['on', 'off'], default=['off', 'on'],
+                        help='Pool de calcul activé (on) ou désactivé (off)')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    print(f"{'Pool':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'Téléversement Mo/s':>19} {'File max':>9}")
+    for mode in args.modes:
+        result = run(mode, args.uploads, args.size, args.port)
+        print(f"{mode:>5} {result['p50_ms']:>8} {result['p99_ms']:>8} {result['max_ms']:>8} "
+              f"{result['upload_mb_s']:>19} {result['max_queue']:>9}")
+
+
+if __name__ == '__main__':
+    main()
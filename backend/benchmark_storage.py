@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark des pilotes de stockage (app/utils/storage_backends.py).
+
+Mesure le débit d'écriture (put_file), de lecture en flux (open) et de copie
+locale (get) du pilote local et du pilote GCS. Le pilote GCS est mesuré
+contre un serveur local compatible GCS, désigné par STORAGE_EMULATOR_HOST,
+par exemple:
+
+    docker run -p 4443:4443 fsouza/fake-gcs-server -scheme http
+    STORAGE_EMULATOR_HOST=http://localhost:4443 python benchmark_storage.py
+
+ou, sans Docker: pip install gcp-storage-emulator &&
+gcp-storage-emulator start --port 9023 --in-memory
+
+Usage:
+    python benchmark_storage.py                      # 1 Mo, 50 Mo, 200 Mo
+    python benchmark_storage.py --sizes 1 50 --backends local
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES_MB = [1, 50, 200]
+WRITE_CHUNK = 1024 * 1024
+
+
+def _make_source(path, size):
+    block = os.urandom(WRITE_CHUNK)
+    with open(path, 'wb') as file:
+        remaining = size
+        while remaining > 0:
+            file.write(block[:min(remaining, WRITE_CHUNK)])
+            remaining -= WRITE_CHUNK
+
+
+def _make_backend(name, workdir):
+    from app.utils.storage_backends import GCSStorageBackend, LocalStorageBackend
+
+    if name == 'local':
+        return LocalStorageBackend(os.path.join(workdir, 'storage'))
+
+    from google.cloud import storage
+    client = storage.Client(project='benchmark')
+    bucket_name = f"seccollab-bench-{uuid.uuid4().hex[:8]}"
+    client.create_bucket(bucket_name)
+    return GCSStorageBackend(bucket_name, client=client)
+
+
+def run(name, size_mb, workdir):
+    """Mesure un pilote pour une taille de fichier."""
+    size = size_mb * 1024 * 1024
+    backend = _make_backend(name, workdir)
+    source_path = os.path.join(workdir, f'source-{size_mb}.bin')
+    copy_path = os.path.join(workdir, f'copy-{size_mb}.bin')
+    _make_source(source_path, size)
+    key = f"bench/{uuid.uuid4().hex}"
+
+    start = time.perf_counter()
+    backend.put_file(key, source_path)
+    put_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read = 0
+    with backend.open(key) as stored:
+        while True:
+            data = stored.read(WRITE_CHUNK)
+            if not data:
+                break
+            read += len(data)
+    stream_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.get(key, copy_path)
+    get_seconds = time.perf_counter() - start
+
+    if read != size or backend.stat(key) != size:
+        raise RuntimeError(f'Taille relue incorrecte: {read} != {size}')
+    backend.delete(key)
+    os.remove(source_path)
+    os.remove(copy_path)
+
+    return {
+        'put_mb_s': round(size_mb / put_seconds, 1),
+        'stream_mb_s': round(size_mb / stream_seconds, 1),
+        'get_mb_s': round(size_mb / get_seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES_MB, help='Tailles en Mo')
+    parser.add_argument('--backends', nargs='+', choices=['local', 'gcs'], default=None,
+                        help='Pilotes à mesurer (gcs seulement si STORAGE_EMULATOR_HOST est défini)')
+    args = parser.parse_args()
+
+    backends = args.backends or (['local', 'gcs'] if os.environ.get('STORAGE_EMULATOR_HOST') else ['local'])
+    if 'gcs' in backends and not os.environ.get('STORAGE_EMULATOR_HOST'):
+        parser.error('STORAGE_EMULATOR_HOST doit désigner un serveur GCS local')
+
+    print(f"{'Pilote':>7} {'Taille':>8} {'Écriture Mo/s':>14} {'Flux Mo/s':>10} {'Copie Mo/s':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in backends:
+            for size_mb in args.sizes:
+                result = run(name, size_mb, workdir)
+                print(f"{name:>7} {size_mb:>5} Mo {result['put_mb_s']:>14} {result['stream_mb_s']:>10} {result['get_mb_s']:>11}")
+
+
+if __name__ == '__main__':
+    main()
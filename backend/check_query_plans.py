@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Vérifie les plans d'exécution des requêtes des routes fréquentes.
+
+Exerce chaque route sous EXPLAIN QUERY PLAN (tests/test_query_plans.py) et
+échoue si une requête relit une table entière au lieu d'utiliser un index,
+par exemple après la suppression d'un index ou la réécriture d'une requête.
+
+Usage:
+    python check_query_plans.py          # code de sortie non nul en cas de régression
+    python check_query_plans.py --show   # affiche aussi le plan de chaque requête
+"""
+import argparse
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--show', action='store_true', help='afficher le plan de chaque requête')
+    args = parser.parse_args()
+    if args.show:
+        os.environ['QUERY_PLANS_SHOW'] = '1'
+
+    suite = unittest.defaultTestLoader.loadTestsFromName('tests.test_query_plans')
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
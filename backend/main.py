@@ -32,6 +32,10 @@ def main():
     
     # Initialiser la base de données
     db = init_db(app)
+    if app.config.get('EVENT_WRITER_ENABLED'):
+        # Journaux et activités écrits par lots, hors du chemin des requêtes
+        from app.utils.event_writer import init_event_writer
+        init_event_writer(app)
     
     
     
@@ -47,6 +51,16 @@ def main():
     
     if not storage_initialized:
         print("AVERTISSEMENT: L'initialisation du stockage a échoué, certaines fonctionnalités peuvent ne pas fonctionner correctement")
+    elif app.config.get('STORAGE_LAYOUT_MIGRATION'):
+        # Répartir en arrière-plan les fichiers encore stockés à plat
+        from app.utils.storage_layout import start_layout_migration
+        start_layout_migration(app)
+    if storage_initialized and app.config.get('STORAGE_GC_ENABLED'):
+        from app.utils.storage_gc import start_storage_gc
+        start_storage_gc(app)
+    if storage_initialized and app.config.get('INTEGRITY_SCAN_ENABLED'):
+        from app.utils.integrity import start_integrity_scan
+        start_integrity_scan(app)
     
     # Enregistrer les blueprints supplémentaires
     with app.app_context():
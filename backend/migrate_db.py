@@ -48,6 +48,147 @@ def migrate_database():
             except sqlite3.OperationalError as e:
                 print(f"Failed to add column {column_name}: {e}")
     
+    # Columns added to the files table by later features
+    cursor.execute("PRAGMA table_info(files)")
+    existing_file_columns = [column[1] for column in cursor.fetchall()]
+    
+    required_file_columns = [
+        ('encryption_key', 'VARCHAR(128)'),
+        ('content_hash', 'VARCHAR(64)'),
+        ('blob_id', 'INTEGER REFERENCES blobs (id)'),
+        ('compression', 'VARCHAR(10)'),
+        ('merkle_root', 'VARCHAR(64)'),
+    ]
+    
+    if existing_file_columns:
+        for column_name, column_definition in required_file_columns:
+            if column_name not in existing_file_columns:
+                try:
+                    cursor.execute(f"ALTER TABLE files ADD COLUMN {column_name} {column_definition}")
+                    print(f"Added column: files.{column_name}")
+                except sqlite3.OperationalError as e:
+                    print(f"Failed to add column files.{column_name}: {e}")
+    
+    # Columns added to the blobs table after its creation
+    cursor.execute("PRAGMA table_info(blobs)")
+    existing_blob_columns = [column[1] for column in cursor.fetchall()]
+    
+    required_blob_columns = [
+        ('compression', 'VARCHAR(10)'),
+        ('thumbnail_path', 'VARCHAR(512)'),
+        ('merkle_root', 'VARCHAR(64)'),
+        ('merkle_leaves', 'BLOB'),
+        ('verified_at', 'TIMESTAMP'),
+    ]
+    
+    if existing_blob_columns:
+        for column_name, column_definition in required_blob_columns:
+            if column_name not in existing_blob_columns:
+                try:
+                    cursor.execute(f"ALTER TABLE blobs ADD COLUMN {column_name} {column_definition}")
+                    print(f"Added column: blobs.{column_name}")
+                except sqlite3.OperationalError as e:
+                    print(f"Failed to add column blobs.{column_name}: {e}")
+
+    # Materialized storage usage counters, filled from the existing files on first run
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'storage_usage'")
+    usage_table_exists = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS storage_usage (
+        user_id INTEGER PRIMARY KEY,
+        used_bytes BIGINT NOT NULL DEFAULT 0,
+        file_count INTEGER NOT NULL DEFAULT 0,
+        quota_bytes BIGINT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS storage_type_usage (
+        mime_type VARCHAR(100) PRIMARY KEY,
+        used_bytes BIGINT NOT NULL DEFAULT 0,
+        file_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    if not usage_table_exists and existing_file_columns:
+        cursor.execute('''
+        INSERT INTO storage_usage (user_id, used_bytes, file_count)
+        SELECT owner_id, SUM(size), COUNT(*) FROM files GROUP BY owner_id
+        ''')
+        cursor.execute('''
+        INSERT OR REPLACE INTO storage_type_usage (mime_type, used_bytes, file_count)
+        SELECT mime_type, SUM(size), COUNT(*) FROM files GROUP BY mime_type
+        ''')
+        print("Filled storage usage counters")
+
+    # Per-user activity feed, filled from the existing activities on first run
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'feed_entries'")
+    feed_table_exists = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS feed_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        activity_id VARCHAR(36) NOT NULL,
+        file_id INTEGER NOT NULL,
+        actor_id INTEGER NOT NULL,
+        type VARCHAR(20) NOT NULL,
+        file_name VARCHAR(255) NOT NULL,
+        actor_name VARCHAR(100),
+        created_at TIMESTAMP NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY (activity_id) REFERENCES activities (id) ON DELETE CASCADE,
+        FOREIGN KEY (file_id) REFERENCES files (id) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_feed_entries_user_created ON feed_entries (user_id, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_feed_entries_file_user ON feed_entries (file_id, user_id)")
+    cursor.execute("PRAGMA table_info(activities)")
+    activity_columns = [column[1] for column in cursor.fetchall()]
+    if not feed_table_exists and 'file_id' in activity_columns and existing_file_columns:
+        # One entry for the owner of the file and one for each user it is shared with
+        cursor.execute('''
+        INSERT INTO feed_entries (user_id, activity_id, file_id, actor_id, type, file_name, actor_name, created_at)
+        SELECT recipient, activity_id, file_id, actor_id, type, file_name, actor_name, created_at FROM (
+            SELECT f.owner_id AS recipient, a.id AS activity_id, a.file_id, a.user_id AS actor_id, a.type,
+                   f.name AS file_name, u.name AS actor_name, a.created_at
+            FROM activities a JOIN files f ON f.id = a.file_id LEFT JOIN users u ON u.id = a.user_id
+            UNION
+            SELECT s.user_id, a.id, a.file_id, a.user_id, a.type, f.name, u.name, a.created_at
+            FROM activities a JOIN files f ON f.id = a.file_id JOIN file_shares s ON s.file_id = a.file_id
+            LEFT JOIN users u ON u.id = a.user_id
+        ) ORDER BY created_at
+        ''')
+        print(f"Filled {cursor.rowcount} feed entries")
+
+    # File discussions are read by date range
+    cursor.execute("PRAGMA table_info(messages)")
+    message_columns = [column[1] for column in cursor.fetchall()]
+    if 'file_id' in message_columns:
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_messages_file_created ON messages (file_id, created_at)")
+
+    # Secondary indexes of the hot query paths (checked by check_query_plans.py)
+    hot_path_indexes = [
+        ('ix_files_owner_created', 'files', ('owner_id', 'created_at')),
+        ('ix_files_blob', 'files', ('blob_id',)),
+        ('ix_file_shares_user', 'file_shares', ('user_id', 'file_id')),
+        ('ix_activities_file_created', 'activities', ('file_id', 'created_at')),
+        ('ix_logs_user_timestamp', 'logs', ('user_id', 'timestamp')),
+        ('ix_logs_action_timestamp', 'logs', ('action', 'timestamp')),
+        ('ix_chat_sender_receiver_created', 'chat', ('sender_id', 'receiver_id', 'created_at')),
+        ('ix_schedules_creator', 'schedules', ('creator_id',)),
+        ('ix_schedule_participants_user', 'schedule_participants', ('user_id',)),
+        ('ix_schedule_participants_schedule_user', 'schedule_participants', ('schedule_id', 'user_id')),
+        ('ix_trusted_devices_user_device', 'trusted_devices', ('user_id', 'device_id')),
+    ]
+    for index_name, table, columns in hot_path_indexes:
+        cursor.execute(f"PRAGMA table_info({table})")
+        table_columns = [column[1] for column in cursor.fetchall()]
+        # Older databases may lack the table or have a different layout
+        if all(column in table_columns for column in columns):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+            print(f"Ensured index {index_name}")
+    cursor.execute("ANALYZE")
+
     # Create missing tables if they don't exist
     
     # Create trusted_devices table
@@ -159,6 +300,82 @@ def migrate_database():
     )
     ''')
     
+    # Full-text search: one row per searchable item, indexed by the FTS5 table of the same rowid
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'search_documents'")
+    search_table_exists = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind VARCHAR(10) NOT NULL,
+        ref VARCHAR(36) NOT NULL,
+        file_id INTEGER,
+        sender_id INTEGER,
+        receiver_id INTEGER,
+        CONSTRAINT uq_search_documents_kind_ref UNIQUE (kind, ref)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_search_documents_file ON search_documents (file_id)")
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    if not search_table_exists:
+        cursor.execute("PRAGMA table_info(chat)")
+        chat_columns = [column[1] for column in cursor.fetchall()]
+        sources = []
+        if existing_file_columns:
+            sources.append(("SELECT 'file', CAST(id AS TEXT), id, NULL, NULL FROM files",
+                            "SELECT d.id, f.name, '' FROM search_documents d "
+                            "JOIN files f ON d.kind = 'file' AND d.ref = CAST(f.id AS TEXT)"))
+        if 'file_id' in message_columns:
+            sources.append(("SELECT 'message', id, file_id, NULL, NULL FROM messages",
+                            "SELECT d.id, '', m.content FROM search_documents d "
+                            "JOIN messages m ON d.kind = 'message' AND d.ref = m.id"))
+        if 'sender_id' in chat_columns:
+            sources.append(("SELECT 'chat', id, NULL, sender_id, receiver_id FROM chat",
+                            "SELECT d.id, COALESCE(c.file_name, ''), "
+                            "CASE WHEN c.content_type = 'text' THEN c.content ELSE '' END "
+                            "FROM search_documents d JOIN chat c ON d.kind = 'chat' AND d.ref = c.id"))
+        for documents, texts in sources:
+            cursor.execute(f"INSERT INTO search_documents (kind, ref, file_id, sender_id, receiver_id) {documents}")
+            cursor.execute(f"INSERT INTO search_index (rowid, title, body) {texts}")
+            print(f"Indexed {cursor.rowcount} documents for search")
+
+    # Daily activity rollups read by the dashboards, filled from the existing logs and shares on first run
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'activity_rollups'")
+    rollups_table_exists = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS activity_rollups (
+        day DATE NOT NULL,
+        action VARCHAR(50) NOT NULL,
+        user_id INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, action, user_id),
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_activity_rollups_user_action_day "
+                   "ON activity_rollups (user_id, action, day)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_activity_rollups_action_day ON activity_rollups (action, day)")
+    if not rollups_table_exists:
+        cursor.execute("PRAGMA table_info(logs)")
+        if cursor.fetchall():
+            cursor.execute('''
+            INSERT INTO activity_rollups (day, action, user_id, count)
+            SELECT date(timestamp), action, user_id, COUNT(*) FROM logs
+            WHERE timestamp IS NOT NULL GROUP BY date(timestamp), action, user_id
+            ''')
+        cursor.execute("PRAGMA table_info(file_shares)")
+        if 'created_at' in [column[1] for column in cursor.fetchall()] and existing_file_columns:
+            cursor.execute('''
+            INSERT INTO activity_rollups (day, action, user_id, count)
+            SELECT date(s.created_at), 'FILE_SHARES', f.owner_id, COUNT(*)
+            FROM file_shares s JOIN files f ON f.id = s.file_id
+            WHERE s.created_at IS NOT NULL GROUP BY date(s.created_at), f.owner_id
+            ''')
+        print("Filled daily activity rollups")
+
     # Commit changes
     conn.commit()
     conn.close()
@@ -0,0 +1,73 @@
+"""Application minimale partagée par les tests des routes de fichiers."""
+import shutil
+import tempfile
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from app.config.config import Config
+from app.models.user import db, User
+# Modèles importés pour que db.create_all() crée toutes les tables
+from app.models.file import File, Activity, Message
+from app.models.file_share import FileShare
+from app.models.upload_session import UploadSession
+from app.models.storage_usage import StorageUsage, StorageTypeUsage
+from app.models.feed_entry import FeedEntry
+from app.models.Message import Chat
+from app.models.search_document import SearchDocument
+from app.models.activity_rollup import ActivityRollup
+from app.utils.logging import Log
+
+
+class FileRoutesTestCase:
+    """
+    Mixin créant une application Flask avec une base SQLite en mémoire, le
+    blueprint des fichiers et un dossier d'upload temporaire.
+    """
+    blueprints = ()
+
+    def setUp(self):
+        from app.routes.files2 import files_bp
+        from app.utils import access
+
+        # Chaque test repart d'une base vide: les identifiants de fichiers sont réattribués
+        access.clear()
+
+        self.upload_dir = tempfile.mkdtemp()
+        self._original_upload_folder = Config.UPLOAD_FOLDER
+        Config.UPLOAD_FOLDER = self.upload_dir
+
+        self.app = Flask(__name__)
+        self.app.config.update(
+            TESTING=True,
+            SQLALCHEMY_DATABASE_URI='sqlite://',
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+            JWT_SECRET_KEY='test-key-with-enough-bytes-for-hs256',
+            UPLOAD_FOLDER=self.upload_dir,
+        )
+        db.init_app(self.app)
+        JWTManager(self.app)
+        self.app.register_blueprint(files_bp, url_prefix='/api')
+        for blueprint, prefix in self.blueprints:
+            self.app.register_blueprint(blueprint, url_prefix=prefix)
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        Config.UPLOAD_FOLDER = self._original_upload_folder
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    def create_user(self, email, name='Test User'):
+        user = User(email=email, name=name, password='not-used')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def auth_headers(self, user):
+        return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
@@ -0,0 +1,105 @@
+import unittest
+
+from sqlalchemy import event
+
+from app.models.file import File
+from app.models.user import db
+from app.routes.audit import audit_bp
+from app.utils import access
+from tests.helpers import FileRoutesTestCase
+
+
+class TestAccessCache(FileRoutesTestCase, unittest.TestCase):
+    blueprints = ((audit_bp, '/api/audit'),)
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        file = File(name='plan.txt', storage_path='legacy/plan', size=10,
+                    mime_type='text/plain', owner_id=self.alice.id)
+        db.session.add(file)
+        db.session.commit()
+        self.file_id = file.id
+
+    def _messages(self, user):
+        return self.client.get(f'/api/files/{self.file_id}/messages', headers=self.auth_headers(user))
+
+    def _share(self, permission='read'):
+        response = self.client.post(f'/api/files/{self.file_id}/share', headers=self.auth_headers(self.alice),
+                                    json={'email': 'bob@example.com', 'permission': permission})
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeated_checks_are_served_from_cache(self):
+        self.assertEqual(self._messages(self.alice).status_code, 200)
+        alice_id, bob_id = self.alice.id, self.bob.id
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            self.assertTrue(access.can(alice_id, self.file_id, 'own'))
+            self.assertFalse(access.can(bob_id, self.file_id, 'read'))
+            self.assertFalse(access.can(bob_id, self.file_id, 'write'))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        # Seul l'accès de Bob, encore inconnu, a demandé une requête
+        self.assertEqual(len(statements), 1)
+        self.assertGreater(access.acl_metrics()['hit_rate'], 0)
+
+    def test_share_changes_invalidate_cache(self):
+        self.assertEqual(self._messages(self.bob).status_code, 403)
+
+        self._share('read')
+        self.assertEqual(self._messages(self.bob).status_code, 200)
+        self.assertFalse(access.can(self.bob.id, self.file_id, 'share'))
+
+        response = self.client.put(f'/api/files/{self.file_id}/share/{self.bob.id}',
+                                   headers=self.auth_headers(self.alice), json={'permission': 'write'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(access.can(self.bob.id, self.file_id, 'share'))
+
+        response = self.client.delete(f'/api/files/{self.file_id}/share/{self.bob.id}',
+                                      headers=self.auth_headers(self.alice))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._messages(self.bob).status_code, 403)
+
+    def test_permissions_are_not_ordered(self):
+        self._share('write')
+        self.assertTrue(access.can(self.bob.id, self.file_id, 'delete'))
+        self.assertFalse(access.can(self.bob.id, self.file_id, 'manage'))
+
+        response = self.client.put(f'/api/files/{self.file_id}/share/{self.bob.id}',
+                                   headers=self.auth_headers(self.alice), json={'permission': 'admin'})
+        self.assertEqual(response.status_code, 200)
+        # Un partage 'admin' gère les droits, mais ne supprime ni ne repartage le fichier
+        self.assertTrue(access.can(self.bob.id, self.file_id, 'manage'))
+        self.assertTrue(access.can(self.bob.id, self.file_id, 'read'))
+        self.assertFalse(access.can(self.bob.id, self.file_id, 'share'))
+        response = self.client.delete(f'/api/files/{self.file_id}', headers=self.auth_headers(self.bob))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(File.query.count(), 1)
+
+    def test_file_delete_invalidates_cache(self):
+        self._share('write')
+        self.assertEqual(self._messages(self.bob).status_code, 200)
+
+        response = self.client.delete(f'/api/files/{self.file_id}', headers=self.auth_headers(self.alice))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._messages(self.bob).status_code, 404)
+        self.assertIsNone(access.can(self.alice.id, self.file_id, 'read'))
+
+    def test_audit_routes_use_module_messages(self):
+        response = self.client.get(f'/api/audit/file-activity/{self.file_id}', headers=self.auth_headers(self.bob))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.get_json(), {'message': 'Accès non autorisé'})
+        response = self.client.get('/api/audit/file-activity/999', headers=self.auth_headers(self.bob))
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+import unittest
+
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.file_share import FileShare
+from app.models.user import db
+from app.utils.blob_store import dedup_stats
+from tests.helpers import FileRoutesTestCase
+
+
+class TestDeduplicatedUpload(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com')
+        self.bob = self.create_user('bob@example.com')
+        self.data = os.urandom(100000)
+        self.digest = hashlib.sha256(self.data).hexdigest()
+
+    def _upload(self, user, name='report.pdf'):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.auth_headers(user),
+            data={'file': (io.BytesIO(self.data), name)},
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['file']['id']
+
+    def _stored_objects(self):
+        cas_dir = os.path.join(self.upload_dir, 'storage', 'cas')
+        return [name for _, _, names in os.walk(cas_dir) for name in names]
+
+    def test_identical_content_is_stored_once(self):
+        first = self._upload(self.alice)
+        second = self._upload(self.bob, 'copy.pdf')
+
+        self.assertEqual(len(self._stored_objects()), 1)
+        blob = Blob.query.one()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.content_hash, self.digest)
+
+        for user, file_id in ((self.alice, first), (self.bob, second)):
+            response = self.client.get(f'/api/files/{file_id}/download', headers=self.auth_headers(user))
+            self.assertEqual(response.data, self.data)
+
+        stats = dedup_stats()
+        self.assertEqual(stats['logical_bytes'], 2 * stats['stored_bytes'])
+        self.assertEqual(stats['dedup_ratio'], 2.0)
+
+    def test_delete_releases_references(self):
+        first = self._upload(self.alice)
+        second = self._upload(self.alice, 'copy.pdf')
+
+        self.client.delete(f'/api/files/{first}', headers=self.auth_headers(self.alice))
+        self.assertEqual(Blob.query.one().ref_count, 1)
+        self.assertEqual(len(self._stored_objects()), 1)
+
+        self.client.delete(f'/api/files/{second}', headers=self.auth_headers(self.alice))
+        self.assertEqual(Blob.query.count(), 0)
+        self.assertEqual(self._stored_objects(), [])
+
+    def test_hash_handshake_skips_transfer_for_readable_content(self):
+        self._upload(self.alice)
+        response = self.client.post('/api/files/upload/hash', headers=self.auth_headers(self.alice), json={
+            'filename': 'again.pdf', 'content_hash': self.digest
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.get_json()['deduplicated'])
+        self.assertEqual(Blob.query.one().ref_count, 2)
+
+        file_id = response.get_json()['file']['id']
+        response = self.client.get(f'/api/files/{file_id}/download', headers=self.auth_headers(self.alice))
+        self.assertEqual(response.data, self.data)
+
+    def test_hash_handshake_does_not_reveal_other_users_content(self):
+        file_id = self._upload(self.alice)
+        payload = {'filename': 'guess.pdf', 'content_hash': self.digest}
+
+        response = self.client.post('/api/files/upload/hash', headers=self.auth_headers(self.bob), json=payload)
+        self.assertEqual(response.get_json(), {'deduplicated': False})
+        self.assertEqual(Blob.query.one().ref_count, 1)
+
+        # Une fois le fichier partagé, le contenu devient réutilisable
+        db.session.add(FileShare(file_id=file_id, user_id=self.bob.id, permission='read'))
+        db.session.commit()
+        response = self.client.post('/api/files/upload/hash', headers=self.auth_headers(self.bob), json=payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(File.query.filter_by(owner_id=self.bob.id).count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import hashlib
+import io
+import os
+import unittest
+from unittest import mock
+
+from app.config.config import Config
+from app.models.file import File
+from app.utils import compression
+from app.utils.compression import iter_decompress, prepare_stream, should_compress
+from tests.helpers import FileRoutesTestCase
+
+TEXT = b''.join(b'ligne %d du rapport trimestriel\n' % i for i in range(20000))
+
+
+class TestCompressionStage(unittest.TestCase):
+    def _roundtrip(self, data, filename, mime_type):
+        hasher = hashlib.sha256()
+        reader, codec = prepare_stream(io.BytesIO(data), filename, mime_type, hasher)
+        stored = b''
+        while True:
+            chunk = reader.read(65536)
+            if not chunk:
+                break
+            stored += chunk
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(data).hexdigest())
+        self.assertEqual(b''.join(iter_decompress([stored[i:i + 1000] for i in range(0, len(stored), 1000)], codec)), data)
+        return stored, codec
+
+    def test_text_is_compressed(self):
+        for codec in compression.available_codecs():
+            with mock.patch.object(Config, 'COMPRESSION_CODEC', codec):
+                stored, used = self._roundtrip(TEXT, 'rapport.txt', 'text/plain')
+                self.assertEqual(used, codec)
+                self.assertLess(len(stored), len(TEXT) // 5)
+
+    def test_compressed_formats_are_skipped(self):
+        self.assertFalse(should_compress('photo.jpg', 'image/jpeg'))
+        self.assertFalse(should_compress('archive.zip', 'application/octet-stream'))
+        self.assertTrue(should_compress('schema.svg', 'image/svg+xml'))
+        stored, codec = self._roundtrip(TEXT, 'photo.png', 'image/png')
+        self.assertIsNone(codec)
+        self.assertEqual(stored, TEXT)
+
+    def test_incompressible_sample_is_stored_as_is(self):
+        data = os.urandom(200000)
+        stored, codec = self._roundtrip(data, 'export.xlsx', 'application/vnd.ms-excel')
+        self.assertIsNone(codec)
+        self.assertEqual(stored, data)
+
+    def test_disabled(self):
+        with mock.patch.object(Config, 'COMPRESSION_CODEC', 'none'):
+            self.assertIsNone(self._roundtrip(TEXT, 'rapport.txt', 'text/plain')[1])
+
+    def test_decompression_output_is_bounded(self):
+        data = bytes(10 * 1024 * 1024)
+        with mock.patch.object(Config, 'COMPRESSION_CODEC', 'zlib'):
+            reader, codec = prepare_stream(io.BytesIO(data), 'zeros.txt', 'text/plain')
+        chunks = list(iter_decompress([reader.read()], codec, chunk_size=65536))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(data))
+        self.assertTrue(all(len(chunk) <= 65536 for chunk in chunks))
+
+
+class TestCompressedDownload(FileRoutesTestCase, unittest.TestCase):
+    def test_compressed_upload_roundtrip(self):
+        user = self.create_user('owner@example.com')
+        headers = self.auth_headers(user)
+        response = self.client.post(
+            '/api/files/upload',
+            headers=headers,
+            data={'file': (io.BytesIO(TEXT), 'rapport.txt')},
+            content_type='multipart/form-data'
+        )
+        file = File.query.get(response.get_json()['file']['id'])
+        self.assertEqual(file.compression, compression.default_codec())
+        self.assertLess(file.size, len(TEXT) // 5)
+
+        response = self.client.get(f'/api/files/{file.id}/download', headers={**headers, 'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Accept-Ranges'], 'none')
+        self.assertEqual(response.data, TEXT)
+
+
+if __name__ == '__main__':
+    unittest.main()
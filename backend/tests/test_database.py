@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from app.config.config import Config
+from app.models.user import db
+from app.utils.database import database_uri, engine_options, init_db
+
+
+class TestDatabaseConfiguration(unittest.TestCase):
+    def test_postgres_uri_and_pool_options(self):
+        self.assertEqual(database_uri('postgres://u:p@db/app'), 'postgresql://u:p@db/app')
+        options = engine_options('postgresql://u:p@db/app')
+        self.assertEqual(options['pool_size'], Config.DB_POOL_SIZE)
+        self.assertEqual(options['max_overflow'], Config.DB_MAX_OVERFLOW)
+        self.assertEqual(options['pool_recycle'], Config.DB_POOL_RECYCLE)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(engine_options('sqlite:///app.db'), {})
+
+    def test_sqlite_file_runs_in_wal_mode(self):
+        workdir = tempfile.mkdtemp()
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'app.db')}"
+        try:
+            init_db(app)
+            with app.app_context():
+                connection = db.session.connection()
+                pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                self.assertEqual(pragma('journal_mode'), 'wal')
+                self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+                self.assertEqual(pragma('busy_timeout'), Config.SQLITE_BUSY_TIMEOUT)
+                # L'URI de l'application n'est plus remplacée
+                self.assertEqual(db.engine.url.database, os.path.join(workdir, 'app.db'))
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def test_connections_opened_during_startup_get_pragmas(self):
+        workdir = tempfile.mkdtemp()
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'app.db')}"
+
+        # Connexion ouverte puis rendue au pool avant la fin de init_db (contrôle des réplicas)
+        def open_connection(app):
+            db.engine.connect().close()
+
+        try:
+            with mock.patch('app.utils.database.init_replicas', side_effect=open_connection):
+                init_db(app)
+            with app.app_context():
+                self.assertEqual(db.engine.pool.checkedin(), 1)
+                connection = db.session.connection()
+                self.assertEqual(connection.exec_driver_sql('PRAGMA synchronous').scalar(), 1)  # NORMAL
+                self.assertEqual(connection.exec_driver_sql('PRAGMA busy_timeout').scalar(),
+                                 Config.SQLITE_BUSY_TIMEOUT)
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
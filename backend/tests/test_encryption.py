@@ -0,0 +1,139 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cryptography.fernet import Fernet
+
+from app.utils import encryption
+from app.utils.encryption import (
+    EncryptionError,
+    SEGMENT_SIZE,
+    decrypt_file,
+    encrypt_file,
+    encrypt_stream,
+    encrypted_size,
+    generate_data_key,
+    iter_decrypt,
+    iter_decrypt_file,
+    unwrap_data_key,
+)
+
+
+class TestSegmentedEncryption(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def _encrypt(self, data):
+        destination = io.BytesIO()
+        encrypt_stream(io.BytesIO(data), destination)
+        return destination.getvalue()
+
+    def test_roundtrip_segment_boundaries(self):
+        for size in (0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 3 * SEGMENT_SIZE):
+            data = os.urandom(size)
+            container = self._encrypt(data)
+            self.assertEqual(b''.join(iter_decrypt(io.BytesIO(container))), data, size)
+
+    def test_encrypted_size_matches_containers(self):
+        for size in (0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 3 * SEGMENT_SIZE):
+            self.assertEqual(len(self._encrypt(os.urandom(size))), encrypted_size(size), size)
+
+    def test_roundtrip_batch_boundaries(self):
+        data_key, _ = generate_data_key()
+        batch = encryption.BATCH_SEGMENTS * SEGMENT_SIZE
+        for size in (batch - 1, batch, batch + SEGMENT_SIZE, 2 * batch + 7):
+            data = os.urandom(size)
+            container = io.BytesIO()
+            writer = encryption.EncryptingWriter(container, data_key)
+            # Écritures de tailles irrégulières
+            for offset in range(0, size, 50000):
+                writer.write(data[offset:offset + 50000])
+            writer.close()
+            stored = container.getvalue()
+            self.assertEqual(b''.join(iter_decrypt(io.BytesIO(stored), data_key)), data, size)
+            ranged = encryption.iter_decrypt_range(io.BytesIO(stored), len(stored), 1000, size - 3, data_key)
+            self.assertEqual(b''.join(ranged), data[1000:size - 3], size)
+
+    def test_segments_are_bounded(self):
+        data = os.urandom(3 * SEGMENT_SIZE + 10)
+        chunks = list(iter_decrypt(io.BytesIO(self._encrypt(data))))
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all(len(chunk) <= SEGMENT_SIZE for chunk in chunks))
+
+    def test_tampered_segment_is_rejected(self):
+        container = bytearray(self._encrypt(os.urandom(2 * SEGMENT_SIZE)))
+        container[-1] ^= 0x01
+        with self.assertRaises(EncryptionError):
+            b''.join(iter_decrypt(io.BytesIO(bytes(container))))
+
+    def test_truncation_is_rejected(self):
+        container = self._encrypt(os.urandom(2 * SEGMENT_SIZE + 5))
+        record_size = SEGMENT_SIZE + encryption.SEGMENT_OVERHEAD
+        truncated = container[:encryption.HEADER_SIZE + 2 * record_size]
+        with self.assertRaises(EncryptionError):
+            b''.join(iter_decrypt(io.BytesIO(truncated)))
+
+    def test_encrypt_and_decrypt_file(self):
+        path = os.path.join(self.workdir, 'report.txt')
+        data = os.urandom(SEGMENT_SIZE * 2 + 123)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        encrypted_path = encrypt_file(path)
+        decrypted_path = decrypt_file(encrypted_path)
+
+        with open(decrypted_path, 'rb') as file:
+            self.assertEqual(file.read(), data)
+
+    def test_legacy_fernet_files_still_decrypt(self):
+        key, salt = encryption.derive_key(encryption.ENCRYPTION_KEY)
+        path = os.path.join(self.workdir, 'legacy.txt.enc')
+        with open(path, 'wb') as file:
+            file.write(salt + Fernet(key).encrypt(b'ancien format'))
+
+        self.assertEqual(b''.join(iter_decrypt_file(path)), b'ancien format')
+
+
+class TestEnvelopeEncryption(unittest.TestCase):
+    def _encrypt(self, data, key):
+        destination = io.BytesIO()
+        encrypt_stream(io.BytesIO(data), destination, key)
+        return destination.getvalue()
+
+    def test_wrapped_key_roundtrip(self):
+        data_key, wrapped_key = generate_data_key()
+        self.assertEqual(unwrap_data_key(wrapped_key), data_key)
+        self.assertNotIn(data_key, wrapped_key.encode())
+
+    def test_data_key_container_roundtrip(self):
+        data_key, _ = generate_data_key()
+        data = os.urandom(SEGMENT_SIZE + 7)
+        container = self._encrypt(data, data_key)
+        self.assertEqual(b''.join(iter_decrypt(io.BytesIO(container), data_key)), data)
+
+    def test_missing_or_wrong_key_is_rejected(self):
+        data_key, _ = generate_data_key()
+        other_key, _ = generate_data_key()
+        container = self._encrypt(b'secret', data_key)
+        with self.assertRaises(EncryptionError):
+            b''.join(iter_decrypt(io.BytesIO(container)))
+        with self.assertRaises(EncryptionError):
+            b''.join(iter_decrypt(io.BytesIO(container), other_key))
+
+    def test_no_key_derivation_per_file(self):
+        encryption.get_master_key()
+        data_key, wrapped_key = generate_data_key()
+        with mock.patch.object(encryption, 'derive_key', side_effect=AssertionError('PBKDF2 appelé')):
+            container = self._encrypt(b'contenu', data_key)
+            key = unwrap_data_key(wrapped_key)
+            self.assertEqual(b''.join(iter_decrypt(io.BytesIO(container), key)), b'contenu')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import io
+import os
+import threading
+import unittest
+
+from sqlalchemy import event
+
+from app.models.activity_rollup import ActivityRollup
+from app.models.feed_entry import FeedEntry
+from app.models.file import Activity
+from app.models.user import db
+from app.utils import event_writer
+import app.utils.rollups  # noqa: F401 - compteurs quotidiens tenus à jour au flush
+from app.utils.event_writer import EventWriter, flush_events, init_event_writer
+from app.utils.logging import Log, log_action
+from tests.helpers import FileRoutesTestCase
+
+
+class GatedWriter(EventWriter):
+    """Thread d'écriture qui ne commence à vider la file qu'une fois ``gate`` positionné."""
+
+    def __init__(self, app, gate, **options):
+        super().__init__(app, **options)
+        self.gate = gate
+
+    def _run(self):
+        self.gate.wait()
+        super()._run()
+
+
+class TestEventWriter(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.alice_id = self.alice.id
+        self.headers = self.auth_headers(self.alice)
+        self.writers = []
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.close(timeout=1)
+        self.app.extensions.pop('event_writer', None)
+        super().tearDown()
+
+    def _install(self, writer):
+        self.writers.append(writer.start())
+        self.app.extensions['event_writer'] = writer
+        return writer
+
+    def _logs(self, action='BATCH'):
+        db.session.rollback()
+        return Log.query.filter_by(action=action).count()
+
+    def test_download_commits_nothing_itself(self):
+        response = self.client.post(
+            '/api/files/upload', headers=self.headers,
+            data={'file': (io.BytesIO(os.urandom(2000)), 'report.txt')}, content_type='multipart/form-data'
+        )
+        file_id = response.get_json()['file']['id']
+        self._install(EventWriter(self.app, interval_ms=20))
+
+        commits = []
+        count = lambda connection: commits.append(connection)
+        event.listen(db.engine, 'commit', count)
+        try:
+            response = self.client.get(f'/api/files/{file_id}/download', headers=self.headers)
+            response.get_data()
+        finally:
+            event.remove(db.engine, 'commit', count)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(commits, [])
+
+        self.assertTrue(flush_events(timeout=5))
+        self.assertEqual(self._logs('DOWNLOAD'), 1)
+        self.assertEqual(Activity.query.filter_by(type='download', file_id=file_id).count(), 1)
+        # Fil d'activité et compteurs quotidiens suivent l'écriture par lot
+        self.assertEqual(FeedEntry.query.filter_by(type='download', user_id=self.alice_id).count(), 1)
+        self.assertEqual(ActivityRollup.query.filter_by(action='DOWNLOAD').one().count, 1)
+
+    def test_events_are_committed_in_batches(self):
+        gate = threading.Event()
+        self._install(GatedWriter(self.app, gate, batch_size=20, interval_ms=20))
+        batches = event_writer.event_writer_metrics()['batches']
+        for index in range(50):
+            log_action('BATCH', self.alice_id, str(index))
+        self.assertEqual(self._logs(), 0)
+        gate.set()
+        self.assertTrue(flush_events(timeout=5))
+        self.assertEqual(self._logs(), 50)
+        self.assertEqual(event_writer.event_writer_metrics()['batches'] - batches, 3)
+
+    def test_full_queue_writes_directly(self):
+        gate = threading.Event()
+        self._install(GatedWriter(self.app, gate, max_pending=2))
+        for index in range(5):
+            log_action('BATCH', self.alice_id, str(index))
+        self.assertEqual(self._logs(), 3)
+        gate.set()
+        self.assertTrue(flush_events(timeout=5))
+        self.assertEqual(self._logs(), 5)
+
+    def test_close_writes_pending_events(self):
+        gate = threading.Event()
+        writer = self._install(GatedWriter(self.app, gate))
+        for index in range(3):
+            log_action('BATCH', self.alice_id, str(index))
+        writer.close(timeout=0.1)
+        gate.set()
+        self.assertEqual(self._logs(), 3)
+        # Arrêté, le thread ne prend plus rien: l'écriture est directe
+        log_action('BATCH', self.alice_id, 'after close')
+        self.assertEqual(self._logs(), 4)
+
+    def test_invalid_event_does_not_lose_its_batch(self):
+        gate = threading.Event()
+        self._install(GatedWriter(self.app, gate, interval_ms=20))
+        failed = event_writer.event_writer_metrics()['failed']
+        log_action('BATCH', self.alice_id, 'first')
+        event_writer.record(Log(action='BATCH', user_id=None, details='no user'))
+        log_action('BATCH', self.alice_id, 'last')
+        gate.set()
+        self.assertTrue(flush_events(timeout=5))
+        self.assertEqual(self._logs(), 2)
+        self.assertEqual(event_writer.event_writer_metrics()['failed'] - failed, 1)
+
+    def test_init_event_writer_installs_the_writer(self):
+        writer = init_event_writer(self.app, interval_ms=20)
+        self.writers.append(writer)
+        self.assertIs(self.app.extensions['event_writer'], writer)
+        log_action('BATCH', self.alice_id, 'x')
+        self.assertTrue(flush_events(timeout=5))
+        self.assertEqual(self._logs(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import io
+import os
+import unittest
+
+from sqlalchemy import event
+
+from app.models.feed_entry import FeedEntry
+from app.models.user import db
+from tests.helpers import FileRoutesTestCase
+
+
+class TestActivityFeed(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        self.alice_headers = self.auth_headers(self.alice)
+        self.bob_headers = self.auth_headers(self.bob)
+        self.bob_id = self.bob.id
+
+    def _upload(self, name):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.alice_headers,
+            data={'file': (io.BytesIO(os.urandom(2000)), name)},
+            content_type='multipart/form-data'
+        )
+        return response.get_json()['file']['id']
+
+    def _share(self, file_id):
+        response = self.client.post(f'/api/files/{file_id}/share', headers=self.alice_headers,
+                                    json={'email': 'bob@example.com', 'permission': 'read'})
+        self.assertEqual(response.status_code, 200)
+
+    def _feed(self, headers, **params):
+        response = self.client.get('/api/activities', headers=headers, query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_share_backfills_and_later_activities_fan_out(self):
+        file_id = self._upload('plan.txt')
+        self.assertEqual(self._feed(self.bob_headers)['activities'], [])
+
+        self._share(file_id)
+        bob_feed = self._feed(self.bob_headers)['activities']
+        self.assertEqual([entry['type'] for entry in bob_feed], ['share', 'upload'])
+        self.assertEqual(bob_feed[1]['fileName'], 'plan.txt')
+        self.assertEqual(bob_feed[1]['userName'], 'Alice')
+
+        self.client.post(f'/api/files/{file_id}/messages', headers=self.bob_headers, json={'content': 'Bonjour'})
+        for headers in (self.alice_headers, self.bob_headers):
+            latest = self._feed(headers)['activities'][0]
+            self.assertEqual((latest['type'], latest['userName']), ('comment', 'Bob'))
+
+        # Partage révoqué puis fichier supprimé: les entrées disparaissent des fils
+        self.client.delete(f'/api/files/{file_id}/share/{self.bob_id}', headers=self.alice_headers)
+        self.assertEqual(self._feed(self.bob_headers)['activities'], [])
+        self.client.delete(f'/api/files/{file_id}', headers=self.alice_headers)
+        self.assertEqual(FeedEntry.query.count(), 0)
+
+    def test_cursor_and_since(self):
+        for index in range(5):
+            self._upload(f'file-{index}.txt')
+
+        first = self._feed(self.alice_headers, limit=2)
+        second = self._feed(self.alice_headers, limit=2, cursor=first['next_cursor'])
+        third = self._feed(self.alice_headers, limit=2, cursor=second['next_cursor'])
+        names = [entry['fileName'] for page in (first, second, third) for entry in page['activities']]
+        self.assertEqual(names, [f'file-{index}.txt' for index in reversed(range(5))])
+        self.assertIsNone(third['next_cursor'])
+
+        # Interrogation incrémentale: seules les activités postérieures à la plus récente reçue
+        newest = first['activities'][0]['timestamp']
+        self.assertEqual(self._feed(self.alice_headers, since=newest)['activities'], [])
+        self._upload('late.txt')
+        self.assertEqual([entry['fileName'] for entry in self._feed(self.alice_headers, since=newest)['activities']],
+                         ['late.txt'])
+
+        self.assertEqual(self.client.get('/api/activities?cursor=bad', headers=self.alice_headers).status_code, 400)
+
+    def test_feed_read_is_a_single_query(self):
+        for index in range(3):
+            self._share(self._upload(f'file-{index}.txt'))
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            activities = self._feed(self.bob_headers)['activities']
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        self.assertEqual(len(activities), 6)
+        self.assertEqual(len(statements), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import io
+import os
+import unittest
+
+from app.utils.encryption import SEGMENT_SIZE
+from tests.helpers import FileRoutesTestCase
+
+
+class TestStreamingDownload(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('owner@example.com')
+        self.headers = self.auth_headers(self.user)
+        self.data = os.urandom(3 * SEGMENT_SIZE + 1234)
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.headers,
+            data={'file': (io.BytesIO(self.data), 'report.pdf')},
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/files/{response.get_json()['file']['id']}/download"
+
+    def test_full_download_leaves_no_temp_files(self):
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.data)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response.headers['Content-Length']), len(self.data))
+
+        temp_dir = os.path.join(self.upload_dir, 'temp')
+        self.assertEqual(os.listdir(temp_dir) if os.path.exists(temp_dir) else [], [])
+
+    def test_range_inside_and_across_segments(self):
+        for start, end in ((10, 99), (SEGMENT_SIZE - 5, SEGMENT_SIZE + 5), (2 * SEGMENT_SIZE, len(self.data) - 1)):
+            response = self.client.get(self.url, headers={**self.headers, 'Range': f'bytes={start}-{end}'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.data, self.data[start:end + 1])
+            self.assertEqual(response.headers['Content-Range'], f'bytes {start}-{end}/{len(self.data)}')
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, headers={**self.headers, 'Range': 'bytes=-100'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, self.data[-100:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={**self.headers, 'Range': f'bytes={len(self.data) + 10}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_none_match_skips_decryption(self):
+        etag = self.client.get(self.url, headers=self.headers).headers['ETag']
+        response = self.client.get(self.url, headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_if_range_mismatch_returns_full_body(self):
+        response = self.client.get(self.url, headers={**self.headers, 'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models.file import File
+from app.models.file_share import FileShare
+from app.models.user import db
+from tests.helpers import FileRoutesTestCase
+
+
+class TestFileListing(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        self.carol = self.create_user('carol@example.com', 'Carol')
+        self.headers = self.auth_headers(self.alice)
+        start = datetime(2024, 1, 1)
+
+        # 12 fichiers à Alice, 8 fichiers de Bob partagés avec elle (et avec Carol)
+        for index in range(20):
+            owner = self.alice if index < 12 else self.bob
+            file = File(name=f'file-{index:02d}.txt', storage_path=f'legacy/{index}', size=1000 + index,
+                        mime_type='text/plain', owner_id=owner.id,
+                        # Deux fichiers par horodatage: le départage par id est exercé
+                        created_at=start + timedelta(minutes=index // 2), updated_at=start)
+            db.session.add(file)
+            db.session.flush()
+            if owner is self.bob:
+                db.session.add(FileShare(file_id=file.id, user_id=self.alice.id,
+                                         permission='write' if index % 2 else 'read'))
+                db.session.add(FileShare(file_id=file.id, user_id=self.carol.id, permission='read'))
+        # Fichier de Bob non partagé: jamais listé pour Alice
+        db.session.add(File(name='private.txt', storage_path='legacy/private', size=1,
+                            mime_type='text/plain', owner_id=self.bob.id))
+        db.session.commit()
+        db.session.expunge_all()
+
+    def _list(self, **params):
+        response = self.client.get('/api/files', headers=self.headers, query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def _all_pages(self, **params):
+        names, cursor = [], None
+        while True:
+            page = self._list(**params, **({'cursor': cursor} if cursor else {}))
+            names += [file['name'] for file in page['files']]
+            cursor = page['next_cursor']
+            if not cursor:
+                return names
+
+    def test_single_query_with_inline_permission(self):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            files = self._list(limit=100)['files']
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(len(files), 20)
+        shared = {file['name']: file for file in files if not file['is_owner']}
+        self.assertEqual(len(shared), 8)
+        self.assertEqual(shared['file-13.txt']['permission'], 'write')
+        self.assertEqual(shared['file-12.txt']['permission'], 'read')
+        self.assertEqual(shared['file-12.txt']['owner']['name'], 'Bob')
+        self.assertEqual(len(shared['file-12.txt']['shares']), 2)
+
+    def test_keyset_pages_cover_every_file_once(self):
+        expected = sorted((f'file-{index:02d}.txt' for index in range(20)), reverse=True)
+        self.assertEqual(self._all_pages(limit=3), expected)
+
+        self.assertEqual(self._all_pages(limit=7, sort='name', order='asc'), sorted(expected))
+        sizes = self._all_pages(limit=4, sort='size', order='desc')
+        self.assertEqual(sizes, expected)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/files?sort=owner_id', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get('/api/files?cursor=garbage', headers=self.headers).status_code, 400)
+        # Un curseur n'est valable que pour le tri qui l'a produit
+        cursor = self._list(limit=2)['next_cursor']
+        response = self.client.get('/api/files', headers=self.headers,
+                                   query_string={'cursor': cursor, 'sort': 'name'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
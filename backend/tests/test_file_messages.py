@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.config.config import Config
+from app.models.file import File, Message
+from app.models.user import db
+from tests.helpers import FileRoutesTestCase
+
+
+class TestFileMessages(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        self.headers = self.auth_headers(self.alice)
+        self.alice_id = self.alice.id
+        file = File(name='plan.txt', storage_path='legacy/plan', size=10,
+                    mime_type='text/plain', owner_id=self.alice.id)
+        db.session.add(file)
+        db.session.flush()
+        self.file_id = file.id
+        self.start = datetime(2024, 1, 1)
+        for index in range(12):
+            db.session.add(Message(content=f'message {index}', file_id=file.id,
+                                   user_id=self.bob.id if index % 2 else self.alice.id,
+                                   created_at=self.start + timedelta(minutes=index)))
+        db.session.commit()
+        db.session.expunge_all()
+
+    def _messages(self, **params):
+        response = self.client.get(f'/api/files/{self.file_id}/messages', headers=self.headers, query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    @staticmethod
+    def _contents(page):
+        return [message['content'] for message in page['messages']]
+
+    def test_latest_page_then_older_pages(self):
+        latest = self._messages(limit=5)
+        self.assertEqual(self._contents(latest), [f'message {index}' for index in range(7, 12)])
+        self.assertTrue(latest['has_more'])
+        self.assertEqual(latest['messages'][-1]['userName'], 'Bob')
+
+        older = self._messages(limit=5, before=latest['before'])
+        self.assertEqual(self._contents(older), [f'message {index}' for index in range(2, 7)])
+        oldest = self._messages(limit=5, before=older['before'])
+        self.assertEqual(self._contents(oldest), ['message 0', 'message 1'])
+        self.assertFalse(oldest['has_more'])
+
+    def test_whole_discussion_without_paging_parameters(self):
+        for index in range(12, 60):
+            db.session.add(Message(content=f'message {index}', file_id=self.file_id, user_id=self.alice_id,
+                                   created_at=self.start + timedelta(minutes=index)))
+        db.session.commit()
+        # Clients sans pagination (fileService.getFileMessages): toute la discussion
+        page = self._messages()
+        self.assertEqual(self._contents(page), [f'message {index}' for index in range(60)])
+        self.assertFalse(page['has_more'])
+        # Avec un paramètre de pagination, une page de MESSAGE_PAGE_SIZE au plus
+        paged = self._messages(before=page['after'])
+        self.assertEqual(len(paged['messages']), Config.MESSAGE_PAGE_SIZE)
+        self.assertTrue(paged['has_more'])
+
+    def test_incremental_polling(self):
+        latest = self._messages()
+        self.assertEqual(len(latest['messages']), 12)
+
+        # Rien de nouveau: le curseur reste valable
+        poll = self._messages(after=latest['after'])
+        self.assertEqual(poll['messages'], [])
+        self.assertEqual(poll['after'], latest['after'])
+
+        self.client.post(f'/api/files/{self.file_id}/messages', headers=self.headers, json={'content': 'nouveau'})
+        poll = self._messages(after=latest['after'])
+        self.assertEqual(self._contents(poll), ['nouveau'])
+        since = (self.start + timedelta(minutes=10, seconds=30)).isoformat()
+        self.assertEqual(self._contents(self._messages(since=since)), ['message 11', 'nouveau'])
+
+    def test_page_is_a_single_query(self):
+        self._messages(limit=1)  # résout et met en cache le droit d'accès
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            page = self._messages(limit=10)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        self.assertEqual(len(page['messages']), 10)
+        self.assertEqual(len(statements), 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/files/{self.file_id}/messages?before=bad', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from app.utils import offload
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sous eventlet, un greenlet mesure le plus long blocage du hub pendant
+# qu'un autre hache des mots de passe bcrypt (~250 ms chacun)
+HUB_PROBE = r'''
+import eventlet
+eventlet.monkey_patch()
+import sys, time
+from app.config.config import Config
+Config.OFFLOAD_ENABLED = sys.argv[1] == 'on'
+from app.utils import offload
+from app.utils.security import hash_password
+
+worst = 0.0
+done = False
+
+def ticker():
+    global worst
+    last = time.monotonic()
+    while not done:
+        eventlet.sleep(0.005)
+        now = time.monotonic()
+        worst = max(worst, now - last)
+        last = now
+
+probe = eventlet.spawn(ticker)
+workers = [eventlet.spawn(hash_password, 'mot de passe') for _ in range(4)]
+for worker in workers:
+    worker.wait()
+done = True
+probe.wait()
+print(worst, offload.offload_metrics()['offloaded'], offload.offload_metrics()['max_waiting'])
+'''
+
+# Patching partiel de create_app: les requêtes sont servies par des threads
+# système de werkzeug, qui ne doivent jamais attendre le pool
+NATIVE_THREADS = r'''
+import eventlet
+eventlet.monkey_patch(socket=True, select=True)
+import threading
+from app.config.config import Config
+Config.OFFLOAD_ENABLED = True
+from app.utils import offload
+from app.utils.security import hash_password
+
+results = []
+def call():
+    results.append((offload.run(sum, [1, 2, 3]), len(hash_password('mot de passe')) > 0))
+
+threads = [threading.Thread(target=call, daemon=True) for _ in range(2)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join(30)
+print(len(results), offload.offload_metrics()['offloaded'])
+'''
+
+
+class TestOffload(unittest.TestCase):
+    def test_direct_call_without_eventlet(self):
+        self.assertFalse(offload.enabled())
+        before = offload.offload_metrics()['calls']
+        self.assertEqual(offload.run(sum, [1, 2, 3]), 6)
+        metrics = offload.offload_metrics()
+        self.assertEqual(metrics['calls'], before + 1)
+        self.assertEqual(metrics['running'], 0)
+
+    def _probe(self, mode):
+        result = subprocess.run([sys.executable, '-c', HUB_PROBE, mode], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        worst, offloaded, max_waiting = result.stdout.split()[-3:]
+        return float(worst), int(offloaded), int(max_waiting)
+
+    def test_hub_stays_responsive_under_eventlet(self):
+        worst_inline, offloaded, _ = self._probe('off')
+        self.assertEqual(offloaded, 0)
+        worst_offloaded, offloaded, max_waiting = self._probe('on')
+        self.assertEqual(offloaded, 4)
+        self.assertGreaterEqual(max_waiting, 1)
+        # Sans le pool, chaque hachage bloque le hub pendant toute sa durée
+        self.assertGreater(worst_inline, 0.1)
+        self.assertLess(worst_offloaded, worst_inline / 2)
+
+    def test_native_threads_run_inline_under_partial_patching(self):
+        result = subprocess.run([sys.executable, '-c', NATIVE_THREADS], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        finished, offloaded = result.stdout.split()[-2:]
+        self.assertEqual(int(finished), 2)
+        self.assertEqual(int(offloaded), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import os
+import unittest
+import uuid
+from datetime import datetime
+
+from app.models.Message import Chat
+from app.models.user import db
+from app.utils import rollups
+from app.utils.logging import get_user_logs, get_action_logs
+from app.utils.query_plans import PlanRecorder, format_plan
+from tests.helpers import FileRoutesTestCase
+
+# Affiche le plan de chaque requête (python check_query_plans.py --show)
+SHOW_PLANS = os.environ.get('QUERY_PLANS_SHOW') == '1'
+
+
+class TestHotQueryPlans(FileRoutesTestCase, unittest.TestCase):
+    """
+    Chaque route fréquente est exercée sous EXPLAIN QUERY PLAN: une requête
+    qui relit une table entière au lieu d'utiliser un index fait échouer le test.
+    """
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        self.alice_id, self.bob_id = self.alice.id, self.bob.id
+        self.alice_headers = self.auth_headers(self.alice)
+        self.bob_headers = self.auth_headers(self.bob)
+
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.alice_headers,
+            data={'file': (io.BytesIO(os.urandom(2000)), 'plan.txt')},
+            content_type='multipart/form-data'
+        )
+        self.file_id = response.get_json()['file']['id']
+        self.client.post(f'/api/files/{self.file_id}/share', headers=self.alice_headers,
+                         json={'email': 'bob@example.com', 'permission': 'write'})
+        self.client.post(f'/api/files/{self.file_id}/messages', headers=self.bob_headers, json={'content': 'Bonjour'})
+        db.session.add(Chat(id=str(uuid.uuid4()), sender_id=self.alice_id, receiver_id=self.bob_id,
+                            content='Salut', content_type='text'))
+        db.session.commit()
+
+    def assertIndexed(self, name, call):
+        with PlanRecorder(db.engine) as recorder:
+            call()
+        self.assertTrue(recorder.plans, f'{name}: no query recorded')
+        if SHOW_PLANS:
+            print(f'\n== {name}')
+            for statement, plan in recorder.plans:
+                print(format_plan(statement, plan))
+        scans = recorder.full_scans()
+        if scans:
+            self.fail(f'{name}: full table scan\n' + '\n'.join(
+                format_plan(statement, [detail]) for statement, detail in scans
+            ))
+
+    def _get(self, url, headers=None, **params):
+        response = self.client.get(url, headers=headers or self.bob_headers, query_string=params)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_file_routes(self):
+        file_id = self.file_id
+        self.assertIndexed('list files', lambda: self._get('/api/files'))
+        self.assertIndexed('list own files', lambda: self._get('/api/files', self.alice_headers))
+        self.assertIndexed('download', lambda: self._get(f'/api/files/{file_id}/download'))
+        self.assertIndexed('file activities', lambda: self._get(f'/api/files/{file_id}/activities'))
+        self.assertIndexed('activity feed', lambda: self._get('/api/activities'))
+        self.assertIndexed('messages', lambda: self._get(f'/api/files/{file_id}/messages'))
+        self.assertIndexed('shared users', lambda: self._get(f'/api/files/{file_id}/shared-users'))
+        self.assertIndexed('search', lambda: self._get('/api/search', q='plan'))
+        self.assertIndexed('storage usage', lambda: self._get('/api/storage/usage'))
+
+    def test_chat_and_logs(self):
+        # Requête de messaging.get_messages (le module applique le monkey-patching d'eventlet à l'import)
+        alice_id, bob_id = self.alice_id, self.bob_id
+        self.assertIndexed('chat conversation', lambda: Chat.query.filter(
+            ((Chat.sender_id == bob_id) & (Chat.receiver_id == alice_id)) |
+            ((Chat.sender_id == alice_id) & (Chat.receiver_id == bob_id))
+        ).order_by(Chat.created_at.asc()).all())
+        self.assertIndexed('user logs', lambda: get_user_logs(self.alice_id))
+        self.assertIndexed('logs by action', lambda: get_action_logs('UPLOAD'))
+
+    def test_activity_rollups(self):
+        # Lectures des routes de statistiques (tableau de bord et statistiques d'un utilisateur)
+        actions = ['UPLOAD', 'DOWNLOAD', 'SHARE', rollups.FILE_SHARES]
+        monday = rollups.week_days(datetime.utcnow().date())[0]
+        self.assertIndexed('dashboard week', lambda: rollups.daily_counts(actions, monday))
+        self.assertIndexed('dashboard shares', lambda: rollups.totals([rollups.FILE_SHARES]))
+        self.assertIndexed('user totals', lambda: rollups.totals(actions, user_id=self.alice_id))
+        self.assertIndexed('user week', lambda: rollups.daily_counts(actions, monday, user_id=self.alice_id))
+
+    def test_detects_full_scan(self):
+        from app.utils.logging import Log
+        with PlanRecorder(db.engine) as recorder:
+            Log.query.filter_by(details='x').all()
+            Log.query.filter_by(user_id=self.alice_id).all()
+        self.assertEqual([detail for _, detail in recorder.full_scans()], ['SCAN logs'])
+        self.assertEqual(recorder.full_scans(allowed={'logs'}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
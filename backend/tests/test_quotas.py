@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import unittest
+
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.storage_usage import StorageUsage, StorageTypeUsage
+from app.models.user import db
+from app.routes.stats import stats_bp
+from app.routes.uploads import uploads_bp
+from app.utils.quotas import get_usage, reconcile_usage, set_quota
+from tests.helpers import FileRoutesTestCase
+
+
+class _UnreadableStream(io.RawIOBase):
+    """Corps de requête de ``size`` octets qui échoue s'il est lu."""
+
+    def __init__(self, size):
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = base + offset
+        return self.position
+
+    def readinto(self, buffer):
+        raise AssertionError('request body was read')
+
+
+class TestStorageQuotas(FileRoutesTestCase, unittest.TestCase):
+    blueprints = ((uploads_bp, '/api'), (stats_bp, '/api/stats'))
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('owner@example.com')
+        self.headers = self.auth_headers(self.user)
+        self.data = os.urandom(100000)
+
+    def _upload(self, name='report.pdf', data=None):
+        return self.client.post(
+            '/api/files/upload',
+            headers=self.headers,
+            data={'file': (io.BytesIO(self.data if data is None else data), name)},
+            content_type='multipart/form-data'
+        )
+
+    def _usage(self):
+        response = self.client.get('/api/storage/usage', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['usage']
+
+    def test_counters_follow_uploads_and_deletes(self):
+        first = self._upload().get_json()['file']
+        second = self._upload('notes.txt', os.urandom(5000)).get_json()['file']
+
+        usage = self._usage()
+        self.assertEqual(usage['used_bytes'], first['size'] + second['size'])
+        self.assertEqual(usage['file_count'], 2)
+        pdf = db.session.get(StorageTypeUsage, 'application/pdf')
+        self.assertEqual((pdf.used_bytes, pdf.file_count), (first['size'], 1))
+
+        self.client.delete(f"/api/files/{first['id']}", headers=self.headers)
+        usage = self._usage()
+        self.assertEqual((usage['used_bytes'], usage['file_count']), (second['size'], 1))
+        self.assertEqual(reconcile_usage(), 0)
+
+    def test_upload_rejected_before_body_is_read(self):
+        set_quota(self.user.id, 50000)
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.headers,
+            input_stream=_UnreadableStream(len(self.data)),
+            content_type='multipart/form-data; boundary=x'
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.get_json()['quota_bytes'], 50000)
+        self.assertFalse(os.path.exists(os.path.join(self.upload_dir, 'temp')))
+
+    def test_upload_session_rejected_from_declared_size(self):
+        set_quota(self.user.id, 50000)
+        response = self.client.post('/api/uploads', headers=self.headers,
+                                    json={'filename': 'big.zip', 'size': 60000})
+        self.assertEqual(response.status_code, 413)
+
+        # 0: illimité
+        set_quota(self.user.id, 0)
+        response = self.client.post('/api/uploads', headers=self.headers,
+                                    json={'filename': 'big.zip', 'size': 60000})
+        self.assertEqual(response.status_code, 201)
+
+    def test_quota_enforced_when_file_is_registered(self):
+        size = self._upload().get_json()['file']['size']
+        set_quota(self.user.id, size + 1000)
+
+        # Aucun octet transféré: seule la vérification transactionnelle s'applique
+        response = self.client.post('/api/files/upload/hash', headers=self.headers, json={
+            'filename': 'copy.pdf', 'content_hash': hashlib.sha256(self.data).hexdigest()
+        })
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(File.query.count(), 1)
+        self.assertEqual(Blob.query.one().ref_count, 1)
+        self.assertEqual(get_usage(self.user.id)['used_bytes'], size)
+
+    def test_dashboard_reads_counters(self):
+        self._upload()
+        # Écart volontaire: le tableau de bord suit les compteurs, pas la table des fichiers
+        StorageUsage.query.update({StorageUsage.file_count: 7})
+        db.session.commit()
+
+        response = self.client.get('/api/stats/dashboard', headers=self.headers)
+        data = response.get_json()['data']
+        self.assertEqual(data['fileStats']['totalFiles'], 7)
+        self.assertEqual(data['fileStats']['filesByType'], {'application/pdf': 1})
+
+        self.assertEqual(reconcile_usage(), 1)
+        self.assertEqual(get_usage(self.user.id)['file_count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
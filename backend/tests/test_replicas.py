@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.config.config import Config
+from app.models.file import File
+from app.models.user import db, User
+from app.utils import replicas
+from tests.helpers import FileRoutesTestCase
+
+
+class TestReplicaRouting(FileRoutesTestCase, unittest.TestCase):
+    """Un second fichier SQLite joue le réplica; il contient un fichier absent du primaire."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.alice_id = self.alice.id
+        self.headers = self.auth_headers(self.alice)
+        replicas._last_writes.clear()
+
+        self.replica_dir = tempfile.mkdtemp()
+        self.router = replicas.init_replicas(self.app, [f"sqlite:///{os.path.join(self.replica_dir, 'replica.db')}"])
+        replica = self.router.engines[0]
+        db.metadata.create_all(replica)
+        with replica.begin() as connection:
+            connection.execute(User.__table__.insert().values(
+                id=self.alice_id, email='alice@example.com', name='Alice', password='not-used'))
+            connection.execute(File.__table__.insert().values(
+                name='replica-only.txt', storage_path='replica/only', size=1, mime_type='text/plain',
+                owner_id=self.alice_id))
+
+    def tearDown(self):
+        self.router.dispose()
+        shutil.rmtree(self.replica_dir, ignore_errors=True)
+        replicas._last_writes.clear()
+        super().tearDown()
+
+    def _names(self):
+        response = self.client.get('/api/files', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [file['name'] for file in response.get_json()['files']]
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self._names(), ['replica-only.txt'])
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        self.assertEqual(self._names(), ['replica-only.txt'])
+        replicas.record_write(self.alice_id)
+        self.assertEqual(self._names(), [])
+        original = Config.REPLICA_STICKY_SECONDS
+        Config.REPLICA_STICKY_SECONDS = 0
+        try:
+            self.assertEqual(self._names(), ['replica-only.txt'])
+        finally:
+            Config.REPLICA_STICKY_SECONDS = original
+
+    def test_commit_in_a_request_makes_the_user_sticky(self):
+        file = File(name='primary.txt', storage_path='primary/file', size=1, mime_type='text/plain',
+                    owner_id=self.alice_id)
+        db.session.add(file)
+        db.session.commit()
+        self.client.post(f'/api/files/{file.id}/messages', headers=self.headers, json={'content': 'Bonjour'})
+        self.assertEqual(self._names(), ['primary.txt'])
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        shutil.rmtree(self.replica_dir)
+        self.router.dispose()
+        os.makedirs(os.path.join(self.replica_dir, 'replica.db'))  # plus ouvrable
+        self.assertEqual(self.router.check_health(), 0)
+        self.assertEqual(self._names(), [])
+        self.assertGreater(replicas.replica_metrics()['fallbacks'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models.activity_rollup import ActivityRollup
+from app.models.file import File
+from app.models.file_share import FileShare
+from app.models.user import db
+from app.routes.stats import stats_bp
+from app.utils import rollups
+from app.utils.logging import Log, log_action
+from tests.helpers import FileRoutesTestCase
+
+
+class TestActivityRollups(FileRoutesTestCase, unittest.TestCase):
+    blueprints = ((stats_bp, '/api/stats'),)
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        self.alice_id, self.bob_id = self.alice.id, self.bob.id
+        self.headers = self.auth_headers(self.alice)
+
+    def _file(self, name='report.pdf'):
+        file = File(name=name, storage_path=f'files/{name}', size=10, mime_type='application/pdf',
+                    owner_id=self.alice_id)
+        db.session.add(file)
+        db.session.commit()
+        return file
+
+    def _rows(self):
+        return sorted((row.day, row.action, row.user_id, row.count) for row in ActivityRollup.query.all())
+
+    def test_counters_follow_logs_and_shares(self):
+        today = datetime.utcnow().date()
+        log_action('UPLOAD', self.alice_id, 'a')
+        log_action('UPLOAD', self.alice_id, 'b')
+        log_action('DOWNLOAD', self.bob_id, 'c')
+        file = self._file()
+        db.session.add(FileShare(file_id=file.id, user_id=self.bob_id, permission='read'))
+        db.session.commit()
+        self.assertEqual(self._rows(), [
+            (today, 'DOWNLOAD', self.bob_id, 1),
+            (today, rollups.FILE_SHARES, self.alice_id, 1),
+            (today, 'UPLOAD', self.alice_id, 2),
+        ])
+
+        # Supprimer le fichier retire ses partages des compteurs de son propriétaire
+        db.session.delete(file)
+        db.session.commit()
+        self.assertEqual(rollups.totals([rollups.FILE_SHARES]), {rollups.FILE_SHARES: 0})
+
+    def test_rebuild_matches_incremental_counters(self):
+        file = self._file()
+        db.session.add(FileShare(file_id=file.id, user_id=self.bob_id, permission='read'))
+        for days in (0, 1, 1, 9):
+            db.session.add(Log(action='UPLOAD', user_id=self.alice_id, details='x',
+                               timestamp=datetime.utcnow() - timedelta(days=days)))
+        db.session.commit()
+        incremental = self._rows()
+        self.assertEqual(rollups.rebuild_rollups(), len(incremental))
+        self.assertEqual(self._rows(), incremental)
+
+    def test_user_stats_read_the_counters(self):
+        file = self._file()
+        db.session.add(FileShare(file_id=file.id, user_id=self.bob_id, permission='read'))
+        log_action('SHARE', self.alice_id, 'shared')
+        log_action('UPLOAD', self.alice_id, 'a')
+        db.session.add(Log(action='UPLOAD', user_id=self.alice_id, details='old',
+                           timestamp=datetime.utcnow() - timedelta(days=30)))
+        db.session.commit()
+
+        data = self.client.get('/api/stats/user/stats', headers=self.headers).get_json()
+        self.assertEqual(data['total_stats']['uploads'], 2)
+        self.assertEqual(data['total_stats']['shares'], 2)
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        self.assertEqual(data['daily_activities'], {today: {'uploads': 1, 'downloads': 0, 'shares': 2}})
+
+    def test_dashboard_query_count_does_not_grow_with_logs(self):
+        def dashboard_queries():
+            statements = []
+            count = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                response = self.client.get('/api/stats/dashboard', headers=self.headers)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+            self.assertEqual(response.status_code, 200)
+            return response.get_json()['data'], statements
+
+        _, before = dashboard_queries()
+        for index in range(50):
+            db.session.add(Log(action='DOWNLOAD', user_id=self.bob_id, details=str(index)))
+        db.session.commit()
+        data, after = dashboard_queries()
+
+        self.assertEqual(len(after), len(before))
+        self.assertFalse([sql for sql in after if 'logs' in sql])
+        self.assertEqual(sum(data['activityStats']['downloads']), 50)
+        self.assertEqual(data['activityStats']['downloads'][datetime.utcnow().weekday()], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import io
+import os
+import unittest
+import uuid
+
+from app.config.config import Config
+from app.models.Message import Chat
+from app.models.file import File
+from app.models.search_document import SearchDocument
+from app.models.user import db
+from app.utils import search
+from tests.helpers import FileRoutesTestCase
+
+
+class TestSearch(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com', 'Alice')
+        self.bob = self.create_user('bob@example.com', 'Bob')
+        self.carol = self.create_user('carol@example.com', 'Carol')
+        self.alice_headers = self.auth_headers(self.alice)
+        self.bob_headers = self.auth_headers(self.bob)
+        self.carol_headers = self.auth_headers(self.carol)
+        self.alice_id, self.bob_id, self.carol_id = self.alice.id, self.bob.id, self.carol.id
+
+    def _upload(self, name):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.alice_headers,
+            data={'file': (io.BytesIO(os.urandom(2000)), name)},
+            content_type='multipart/form-data'
+        )
+        return response.get_json()['file']['id']
+
+    def _search(self, headers, q, **params):
+        response = self.client.get('/api/search', headers=headers, query_string={'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def _hits(self, headers, q):
+        return [(hit['type'], hit['fileName']) for hit in self._search(headers, q)['results']]
+
+    def _chat(self, sender_id, receiver_id, content):
+        db.session.add(Chat(id=str(uuid.uuid4()), sender_id=sender_id, receiver_id=receiver_id,
+                            content=content, content_type='text'))
+        db.session.commit()
+
+    def test_results_are_filtered_by_access(self):
+        file_id = self._upload('rapport-budget.txt')
+        self.client.post(f'/api/files/{file_id}/messages', headers=self.alice_headers,
+                         json={'content': 'Le budget prévisionnel est validé'})
+        self._chat(self.alice_id, self.bob_id, 'Budget envoyé ce matin')
+
+        self.assertEqual(sorted(self._hits(self.alice_headers, 'budget')), [
+            ('chat', None), ('file', 'rapport-budget.txt'), ('message', 'rapport-budget.txt')
+        ])
+        self.assertEqual(self._hits(self.bob_headers, 'budget'), [('chat', None)])
+        self.assertEqual(self._hits(self.carol_headers, 'budget'), [])
+
+        # Le partage ouvre l'accès sans réindexer
+        self.client.post(f'/api/files/{file_id}/share', headers=self.alice_headers,
+                         json={'email': 'bob@example.com', 'permission': 'read'})
+        self.assertEqual(len(self._hits(self.bob_headers, 'budget')), 3)
+
+    def test_index_follows_updates_and_deletes(self):
+        file_id = self._upload('notes.txt')
+        self.client.post(f'/api/files/{file_id}/messages', headers=self.alice_headers,
+                         json={'content': 'Réunion jeudi'})
+
+        # Préfixe et accents ignorés
+        self.assertEqual(self._hits(self.alice_headers, 'reun'), [('message', 'notes.txt')])
+
+        file = db.session.get(File, file_id)
+        file.name = 'compte-rendu.txt'
+        db.session.commit()
+        self.assertEqual(self._hits(self.alice_headers, 'notes'), [])
+        self.assertEqual(self._hits(self.alice_headers, 'compte rendu'), [('file', 'compte-rendu.txt')])
+
+        self.client.delete(f'/api/files/{file_id}', headers=self.alice_headers)
+        self.assertEqual(self._hits(self.alice_headers, 'reunion'), [])
+        self.assertEqual(SearchDocument.query.count(), 0)
+
+    def test_pagination_and_invalid_queries(self):
+        for index in range(5):
+            self._upload(f'facture-{index}.txt')
+
+        first = self._search(self.alice_headers, 'facture', limit=2)
+        second = self._search(self.alice_headers, 'facture', limit=2, cursor=first['next_cursor'])
+        third = self._search(self.alice_headers, 'facture', limit=2, cursor=second['next_cursor'])
+        ids = [hit['id'] for page in (first, second, third) for hit in page['results']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(third['next_cursor'])
+
+        bad = self.client.get('/api/search', headers=self.alice_headers,
+                              query_string={'q': 'autre', 'cursor': first['next_cursor']})
+        self.assertEqual(bad.status_code, 400)
+        # Syntaxe FTS5 neutralisée, requête vide refusée
+        self.assertEqual(self._hits(self.alice_headers, 'facture" OR "*'), [])
+        self.assertEqual(self.client.get('/api/search?q=%20', headers=self.alice_headers).status_code, 400)
+
+    def test_rebuild(self):
+        self._upload('archive.txt')
+        self._chat(self.bob_id, self.alice_id, 'archive reçue')
+        db.session.execute(db.text('DELETE FROM search_index'))
+        db.session.execute(SearchDocument.__table__.delete())
+        db.session.commit()
+        self.assertEqual(self._hits(self.alice_headers, 'archive'), [])
+
+        self.assertEqual(search.rebuild(), 2)
+        self.assertEqual(len(self._hits(self.alice_headers, 'archive')), 2)
+
+
+class TestLikeSearch(TestSearch):
+    """Même comportement avec le moteur sans index (hors préfixe sans accent et reconstruction)."""
+
+    def setUp(self):
+        self._original_engine = Config.SEARCH_ENGINE
+        Config.SEARCH_ENGINE = 'like'
+        search._engine = None
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        Config.SEARCH_ENGINE = self._original_engine
+        search._engine = None
+
+    test_index_follows_updates_and_deletes = None
+    test_rebuild = None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+from app.utils.object_cache import CachingStorageBackend
+from app.utils.storage_backends import GCSStorageBackend, LocalStorageBackend
+
+
+class BackendContractMixin:
+    """Comportement attendu de tout pilote de stockage."""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.key = f"user_1/{uuid.uuid4()}_report.pdf.enc"
+
+    def _local_file(self, data):
+        path = os.path.join(self.workdir, uuid.uuid4().hex)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_put_open_stat_delete(self):
+        data = os.urandom(300000)
+        self.backend.put(self.key, io.BytesIO(data))
+
+        self.assertEqual(self.backend.stat(self.key), len(data))
+        with self.backend.open(self.key) as stored:
+            stored.seek(1000)
+            self.assertEqual(stored.read(10), data[1000:1010])
+
+        self.backend.delete(self.key)
+        self.assertIsNone(self.backend.stat(self.key))
+        self.backend.delete(self.key)
+
+    def test_put_file_and_get(self):
+        data = os.urandom(200000)
+        source = self._local_file(data)
+        self.backend.put_file(self.key, source, move=True)
+        self.assertFalse(os.path.exists(source))
+
+        destination = os.path.join(self.workdir, 'copy')
+        self.backend.get(self.key, destination)
+        with open(destination, 'rb') as file:
+            self.assertEqual(file.read(), data)
+        self.backend.delete(self.key)
+
+
+class TestLocalStorageBackend(BackendContractMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = LocalStorageBackend(os.path.join(self.workdir, 'storage'))
+
+    def test_put_file_copy_keeps_source_and_leaves_no_temp_file(self):
+        data = os.urandom(50000)
+        source = self._local_file(data)
+        self.backend.put_file(self.key, source)
+
+        self.assertTrue(os.path.exists(source))
+        self.assertEqual(os.listdir(os.path.dirname(self.backend.path(self.key))), [os.path.basename(self.key)])
+
+    def test_failed_put_keeps_previous_version(self):
+        self.backend.put(self.key, io.BytesIO(b'version 1'))
+
+        class BrokenStream(io.RawIOBase):
+            def readinto(self, buffer):
+                raise IOError('connexion interrompue')
+
+        with self.assertRaises(IOError):
+            self.backend.put(self.key, BrokenStream())
+        with self.backend.open(self.key) as stored:
+            self.assertEqual(stored.read(), b'version 1')
+        self.assertEqual(len(os.listdir(os.path.dirname(self.backend.path(self.key)))), 1)
+
+
+class TestCachingStorageBackend(BackendContractMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = CachingStorageBackend(LocalStorageBackend(os.path.join(self.workdir, 'storage')),
+                                             max_bytes=256 * 1024, block_size=16 * 1024, admit_after=2)
+        self.data = os.urandom(40000)
+        self.backend.put(self.key, io.BytesIO(self.data))
+
+    def _read(self, start=0, size=-1):
+        with self.backend.open(self.key) as stored:
+            stored.seek(start)
+            return stored.read(size)
+
+    def test_hot_object_is_served_from_cache(self):
+        # Première ouverture: lue dans le pilote sans entrer dans le cache
+        self.assertEqual(self._read(), self.data)
+        self.assertEqual(self.backend.cache.metrics()['cached_blocks'], 0)
+
+        self.assertEqual(self._read(), self.data)
+        self.assertEqual(self.backend.cache.metrics()['cached_blocks'], 3)
+        self.assertEqual(self._read(20000, 5000), self.data[20000:25000])
+        self.assertEqual(self._read(39990), self.data[39990:])
+
+        metrics = self.backend.cache.metrics()
+        self.assertEqual(metrics['hits'], 2)
+        self.assertEqual(metrics['hit_rate'], round(2 / 8, 4))
+
+    def test_delete_and_rewrite_invalidate(self):
+        self._read()
+        self._read()
+        self.backend.put(self.key, io.BytesIO(b'nouvelle version'))
+        self.assertEqual(self.backend.cache.metrics()['cached_bytes'], 0)
+        self.assertEqual(self._read(), b'nouvelle version')
+
+        self.backend.delete(self.key)
+        with self.assertRaises(FileNotFoundError):
+            self.backend.open(self.key)
+
+    def test_size_is_bounded(self):
+        keys = [f"user_1/{uuid.uuid4()}_big.enc" for _ in range(6)]
+        for key in keys:
+            self.backend.put(key, io.BytesIO(os.urandom(60000)))
+            for _ in range(2):
+                with self.backend.open(key) as stored:
+                    stored.read()
+        metrics = self.backend.cache.metrics()
+        self.assertLessEqual(metrics['cached_bytes'], 256 * 1024)
+        self.assertGreater(metrics['evictions'], 0)
+
+
+@unittest.skipUnless(os.environ.get('STORAGE_EMULATOR_HOST'), 'STORAGE_EMULATOR_HOST non défini (ex. fake-gcs-server)')
+class TestGCSStorageBackend(BackendContractMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        from google.cloud import storage
+        client = storage.Client(project='test-project')
+        bucket_name = f"seccollab-test-{uuid.uuid4().hex[:8]}"
+        client.create_bucket(bucket_name)
+        self.backend = GCSStorageBackend(bucket_name, client=client, composite_threshold=256 * 1024,
+                                         part_size=64 * 1024, max_workers=4)
+
+    def test_composite_upload_of_large_object(self):
+        data = os.urandom(1024 * 1024 + 17)
+        self.backend.put_file(self.key, self._local_file(data))
+
+        self.assertEqual(self.backend.stat(self.key), len(data))
+        with self.backend.open(self.key) as stored:
+            self.assertEqual(stored.read(), data)
+        # Les parties intermédiaires ne doivent pas subsister
+        self.assertEqual([blob.name for blob in self.backend.bucket.list_blobs()], [self.key])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import io
+import os
+import time
+import unittest
+import uuid
+from datetime import datetime, timedelta
+
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.upload_session import UploadSession
+from app.models.user import db
+from app.utils import storage_gc
+from app.utils.storage_gc import collect_garbage, gc_metrics
+from tests.helpers import FileRoutesTestCase
+
+HOUR = 3600
+
+
+class TestStorageGarbageCollector(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        storage_gc._blob_suspects.clear()
+        self.user = self.create_user('owner@example.com')
+        self.headers = self.auth_headers(self.user)
+
+    def _upload(self, data, name='report.pdf'):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.headers,
+            data={'file': (io.BytesIO(data), name)},
+            content_type='multipart/form-data'
+        )
+        return File.query.get(response.get_json()['file']['id'])
+
+    def _write(self, *parts, size=100, age=2 * HOUR):
+        path = os.path.join(self.upload_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(os.urandom(size))
+        past = time.time() - age
+        os.utime(path, (past, past))
+        return path
+
+    def _age(self, path, age=2 * HOUR):
+        past = time.time() - age
+        os.utime(path, (past, past))
+
+    def _collect(self):
+        return collect_garbage(min_age=HOUR, temp_max_age=HOUR, pause=0)
+
+    def test_orphaned_objects_are_deleted_and_counted(self):
+        kept = self._upload(b'contenu conserve')
+        kept_path = os.path.join(self.upload_dir, 'storage', *kept.storage_path.split('/'))
+        self._age(kept_path)
+        orphan = self._write('storage', 'user_1', 'ab', 'cd', f'{uuid.uuid4()}_orphan.enc', size=4096)
+        recent = self._write('storage', 'user_1', 'ab', 'cd', f'{uuid.uuid4()}_recent.enc', age=0)
+        before = gc_metrics()['bytes_reclaimed']
+
+        result = self._collect()
+
+        self.assertEqual(result['objects_deleted'], 1)
+        self.assertEqual(result['bytes_reclaimed'], 4096)
+        self.assertEqual(gc_metrics()['bytes_reclaimed'] - before, 4096)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(kept_path))
+        self.assertEqual(result['missing_objects'], 0)
+
+    def test_temp_artifacts_and_expired_sessions_are_swept(self):
+        old_temp = self._write('temp', 'temp_report.pdf', size=2048)
+        fresh_temp = self._write('temp', str(uuid.uuid4()), 'upload.enc', age=0)
+
+        open_session = UploadSession(owner_id=self.user.id, filename='a.zip', mime_type='application/zip',
+                                     total_size=10, chunk_size=8, encryption_key='k',
+                                     expires_at=datetime.utcnow() + timedelta(hours=1))
+        expired_session = UploadSession(owner_id=self.user.id, filename='b.zip', mime_type='application/zip',
+                                        total_size=10, chunk_size=8, encryption_key='k',
+                                        expires_at=datetime.utcnow() - timedelta(hours=1))
+        db.session.add_all([open_session, expired_session])
+        db.session.commit()
+        open_part = self._write('temp', 'sessions', open_session.id, 'a.zip.enc')
+        expired_part = self._write('temp', 'sessions', expired_session.id, 'b.zip.enc', age=0)
+        unknown_part = self._write('temp', 'sessions', str(uuid.uuid4()), 'c.zip.enc')
+        self._age(os.path.dirname(unknown_part))
+
+        result = self._collect()
+
+        self.assertEqual(result['sessions_expired'], 1)
+        self.assertEqual(db.session.get(UploadSession, expired_session.id).status, 'expired')
+        self.assertFalse(os.path.exists(expired_part))
+        self.assertFalse(os.path.exists(old_temp))
+        self.assertFalse(os.path.exists(unknown_part))
+        self.assertTrue(os.path.exists(fresh_temp))
+        self.assertTrue(os.path.exists(open_part))
+        self.assertGreaterEqual(result['temp_bytes_reclaimed'], 2048)
+
+    def test_unreferenced_blob_is_deleted_on_second_pass(self):
+        file = self._upload(b'contenu partage')
+        blob = db.session.get(Blob, file.blob_id)
+        blob_path = os.path.join(self.upload_dir, 'storage', *blob.storage_path.split('/'))
+        # Fichier supprimé sans que sa référence ait été rendue (arrêt brutal)
+        db.session.delete(file)
+        db.session.commit()
+
+        self.assertEqual(self._collect()['blobs_deleted'], 0)
+        self.assertTrue(os.path.exists(blob_path))
+
+        self.assertEqual(self._collect()['blobs_deleted'], 1)
+        self.assertEqual(Blob.query.count(), 0)
+        self.assertFalse(os.path.exists(blob_path))
+
+    def test_low_ref_count_is_repaired(self):
+        first = self._upload(b'meme contenu')
+        self._upload(b'meme contenu', 'copy.pdf')
+        Blob.query.update({Blob.ref_count: 1})
+        db.session.commit()
+
+        self._collect()
+
+        self.assertEqual(db.session.get(Blob, first.blob_id).ref_count, 2)
+
+    def test_deleting_legacy_file_removes_stored_object(self):
+        storage_path = f'user_{self.user.id}/{uuid.uuid4()}_legacy.pdf.enc'
+        path = self._write('storage', *storage_path.split('/'))
+        file = File(name='legacy.pdf', storage_path=storage_path, size=100,
+                    mime_type='application/pdf', owner_id=self.user.id)
+        db.session.add(file)
+        db.session.commit()
+
+        response = self.client.delete(f'/api/files/{file.id}', headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import unittest
+import uuid
+
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.user import db
+from app.utils.encryption import encrypt_stream, generate_data_key
+from app.routes.files2 import register_file
+from app.utils import storage_layout
+from app.utils.storage_gc import collect_garbage
+from app.utils.storage_layout import is_sharded, migrate_layout
+from tests.helpers import FileRoutesTestCase
+
+
+class TestShardedLayout(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('owner@example.com')
+        self.headers = self.auth_headers(self.user)
+
+    def _write_flat(self, storage_path, data):
+        """Écrit un conteneur chiffré à l'ancien emplacement plat."""
+        data_key, wrapped_key = generate_data_key()
+        path = os.path.join(self.upload_dir, 'storage', *storage_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as container:
+            encrypt_stream(io.BytesIO(data), container, data_key)
+        return path, wrapped_key
+
+    def _download(self, file_id):
+        return self.client.get(f'/api/files/{file_id}/download', headers=self.headers).data
+
+    def test_new_uploads_are_sharded(self):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.headers,
+            data={'file': (io.BytesIO(b'contenu'), 'notes.txt')},
+            content_type='multipart/form-data'
+        )
+        storage_path = File.query.get(response.get_json()['file']['id']).storage_path
+        self.assertTrue(is_sharded(storage_path), storage_path)
+        digest = hashlib.sha256(b'contenu').hexdigest()
+        self.assertTrue(storage_path.startswith(f'cas/{digest[:2]}/{digest[2:4]}/{digest}'))
+
+    def test_migration_moves_flat_objects_online(self):
+        legacy_data = os.urandom(5000)
+        legacy_path = f'user_{self.user.id}/{uuid.uuid4()}_legacy.pdf.enc'
+        legacy_file, legacy_key = self._write_flat(legacy_path, legacy_data)
+        legacy = File(name='legacy.pdf', storage_path=legacy_path, size=os.path.getsize(legacy_file),
+                      mime_type='application/pdf', owner_id=self.user.id, encryption_key=legacy_key)
+
+        shared_data = os.urandom(7000)
+        digest = hashlib.sha256(shared_data).hexdigest()
+        blob_path = f'cas/{digest}.0badc0de'
+        blob_file, blob_key = self._write_flat(blob_path, shared_data)
+        blob = Blob(content_hash=digest, storage_path=blob_path, size=os.path.getsize(blob_file),
+                    encryption_key=blob_key, ref_count=2)
+        db.session.add_all([legacy, blob])
+        db.session.flush()
+        copies = [File(name=f'copy{i}.pdf', storage_path=blob_path, size=blob.size, mime_type='application/pdf',
+                       owner_id=self.user.id, encryption_key=blob_key, content_hash=digest, blob_id=blob.id)
+                  for i in range(2)]
+        db.session.add_all(copies)
+        db.session.commit()
+        etag = self.client.get(f'/api/files/{copies[0].id}/download', headers=self.headers).headers['ETag']
+
+        stats = migrate_layout(pause=0, grace_period=0)
+
+        self.assertEqual(stats, {'moved': 2, 'skipped': 0, 'failed': 0})
+        self.assertFalse(os.path.exists(legacy_file))
+        self.assertFalse(os.path.exists(blob_file))
+        for file in [legacy] + copies:
+            db.session.refresh(file)
+            self.assertTrue(is_sharded(file.storage_path), file.storage_path)
+        self.assertEqual(copies[0].storage_path, db.session.get(Blob, blob.id).storage_path)
+
+        self.assertEqual(self._download(legacy.id), legacy_data)
+        self.assertEqual(self._download(copies[1].id), shared_data)
+        # Le déplacement ne change pas la version vue par les clients
+        response = self.client.get(f'/api/files/{copies[0].id}/download', headers=self.headers)
+        self.assertEqual(response.headers['ETag'], etag)
+
+        # Relancer la migration ne fait rien
+        self.assertEqual(migrate_layout(pause=0, grace_period=0), {'moved': 0, 'skipped': 0, 'failed': 0})
+
+    def test_missing_objects_are_skipped(self):
+        db.session.add(File(name='lost.pdf', storage_path=f'user_{self.user.id}/{uuid.uuid4()}_lost.pdf.enc',
+                            size=10, mime_type='application/pdf', owner_id=self.user.id))
+        db.session.commit()
+        self.assertEqual(migrate_layout(pause=0, grace_period=0)['skipped'], 1)
+
+    def _flat_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = f'cas/{digest}.0badc0de'
+        blob_file, blob_key = self._write_flat(blob_path, data)
+        blob = Blob(content_hash=digest, storage_path=blob_path, size=os.path.getsize(blob_file),
+                    encryption_key=blob_key, ref_count=1)
+        db.session.add(blob)
+        db.session.commit()
+        return blob, blob_file
+
+    def test_file_registered_during_move_follows_the_blob(self):
+        data = os.urandom(3000)
+        blob, _ = self._flat_blob(data)
+        old_path = blob.storage_path
+        # Contenu acquis juste avant que la migration ne le déplace: son chemin en mémoire est l'ancien
+        db.session.expunge(blob)
+        self.assertTrue(storage_layout._move(Blob, blob.id, old_path))
+
+        new_file = register_file('late.bin', blob, 'application/octet-stream', self.user.id)
+        self.assertEqual(blob.storage_path, old_path)
+        self.assertEqual(new_file.storage_path, db.session.get(Blob, blob.id).storage_path)
+        self.assertTrue(is_sharded(new_file.storage_path))
+        self.assertEqual(self._download(new_file.id), data)
+
+    def test_gc_keeps_objects_awaiting_deletion(self):
+        blob, blob_file = self._flat_blob(os.urandom(3000))
+        old_path = blob.storage_path
+        self.assertTrue(storage_layout._move(Blob, blob.id, old_path))
+        # Délai de grâce en cours: l'ancien objet n'est plus référencé mais peut encore être lu
+        os.utime(blob_file, (0, 0))
+        with storage_layout._awaiting_lock:
+            storage_layout._awaiting_deletion.add(old_path)
+        try:
+            collect_garbage(min_age=60, temp_max_age=60, pause=0)
+            self.assertTrue(os.path.exists(blob_file))
+        finally:
+            with storage_layout._awaiting_lock:
+                storage_layout._awaiting_deletion.discard(old_path)
+        collect_garbage(min_age=60, temp_max_age=60, pause=0)
+        self.assertFalse(os.path.exists(blob_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import io
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from app.models.blob import Blob
+from app.models.file import File
+from app.models.user import db
+from app.utils import offload, thumbnails
+from app.utils.storage_gc import collect_garbage
+from tests.helpers import FileRoutesTestCase
+
+
+def _image_bytes(size=(1200, 800), mode='RGB', fmt='JPEG'):
+    output = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128)[:len(mode)]).save(output, fmt)
+    return output.getvalue()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Patching partiel de create_app: les miniatures sont produites par les threads
+# système du pool, qui déchiffrent et chiffrent par offload.run sans attendre le hub
+PARTIAL_PATCH = r'''
+import eventlet
+eventlet.monkey_patch(socket=True, select=True)
+import sys, unittest
+from app.config.config import Config
+Config.OFFLOAD_ENABLED = True
+result = unittest.main(module='tests.test_thumbnails', exit=False, argv=[
+    'test', 'TestThumbnails.test_upload_generates_cached_thumbnail', 'TestThumbnails.test_transparency_is_kept'
+]).result
+sys.exit(0 if result.wasSuccessful() else 1)
+'''
+
+
+class TestThumbnails(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('owner@example.com')
+        self.other = self.create_user('other@example.com')
+        self.headers = self.auth_headers(self.user)
+
+    def _upload(self, data, name):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.headers,
+            data={'file': (io.BytesIO(data), name)},
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(response.status_code, 201)
+        thumbnails.wait_pending(timeout=30)
+        return response.get_json()['file']['id']
+
+    def test_upload_generates_cached_thumbnail(self):
+        file_id = self._upload(_image_bytes(), 'photo.jpg')
+        blob = Blob.query.one()
+        db.session.refresh(blob)
+        self.assertTrue(blob.thumbnail_path.startswith('thumbs/'))
+
+        response = self.client.get(f'/api/files/{file_id}/thumbnail', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        with Image.open(io.BytesIO(response.data)) as preview:
+            self.assertEqual(max(preview.size), 256)
+
+        # Le contenu stocké est chiffré
+        stored = os.path.join(self.upload_dir, 'storage', *blob.thumbnail_path.split('/'))
+        with open(stored, 'rb') as container:
+            self.assertNotEqual(container.read(3), b'\xff\xd8\xff')
+
+        etag = response.headers['ETag'].strip('"')
+        cached = self.client.get(f'/api/files/{file_id}/thumbnail',
+                                 headers={**self.headers, 'If-None-Match': f'"{etag}"'})
+        self.assertEqual(cached.status_code, 304)
+
+        listed = self.client.get('/api/files', headers=self.headers).get_json()['files']
+        self.assertTrue(listed[0]['has_thumbnail'])
+
+    def test_transparency_is_kept(self):
+        file_id = self._upload(_image_bytes((300, 300), 'RGBA', 'PNG'), 'logo.png')
+        response = self.client.get(f'/api/files/{file_id}/thumbnail', headers=self.headers)
+        self.assertEqual(response.mimetype, 'image/png')
+
+    def test_permissions_and_non_images(self):
+        image_id = self._upload(_image_bytes(), 'photo.jpg')
+        response = self.client.get(f'/api/files/{image_id}/thumbnail', headers=self.auth_headers(self.other))
+        self.assertEqual(response.status_code, 403)
+
+        text_id = self._upload(b'not an image', 'notes.txt')
+        response = self.client.get(f'/api/files/{text_id}/thumbnail', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_unreadable_image_has_no_thumbnail(self):
+        file_id = self._upload(b'garbage pretending to be a jpeg', 'broken.jpg')
+        self.assertIsNone(Blob.query.one().thumbnail_path)
+        response = self.client.get(f'/api/files/{file_id}/thumbnail', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        thumbnails.wait_pending(timeout=30)
+
+    def test_thumbnail_removed_with_content_and_kept_by_gc(self):
+        file_id = self._upload(_image_bytes(), 'photo.jpg')
+        blob = Blob.query.one()
+        db.session.refresh(blob)
+        stored = os.path.join(self.upload_dir, 'storage', *blob.thumbnail_path.split('/'))
+
+        collect_garbage(min_age=0, pause=0)
+        self.assertTrue(os.path.exists(stored))
+
+        self.client.delete(f'/api/files/{file_id}', headers=self.headers)
+        self.assertEqual(File.query.count(), 0)
+        self.assertFalse(os.path.exists(stored))
+
+    def test_rendering_goes_through_offload(self):
+        # Sous eventlet complet, le rendu Pillow ne doit pas s'exécuter sur le hub
+        with mock.patch.object(offload, 'run', wraps=offload.run) as run:
+            self._upload(_image_bytes(), 'photo.jpg')
+        self.assertIn(thumbnails.render_thumbnail, [call.args[0] for call in run.call_args_list])
+        blob = Blob.query.one()
+        db.session.refresh(blob)
+        self.assertIsNotNone(blob.thumbnail_path)
+
+    def test_concurrent_renders_keep_the_recorded_thumbnail(self):
+        with mock.patch.object(thumbnails, 'schedule'):
+            file_id = self._upload(_image_bytes(), 'photo.jpg')
+        blob_id = Blob.query.one().id
+
+        # Les deux rendus atteignent le stockage ensemble
+        barrier = threading.Barrier(2, timeout=10)
+        render = thumbnails.render_thumbnail
+        def rendezvous(source):
+            result = render(source)
+            barrier.wait()
+            return result
+
+        def work():
+            with self.app.app_context():
+                thumbnails.generate(blob_id)
+                db.session.remove()
+
+        with mock.patch.object(thumbnails, 'render_thumbnail', rendezvous):
+            workers = [threading.Thread(target=work) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        blob = Blob.query.one()
+        db.session.refresh(blob)
+        response = self.client.get(f'/api/files/{file_id}/thumbnail', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        # Le rendu non retenu a supprimé son propre objet
+        stored = [name for _, _, names in os.walk(os.path.join(self.upload_dir, 'storage', 'thumbs')) for name in names]
+        self.assertEqual(stored, [blob.thumbnail_path.rsplit('/', 1)[1]])
+
+    def test_schedule_renders_each_content_once(self):
+        with mock.patch.object(thumbnails, 'schedule'):
+            self._upload(_image_bytes(), 'photo.jpg')
+        blob_id = Blob.query.one().id
+
+        gate = threading.Event()
+        generate = thumbnails.generate
+        def gated(blob_id):
+            gate.wait(10)
+            return generate(blob_id)
+
+        with mock.patch.object(thumbnails, 'generate', side_effect=gated) as rendered:
+            first = thumbnails.schedule(self.app, blob_id)
+            second = thumbnails.schedule(self.app, blob_id)
+            gate.set()
+            first.result(timeout=30)
+        self.assertIs(first, second)
+        self.assertEqual(rendered.call_count, 1)
+
+    def test_generate_under_partial_patching(self):
+        result = subprocess.run([sys.executable, '-c', PARTIAL_PATCH], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+
+if __name__ == '__main__':
+    unittest.main()
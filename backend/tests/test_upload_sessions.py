@@ -0,0 +1,155 @@
+import hashlib
+import os
+import unittest
+from unittest import mock
+
+from app.config.config import Config
+from app.models.blob import Blob
+from app.models.file import File
+from app.routes.uploads import uploads_bp
+from app.utils import upload_sessions
+from app.utils.encryption import SEGMENT_SIZE, encrypted_size
+from tests.helpers import FileRoutesTestCase
+
+CHUNK_SIZE = 2 * SEGMENT_SIZE
+
+
+class TestResumableUpload(FileRoutesTestCase, unittest.TestCase):
+    blueprints = ((uploads_bp, '/api'),)
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(Config, 'UPLOAD_CHUNK_SIZE', CHUNK_SIZE)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = self.create_user('owner@example.com')
+        self.headers = self.auth_headers(self.user)
+        self.data = os.urandom(2 * CHUNK_SIZE + 777)
+
+    def _create(self, filename='big.zip', size=None):
+        response = self.client.post('/api/uploads', headers=self.headers, json={
+            'filename': filename,
+            'size': len(self.data) if size is None else size,
+            'mime_type': 'application/zip',
+        })
+        return response
+
+    def _put(self, upload_id, index):
+        chunk = self.data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        return self.client.put(f'/api/uploads/{upload_id}/chunks/{index}', headers=self.headers, data=chunk)
+
+    def test_chunked_upload_roundtrip(self):
+        upload = self._create().get_json()['upload']
+        self.assertEqual(upload['total_chunks'], 3)
+        for index in range(3):
+            self.assertEqual(self._put(upload['id'], index).status_code, 200)
+
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        file_id = response.get_json()['file']['id']
+        self.assertEqual(File.query.get(file_id).content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(File.query.get(file_id).size, encrypted_size(len(self.data)))
+
+        response = self.client.get(f'/api/files/{file_id}/download', headers=self.headers)
+        self.assertEqual(response.data, self.data)
+        self.assertFalse(os.path.exists(os.path.join(self.upload_dir, 'temp', 'sessions', upload['id'])))
+
+    def test_resume_reports_offset_and_accepts_replayed_chunk(self):
+        upload_id = self._create().get_json()['upload']['id']
+        self._put(upload_id, 0)
+
+        status = self.client.get(f'/api/uploads/{upload_id}', headers=self.headers).get_json()['upload']
+        self.assertEqual(status['received_bytes'], CHUNK_SIZE)
+        self.assertEqual(status['next_chunk'], 1)
+
+        # Rejouer un morceau déjà reçu est sans effet, sauter un morceau est refusé
+        self.assertEqual(self._put(upload_id, 0).status_code, 200)
+        self.assertEqual(self._put(upload_id, 2).status_code, 409)
+
+    def test_digest_is_recomputed_when_chunks_span_processes(self):
+        upload_id = self._create().get_json()['upload']['id']
+        for index in range(3):
+            self._put(upload_id, index)
+            # Simule un morceau reçu par un autre processus
+            upload_sessions._hashers.clear()
+
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        file_id = response.get_json()['file']['id']
+        self.assertEqual(File.query.get(file_id).content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(File.query.get(file_id).size, encrypted_size(len(self.data)))
+
+    def test_invalid_chunk_size_is_rejected(self):
+        upload_id = self._create().get_json()['upload']['id']
+        response = self.client.put(f'/api/uploads/{upload_id}/chunks/0', headers=self.headers, data=b'short')
+        self.assertEqual(response.status_code, 400)
+
+    def test_complete_requires_all_chunks(self):
+        upload_id = self._create().get_json()['upload']['id']
+        self._put(upload_id, 0)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+
+    def test_size_cap_and_abort(self):
+        self.assertEqual(self._create(size=Config.MAX_UPLOAD_SIZE + 1).status_code, 413)
+
+        upload_id = self._create().get_json()['upload']['id']
+        self._put(upload_id, 0)
+        self.assertEqual(self.client.delete(f'/api/uploads/{upload_id}', headers=self.headers).status_code, 200)
+        self.assertFalse(os.path.exists(os.path.join(self.upload_dir, 'temp', 'sessions', upload_id)))
+        self.assertEqual(self._put(upload_id, 1).status_code, 409)
+
+    def test_quota_is_checked_against_the_container_size(self):
+        # Le fichier en clair tiendrait, mais pas son conteneur chiffré
+        with mock.patch.object(Config, 'USER_STORAGE_QUOTA', encrypted_size(len(self.data)) - 1):
+            self.assertEqual(self._create().status_code, 413)
+
+        with mock.patch.object(Config, 'USER_STORAGE_QUOTA', encrypted_size(len(self.data))):
+            upload_id = self._create().get_json()['upload']['id']
+            for index in range(3):
+                self._put(upload_id, index)
+            response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+    def test_failure_after_container_is_stored_closes_the_session(self):
+        upload_id = self._create().get_json()['upload']['id']
+        for index in range(3):
+            self._put(upload_id, index)
+
+        with mock.patch('app.routes.uploads.register_file', side_effect=RuntimeError('database unavailable')):
+            response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.get_json()['upload']['status'], 'failed')
+        self.assertIn('start a new upload', response.get_json()['error'])
+        # Le contenu n'est plus référencé, les données temporaires sont supprimées
+        self.assertEqual(Blob.query.count(), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.upload_dir, 'temp', 'sessions', upload_id)))
+
+        # Une nouvelle tentative est refusée clairement au lieu d'échouer à nouveau
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['error'], 'Upload session is failed')
+
+    def test_failure_before_container_is_stored_can_be_retried(self):
+        upload_id = self._create().get_json()['upload']['id']
+        for index in range(3):
+            self._put(upload_id, index)
+
+        with mock.patch('app.routes.uploads.finalize_digest', side_effect=OSError('disk error')):
+            response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 500)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+    def test_empty_file(self):
+        self.data = b''
+        upload_id = self._create().get_json()['upload']['id']
+        self.assertEqual(self._put(upload_id, 0).status_code, 200)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        file_id = response.get_json()['file']['id']
+        self.assertEqual(File.query.get(file_id).size, encrypted_size(0))
+        self.assertEqual(self.client.get(f'/api/files/{file_id}/download', headers=self.headers).data, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import os
+import unittest
+import zipfile
+
+from app.models.file_share import FileShare
+from app.models.user import db
+from tests.helpers import FileRoutesTestCase
+
+
+class TestZipDownload(FileRoutesTestCase, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.create_user('alice@example.com')
+        self.bob = self.create_user('bob@example.com')
+
+    def _upload(self, user, data, name):
+        response = self.client.post(
+            '/api/files/upload',
+            headers=self.auth_headers(user),
+            data={'file': (io.BytesIO(data), name)},
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['file']['id']
+
+    def _download(self, user, file_ids):
+        return self.client.post('/api/files/download/zip', headers=self.auth_headers(user),
+                                json={'file_ids': file_ids})
+
+    def test_archive_contains_owned_and_shared_files(self):
+        text = b'ligne de texte compressible\n' * 5000
+        binary = os.urandom(300000)
+        own_text = self._upload(self.alice, text, 'notes.txt')
+        own_binary = self._upload(self.alice, binary, 'data.zip')
+        shared = self._upload(self.bob, b'rapport de bob', 'notes.txt')
+        db.session.add(FileShare(file_id=shared, user_id=self.alice.id, permission='read'))
+        db.session.commit()
+
+        response = self._download(self.alice, [own_text, own_binary, shared, own_text])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/zip')
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['notes.txt', 'data.zip', 'notes (1).txt'])
+            self.assertEqual(archive.read('notes.txt'), text)
+            self.assertEqual(archive.read('data.zip'), binary)
+            self.assertEqual(archive.read('notes (1).txt'), b'rapport de bob')
+            self.assertEqual(archive.getinfo('data.zip').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo('notes.txt').compress_type, zipfile.ZIP_DEFLATED)
+
+        # Rien n'est préparé sur disque
+        temp_dir = os.path.join(self.upload_dir, 'temp')
+        self.assertEqual(os.listdir(temp_dir) if os.path.isdir(temp_dir) else [], [])
+
+    def test_any_unreadable_file_denies_the_archive(self):
+        own = self._upload(self.alice, b'a moi', 'mine.txt')
+        private = self._upload(self.bob, b'prive', 'private.txt')
+        self.assertEqual(self._download(self.alice, [own, private]).status_code, 403)
+        self.assertEqual(self._download(self.alice, [own, 999999]).status_code, 403)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self._download(self.alice, []).status_code, 400)
+        self.assertEqual(self._download(self.alice, ['abc']).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,11 +25,19 @@ export const uploadFile = async (file: File, onProgress?: (progress: number) =>
   }
 };
 
-// List files
+// List files, following the pagination cursor until the last page
 export const listFiles = async () => {
   try {
-    const response = await axios.get(`${API_BASE_URL}/files`);
-    return response.data.files;
+    const files: any[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: any = await axios.get(`${API_BASE_URL}/files`, {
+        params: cursor ? { cursor } : {},
+      });
+      files.push(...response.data.files);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return files;
   } catch (error: any) {
     throw new Error(error.response?.data?.error || 'Failed to fetch files');
   }